@@ -0,0 +1,143 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import BinaryIO
+
+import converter_old
+from converter import ENGINES, AptFileConverter, plan_file
+from generator import SIZES, generate
+
+
+class CountingFile:
+
+
+    def __init__(self, fp: BinaryIO):
+        self.fp = fp
+        self.calls = 0
+        self.bytes = 0
+
+
+    def read(self, size: int = -1) -> bytes:
+        self.calls += 1
+        buff = self.fp.read(size)
+        self.bytes += len(buff)
+        return buff
+
+
+    def write(self, buff: bytes) -> int:
+        self.calls += 1
+        self.bytes += len(buff)
+        return self.fp.write(buff)
+
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        self.calls += 1
+        return self.fp.seek(offset, whence)
+
+
+    def tell(self) -> int:
+        self.calls += 1
+        return self.fp.tell()
+
+
+    def flush(self) -> None:
+        self.fp.flush()
+
+
+    def fileno(self) -> int:
+        return self.fp.fileno()
+
+
+
+def convert(fp: BinaryIO, engine: str) -> None:
+    if engine == "old":
+        converter_old.convert(fp)
+    else:
+        AptFileConverter(fp, engine).convert()
+
+
+def run(path: str, buff: bytes, engine: str, trace: bool = False) -> dict:
+    with open(path, "wb") as fp:
+        fp.write(buff)
+
+    # unbuffered, so every call on the file object is a syscall
+    with open(path, "r+b", buffering=0) as fp:
+        counting = CountingFile(fp)
+        if trace:
+            tracemalloc.start()
+        start = time.perf_counter()
+        convert(counting, engine)
+        seconds = time.perf_counter() - start
+        peak = None
+        if trace:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    return {
+        "seconds": seconds,
+        "io_calls": counting.calls,
+        "io_bytes": counting.bytes,
+        "peak_memory": peak,
+    }
+
+
+def benchmark(sizes: list[str], engines: list[str], repeat: int = 3, seed: int = 0) -> list[dict]:
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "benchmark.dat")
+        for size in sizes:
+            buff = generate(size, seed)
+            with open(path, "wb") as fp:
+                fp.write(buff)
+            with open(path, "rb") as fp:
+                plan = plan_file(fp)
+            swapped = plan.swapped_size()
+
+            for engine in engines:
+                runs = [run(path, buff, engine) for _ in range(repeat)]
+                best = min(runs, key=lambda result: result["seconds"])
+                traced = run(path, buff, engine, trace=True)
+                results.append({
+                    "size": size,
+                    "engine": engine,
+                    "bytes": len(buff),
+                    "bytes_swapped": swapped,
+                    "seconds": best["seconds"],
+                    "mb_per_second": len(buff) / 1024 / 1024 / best["seconds"],
+                    "io_calls": best["io_calls"],
+                    "io_bytes": best["io_bytes"],
+                    "peak_memory": traced["peak_memory"],
+                })
+    return results
+
+
+def format_results(results: list[dict]) -> str:
+    lines = [f"{'size':<8}{'engine':<8}{'bytes':>12}{'swapped':>12}{'seconds':>10}{'MB/s':>9}{'io calls':>12}{'io bytes':>12}{'peak mem':>12}"]
+    for result in results:
+        lines.append(
+            f"{result['size']:<8}{result['engine']:<8}{result['bytes']:>12}{result['bytes_swapped']:>12}"
+            f"{result['seconds']:>10.4f}{result['mb_per_second']:>9.2f}{result['io_calls']:>12}{result['io_bytes']:>12}{result['peak_memory']:>12}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the converters on synthetic AptDataHeader resources.")
+    parser.add_argument("--sizes", nargs="+", choices=SIZES, default=["small", "medium"])
+    parser.add_argument("--engines", nargs="+", choices=[*ENGINES, "old"], default=[*ENGINES, "old"], help="\"old\" is converter_old.convert")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = benchmark(args.sizes, args.engines, args.repeat, args.seed)
+    print(format_results(results))
+    if args.json is not None:
+        with open(args.json, "w") as fp:
+            json.dump(results, fp, indent=4)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
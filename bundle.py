@@ -0,0 +1,163 @@
+import argparse
+import concurrent.futures
+import mmap
+import os
+import stat
+import struct
+import sys
+import time
+
+from converter import (
+    VALIDATIONS,
+    atomic_output,
+    convert_buffer,
+    expand_paths,
+    format_result,
+    format_summary,
+    new_result,
+    output_paths,
+    sniff,
+    summarize,
+)
+
+
+# Bundle 2 archives: the header and the resource entries are in the endianness of the platform
+BUNDLE_MAGIC = b"bnd2"
+BUNDLE_HEADER = "4s5L3LL" # magic, version, platform, debug data offset, entries count, entries offset, data offsets, flags
+BUNDLE_ENTRY = "2Q3L3L3L2LHBB" # id, imports hash, uncompressed sizes, sizes on disk, disk offsets, imports offset, type id, imports count, flags, stream index
+BUNDLE_ENTRY_SIZE = 0x40
+BUNDLE_COMPRESSED = 0x1
+BUNDLE_PLATFORMS = [1, 2, 3] # pc, xbox 360, ps3
+SIZE_MASK = 0x0FFFFFFF # the high bits hold the alignment
+
+
+def bundle_prefix(buff: bytes | mmap.mmap) -> str:
+    if len(buff) < struct.calcsize(BUNDLE_HEADER) or buff[:0x4] != BUNDLE_MAGIC:
+        raise ValueError("Not a Bundle 2 archive.")
+    platform, = struct.unpack_from("<L", buff, 0x8)
+    return "<" if platform in BUNDLE_PLATFORMS else ">"
+
+
+def index_bundle(buff: bytes | mmap.mmap, type_id: int = None) -> list[dict]:
+    prefix = bundle_prefix(buff)
+    _, _, _, _, entries_count, entries_offset, *data_offsets, flags = struct.unpack_from(prefix + BUNDLE_HEADER, buff, 0x0)
+    if flags & BUNDLE_COMPRESSED:
+        raise ValueError("Compressed bundles are not supported.")
+    if entries_offset + entries_count * BUNDLE_ENTRY_SIZE > len(buff):
+        raise ValueError("The resource entries are past the end of the bundle.")
+
+    resources = []
+    for i in range(entries_count):
+        entry = struct.unpack_from(prefix + BUNDLE_ENTRY, buff, entries_offset + i * BUNDLE_ENTRY_SIZE)
+        resource_id, resource_type_id = entry[0], entry[12]
+        if type_id is not None and resource_type_id != type_id:
+            continue
+        # AptDataHeader resources only have a main memory block
+        size = entry[5] & SIZE_MASK
+        offset = data_offsets[0] + entry[8]
+        if size == 0 or offset + size > len(buff):
+            continue
+        endianness = sniff(memoryview(buff)[offset:offset + size])
+        if endianness == "invalid":
+            continue
+        resources.append({"id": resource_id, "type_id": resource_type_id, "offset": offset, "size": size, "endianness": endianness})
+    return resources
+
+
+# mapping of the bundle being converted in every worker process
+BUNDLE = None
+
+
+def init_bundle_worker(path: str) -> None:
+    global BUNDLE
+    with open(path, "r+b") as fp:
+        BUNDLE = mmap.mmap(fp.fileno(), 0)
+
+
+def convert_resource(name: str, offset: int, size: int, validation: str = "fast", bundle: mmap.mmap = None) -> dict:
+    result = new_result(name)
+    result["size"] = size
+    start = time.perf_counter()
+    try:
+        # offsets inside the resource, and the alignment of its actions, are relative to its start
+        convert_buffer(memoryview(BUNDLE if bundle is None else bundle)[offset:offset + size], validation)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["offset"] = getattr(e, "offset", None)
+    finally:
+        result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def convert_bundle(path: str, output: str = None, jobs: int = None, type_id: int = None, validation: str = "fast") -> list[dict]:
+    results = []
+    with open(path, "rb") as fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as source:
+        resources = []
+        for resource in index_bundle(source, type_id):
+            name = f"{path}:{resource['id']:016X}"
+            if resource["endianness"] == "little":
+                result = new_result(name)
+                result["size"] = resource["size"]
+                result["skipped"] = "already little endian"
+                results.append(result)
+            else:
+                resources.append((name, resource["offset"], resource["size"]))
+        if len(resources) == 0:
+            return results
+
+        # the whole bundle is written once, to a temporary file that replaces the destination when every resource converted
+        converted = []
+        try:
+            with atomic_output(path if output is None else output, stat.S_IMODE(os.fstat(fp.fileno()).st_mode)) as output_fp:
+                output_fp.truncate(len(source))
+                with mmap.mmap(output_fp.fileno(), len(source)) as bundle:
+                    bundle[:] = source
+                    if jobs == 1 or len(resources) == 1:
+                        converted = [convert_resource(*resource, validation, bundle) for resource in resources]
+                    else:
+                        with concurrent.futures.ProcessPoolExecutor(jobs, initializer=init_bundle_worker, initargs=(output_fp.name,)) as executor:
+                            futures = [executor.submit(convert_resource, *resource, validation) for resource in resources]
+                            converted = [future.result() for future in futures]
+                    bundle.flush()
+                if any(result["error"] is not None for result in converted):
+                    raise ValueError("A resource of the bundle failed.")
+        except ValueError:
+            if not converted:
+                raise
+            for result in converted:
+                if result["error"] is None:
+                    result["error"] = "Not written, another resource of the bundle failed."
+    return results + converted
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convert the AptDataHeader resources inside Bundle 2 archives from big endian to little endian.")
+    parser.add_argument("paths", nargs="+", help="bundles, directories or glob patterns")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="number of worker processes converting the resources of a bundle")
+    parser.add_argument("-o", "--output", help="write converted bundles into this directory instead of converting in place")
+    parser.add_argument("--type-id", type=lambda value: int(value, 0), help="only look at resources of this type id, otherwise they are recognized by their content")
+    parser.add_argument("--validation", choices=VALIDATIONS, default="fast")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print the summary")
+    args = parser.parse_args()
+
+    paths = expand_paths(args.paths)
+    results = []
+    start = time.perf_counter()
+    for path, output in zip(paths, output_paths(paths, args.output)):
+        try:
+            bundle_results = convert_bundle(path, output, args.jobs, args.type_id, args.validation)
+        except Exception as e:
+            result = new_result(path)
+            result["error"] = f"{type(e).__name__}: {e}"
+            bundle_results = [result]
+        for result in bundle_results:
+            if not args.quiet or result["error"] is not None:
+                print(format_result(result), flush=True)
+        results.extend(bundle_results)
+    summary = summarize(results, time.perf_counter() - start)
+    print(format_summary(summary))
+    sys.exit(1 if summary["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,141 @@
+import contextlib
+import hashlib
+import os
+import tempfile
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError: # without locking concurrent evictions may only try to delete the same entries
+    fcntl = None
+
+
+class ConversionCache:
+
+
+    def __init__(self, directory: str, max_size: int = 0x40000000, store: str = "output"):
+        if store not in ["output", "plan"]:
+            raise ValueError(f"Unknown cache store {store}.")
+        self.directory = directory
+        self.max_size = max_size
+        self.store = store
+        os.makedirs(directory, exist_ok=True)
+
+
+    @staticmethod
+    def key(buff: bytes | bytearray | memoryview) -> str:
+        return hashlib.blake2b(buff, digest_size=20).hexdigest()
+
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.{self.store}")
+
+
+    def get(self, key: str) -> bytes | None:
+        path = self.path(key)
+        try:
+            with open(path, "rb") as fp:
+                buff = fp.read()
+        except FileNotFoundError:
+            return None
+
+        try:
+            os.utime(path) # the modification time is the last use
+        except FileNotFoundError:
+            pass
+        return buff
+
+
+    def put(self, key: str, buff: bytes | bytearray) -> int:
+        path = self.path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp = tempfile.mkstemp(suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                fp.write(buff)
+            # the running size is kept in the cache directory, so only puts going over the cap scan the entries
+            with self.lock():
+                size = self.read_size()
+                try:
+                    size -= os.stat(path).st_size
+                except FileNotFoundError:
+                    pass
+                os.replace(temp, path)
+                size += len(buff)
+                self.write_size(size)
+        except BaseException:
+            if os.path.exists(temp):
+                os.unlink(temp)
+            raise
+        return self.evict() if size > self.max_size else 0
+
+
+    def read_size(self) -> int:
+        try:
+            with open(os.path.join(self.directory, "size"), "r") as fp:
+                return int(fp.read())
+        except (FileNotFoundError, ValueError): # first put, or the size was not written completely
+            return sum(entry_size for _, entry_size, _ in self.entries())
+
+
+    def write_size(self, size: int) -> None:
+        with open(os.path.join(self.directory, "size"), "w") as fp:
+            fp.write(str(size))
+
+
+    def entries(self) -> list[tuple[float, int, str]]:
+        entries = []
+        for directory in os.scandir(self.directory):
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+
+    def evict(self) -> int:
+        evictions = 0
+        with self.lock():
+            entries = self.entries()
+            size = sum(entry_size for _, entry_size, _ in entries)
+            for _, entry_size, path in sorted(entries):
+                if size <= self.max_size:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    continue
+                size -= entry_size
+                evictions += 1
+            self.write_size(size)
+        return evictions
+
+
+    @contextlib.contextmanager
+    def lock(self) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, "lock"), "a") as fp:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fp.fileno(), fcntl.LOCK_UN)
+
+
+    def stats(self) -> dict:
+        entries = self.entries()
+        # hits, misses and evictions are counted in the results of every file, the workers only see copies of the cache
+        return {
+            "entries": len(entries),
+            "size": sum(entry_size for _, entry_size, _ in entries),
+            "max_size": self.max_size,
+        }
\ No newline at end of file
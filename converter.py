@@ -1,461 +1,1745 @@
-import os
-import struct
-from typing import BinaryIO
-
-
-class AptFileConverter:
-
-
-    def __init__(self, fp: BinaryIO):
-        self.fp = fp
-        self.apt_data_offset = None
-        self.const_file_offset = None
-        self.geometry_offset = None
-        self.movie_offset = None
-
-        AptFileConverter.CHARACTERS_FUNCTIONS = {
-            1: AptFileConverter.convert_character_shape,
-            2: AptFileConverter.convert_character_text,
-            3: AptFileConverter.convert_character_font,
-            5: AptFileConverter.convert_character_sprite,
-            7: AptFileConverter.convert_character_image,
-            9: AptFileConverter.convert_character_movie,
-        }
-
-        AptFileConverter.FRAME_ITEMS_FUNCTION = {
-            1: AptFileConverter.convert_frame_item_action,
-            2: AptFileConverter.convert_frame_item_frame_label,
-            3: AptFileConverter.convert_frame_item_place_object,
-            4: AptFileConverter.convert_frame_item_remove_object,
-            5: AptFileConverter.convert_frame_item_background_color,
-            8: AptFileConverter.convert_frame_item_init_action,
-        }
-
-
-    def convert(self) -> None:
-        self.convert_header()
-        self.convert_const_file()
-        self.convert_character(self.movie_offset)
-        self.convert_geometry()
-
-
-    def convert_header(self) -> None:
-        self.fp.seek(0x0, os.SEEK_SET)
-        self.swap("<L")
-        self.swap("<L")
-        self.apt_data_offset = self.swap("<L")
-        self.const_file_offset = self.swap("<L")
-        self.geometry_offset = self.swap("<L")
-        self.swap("<L")
-
-
-    def convert_import(self, import_offset: int) -> None:
-        self.fp.seek(self.apt_data_offset + import_offset, os.SEEK_SET)
-        self.swap("<L")
-        self.swap("<L")
-        self.swap("<L")
-        assert self.swap("<L") == 0, "Should be NULL."
-
-
-    def convert_export(self, export_offset: int) -> None:
-        self.fp.seek(self.apt_data_offset + export_offset, os.SEEK_SET)
-        self.swap("<L")
-        self.swap("<L")
-
-
-    def convert_character(self, character_offset: int) -> None:
-        if character_offset == 0:
-            return
-        
-        self.fp.seek(self.apt_data_offset + character_offset, os.SEEK_SET)
-        character_type = self.swap("<L")
-        self.swap("<L")
-        self.swap("<H")
-        self.swap("<H")
-        assert self.swap("<L") == 0, "Should be NULL."
-
-        fn = AptFileConverter.CHARACTERS_FUNCTIONS.get(character_type)
-        assert fn is not None, f"Character {character_type} should be unused."
-        fn(self, character_offset + 0x10)
-
-        
-    def convert_character_shape(self, character_offset: int) -> None:
-        self.fp.seek(self.apt_data_offset + character_offset, os.SEEK_SET)
-        for _ in range(4):
-            self.swap("<L")
-        self.swap("<L")
-
-
-    def convert_character_text(self, character_offset: int) -> None:
-        self.fp.seek(self.apt_data_offset + character_offset, os.SEEK_SET)
-        for _ in range(4):
-            self.swap("<L")
-        self.swap("<L")
-        self.swap("<L")
-        self.swap("<L")
-        self.swap("<L")
-        self.swap("<L")
-        self.swap("<L")
-        self.swap("<L")
-        self.swap("<L")
-        self.swap("<L")
-
-
-    def convert_character_font(self, character_offset: int) -> None:
-        self.fp.seek(self.apt_data_offset + character_offset, os.SEEK_SET)
-        self.swap("<L")
-        self.swap("<L")
-        assert self.swap("<L") == 0, "Should be NULL."
-
-
-    def convert_character_sprite(self, character_offset: int) -> None:
-        self.fp.seek(self.apt_data_offset + character_offset, os.SEEK_SET)
-        frames_count = self.swap("<L")
-        frames_offset = self.swap("<L")
-        assert self.swap("<L") == 0, "Should be NULL."
-
-        for i in range(frames_count):
-            frame_offset = frames_offset + i * 0x8
-            self.convert_frame(frame_offset)
-
-
-    def convert_character_image(self, character_offset: int) -> None:
-        self.fp.seek(self.apt_data_offset + character_offset, os.SEEK_SET)
-        self.swap("<L")
-
-
-    def convert_character_movie(self, character_offset: int) -> None:
-        self.fp.seek(self.apt_data_offset + character_offset, os.SEEK_SET)
-        frames_count = self.swap("<L")
-        frames_offset = self.swap("<L")
-        assert self.swap("<L") == 0, "Should be NULL."
-        characters_count = self.swap("<L")
-        characters_offsets = self.swap("<L")
-        self.swap("<L")
-        self.swap("<L")
-        self.swap("<L")
-        imports_count = self.swap("<L")
-        imports_offset = self.swap("<L")
-        exports_count = self.swap("<L")
-        exports_offset = self.swap("<L")
-        self.swap("<L")
-
-        for i in range(frames_count):
-            frame_offset = frames_offset + i * 0x8
-            self.convert_frame(frame_offset)
-
-        for i in range(characters_count):
-            self.fp.seek(self.apt_data_offset + characters_offsets + i * 0x4, os.SEEK_SET)
-            character_offset = self.swap("<L")
-            if character_offset != self.movie_offset: # skip movie to prevent endless recursion
-                self.convert_character(character_offset)
-
-        for i in range(imports_count):
-            import_offset = imports_offset + i * 0x10
-            self.convert_import(import_offset)
-
-        for i in range(exports_count):
-            export_offset = exports_offset + i * 0x8
-            self.convert_export(export_offset)
-
-
-    def convert_frame(self, frame_offset: int) -> None:
-        self.fp.seek(self.apt_data_offset + frame_offset, os.SEEK_SET)
-        frame_items_count = self.swap("<L")
-        frame_items_offsets = self.swap("<L")
-
-        for i in range(frame_items_count):
-            self.fp.seek(self.apt_data_offset + frame_items_offsets + i * 0x4, os.SEEK_SET)
-            frame_item_offset = self.swap("<L")
-            self.convert_frame_item(frame_item_offset)
-
-
-    def convert_frame_item(self, frame_item_offset: int) -> None:
-        if frame_item_offset == 0:
-            return
-        
-        self.fp.seek(self.apt_data_offset + frame_item_offset, os.SEEK_SET)
-        frame_item_type = self.swap("<L")
-
-        fn = AptFileConverter.FRAME_ITEMS_FUNCTION.get(frame_item_type)
-        assert fn is not None, f"Frame item {frame_item_type} should be unused."
-        fn(self, frame_item_offset + 0x4)
-
-
-    def convert_frame_item_action(self, frame_item_offset: int) -> None:
-        self.fp.seek(self.apt_data_offset + frame_item_offset, os.SEEK_SET)
-        actions_offset = self.swap("<L")
-        
-        self.convert_actions(actions_offset)
-
-
-    def convert_frame_item_frame_label(self, frame_item_offset: int) -> None:
-        self.fp.seek(self.apt_data_offset + frame_item_offset, os.SEEK_SET)
-        self.swap("<L")
-        self.swap("<H")
-        self.swap("<H")
-        self.swap("<L")
-
-
-    def convert_frame_item_place_object(self, frame_item_offset: int) -> None:
-        self.fp.seek(self.apt_data_offset + frame_item_offset, os.SEEK_SET)
-        self.swap("<L")
-        self.swap("<L")
-        self.swap("<L")
-        for _ in range(6):
-            self.swap("<L")
-        self.swap("<L")
-        self.swap("<L")
-        self.swap("<L")
-        self.swap("<L")
-        self.swap("<L")
-        clip_actions_offset = self.swap("<L")
-        
-        self.convert_clip_actions(clip_actions_offset)
-
-
-    def convert_clip_actions(self, clip_actions_offset: int) -> None:
-        if clip_actions_offset == 0:
-            return
-
-        self.fp.seek(self.apt_data_offset + clip_actions_offset, os.SEEK_SET)
-        clip_action_records_count = self.swap("<L")
-        clip_action_records_offset = self.swap("<L")
-
-        for i in range(clip_action_records_count):
-            clip_action_record_offset = clip_action_records_offset + i * 0xC
-            self.convert_clip_action_record(clip_action_record_offset)
-
-
-    def convert_clip_action_record(self, clip_action_record_offset: int) -> None:
-        self.fp.seek(self.apt_data_offset + clip_action_record_offset, os.SEEK_SET)
-        self.swap("<L")
-        self.swap("<L")
-        actions_offset = self.swap("<L")
-
-        self.convert_actions(actions_offset)
-
-
-    def convert_frame_item_remove_object(self, frame_item_offset: int) -> None:
-        self.fp.seek(self.apt_data_offset + frame_item_offset, os.SEEK_SET)
-        self.swap("<L")
-
-
-    def convert_frame_item_background_color(self, frame_item_offset: int) -> None:
-        self.fp.seek(self.apt_data_offset + frame_item_offset, os.SEEK_SET)
-        self.swap("<L")
-
-
-    def convert_frame_item_init_action(self, frame_item_offset: int) -> None:
-        self.fp.seek(self.apt_data_offset + frame_item_offset, os.SEEK_SET)
-        self.swap("<L")
-        actions_offset = self.swap("<L")
-        
-        self.convert_actions(actions_offset)
-
-
-    def convert_actions(self, actions_offset: int) -> None:
-        if actions_offset == 0:
-            return
-
-        # switch statement at 0x006B6730
-
-        current_offset = self.apt_data_offset + actions_offset
-        while True:
-            self.fp.seek(current_offset, os.SEEK_SET)
-            action = self.swap("B")
-            if action == 0:
-                break
-            elif action in [0x77, 0xB4, 0xB7, ]: # 00
-                # align 0x1
-                # size 0x4
-                self.swap("<L")
-                current_offset = self.fp.tell()
-            elif action in [0x81, 0x87, 0x99, 0x9D, 0x9F, 0xB8, ]: # 01
-                # align 0x4
-                # size 0x4
-                self.align()
-                self.swap("<L")
-                current_offset = self.fp.tell()
-            elif action in [0x83, ]: # 02
-                # align 0x4
-                # size 0x8
-                self.align()
-                self.swap("<L") # TODO: where does it point to?
-                self.swap("<L") # TODO: where does it point to?
-                current_offset = self.fp.tell()
-            elif action in [0x88, 0x96, ]: # 03
-                # align 0x4
-                # size 0x8
-                self.align()
-                self.swap("<L")
-                self.swap("<L") # TODO: follow the pointer
-                current_offset = self.fp.tell()
-                # TODO
-            elif action in [0x8B, ]: # 04
-                # align 0x4
-                # size 0x4
-                self.align()
-                self.swap("<L") # TODO: where does it point to?
-                current_offset = self.fp.tell()
-            elif action in [0x8C, ]: # 05
-                # align 0x4
-                # size 0x4
-                self.align()
-                self.swap("<L")
-                current_offset = self.fp.tell()
-            elif action in [0x8E, ]: # 06
-                # align 0x4
-                # size 0x1C
-                self.align()
-                self.swap("<L") # TODO: follow the pointer
-                self.swap("<L")
-                self.swap("<H")
-                self.swap("<H")
-                self.swap("<L") # TODO: follow the pointer
-                self.swap("<L")
-                self.swap("<L")
-                self.swap("<L")
-                current_offset = self.fp.tell()
-                # TODO
-            elif action in [0x8F, ]: # 07
-                # align 0x4
-                # size 0x14
-                self.align()
-                self.skip(0x14) # TODO: temporary
-                current_offset = self.fp.tell()
-                # TODO
-            elif action in [0x94, ]: # 08
-                # align 0x4
-                # size 0x4
-                self.align()
-                self.swap("<L") # TODO: where does it point to?
-                current_offset = self.fp.tell()
-            elif action in [0x9B, ]: # 09
-                # align 0x4
-                # size 0x18
-                self.align()
-                self.swap("<L") # TODO: follow the pointer
-                self.swap("<L")
-                self.swap("<L") # TODO: follow the pointer
-                self.swap("<L")
-                self.swap("<L")
-                self.swap("<L")
-                current_offset = self.fp.tell()
-                # TODO
-            elif action in [0xA1, 0xA4, 0xA5, 0xA6, 0xA7, ]: # 0A
-                # align 0x4
-                # size 0x4
-                self.align()
-                self.swap("<L")
-                current_offset = self.fp.tell()
-            elif action in [0xA2, 0xAE, 0xAF, 0xB0, 0xB1, 0xB2, 0xB3, 0xB5, ]: # 0B
-                # align 0x1
-                # size 0x1
-                self.skip(0x1)
-                current_offset = self.fp.tell()
-            elif action in [0xA3, 0xB6, ]: # 0C
-                # align 0x1
-                # size 0x2
-                self.swap("<H")
-                current_offset = self.fp.tell()
-            else: # 0D
-                current_offset = self.fp.tell()
-                continue
-
-
-    def convert_const_file(self) -> None:
-        self.fp.seek(self.const_file_offset, os.SEEK_SET)
-        self.skip(0x14)
-        self.movie_offset = self.swap("<L")
-        constants_count = self.swap("<L")
-        constants_offset = self.swap("<L")
-        
-        for i in range(constants_count):
-            constant_offset = constants_offset + i * 0x8
-            self.convert_constant(constant_offset)
-
-
-    def convert_constant(self, constant_offset: int) -> None:
-        self.fp.seek(self.const_file_offset + constant_offset, os.SEEK_SET)
-        self.swap("<L")
-        self.swap("<L")
-
-    
-    def convert_geometry(self) -> None:
-        self.fp.seek(self.geometry_offset, os.SEEK_SET)
-        geometry_records_count = self.swap("<L")
-        self.swap("<L")
-        geometry_records_offsets = self.swap("<L")
-        
-        for i in range(geometry_records_count):
-            self.fp.seek(geometry_records_offsets + i * 0x4, os.SEEK_SET)
-            geometry_record_offset = self.swap("<L")
-            self.convert_geometry_record(geometry_record_offset)
-
-
-    def convert_geometry_record(self, geometry_record_offset: int) -> None:
-        self.fp.seek(geometry_record_offset, os.SEEK_SET)
-        self.swap("<L")
-        geometry_data_count = self.swap("<L")
-        geometry_data_offsets = self.swap("<L")
-        
-        for i in range(geometry_data_count):
-            self.fp.seek(geometry_data_offsets + i * 0x4, os.SEEK_SET)
-            geometry_data_offset = self.swap("<L")
-            self.convert_geometry_data(geometry_data_offset)
-
-
-    def convert_geometry_data(self, geometry_data_offset: int) -> None:
-        self.fp.seek(geometry_data_offset, os.SEEK_SET)
-        self.swap("<L")
-        self.swap("<L")
-        self.swap("<L")
-        self.swap("<L")
-        vertices_count = self.swap("<L")
-        vertices_offsets = self.swap("<L")
-        
-        for i in range(vertices_count):
-            self.fp.seek(vertices_offsets + i * 0x4, os.SEEK_SET)
-            vertex_offset = self.swap("<L")
-            self.convert_vertex(vertex_offset)
-
-
-    def convert_vertex(self, vertex_offset: int) -> None:
-        self.fp.seek(vertex_offset, os.SEEK_SET)
-        self.swap("<L")
-        self.swap("<L")
-        self.skip(0x4)
-        self.swap("<L")
-        self.swap("<L")
-
-
-    def swap(self, fmt: str) -> int:
-        size = struct.calcsize(fmt)
-        buff = self.fp.read(size)
-        buff = buff[::-1]
-        self.fp.seek(-size, os.SEEK_CUR)
-        self.fp.write(buff)
-        return struct.unpack(fmt, buff)[0]
-
-
-    def skip(self, size: int) -> int:
-        self.fp.seek(size, os.SEEK_CUR)
-
-
-    def align(self) -> None:
-        offset = self.fp.tell()
-        offset += 0x3
-        offset &= 0xFFFFFFFC
-        self.fp.seek(offset, os.SEEK_SET)
-
-
-
-def main():
-    with open("data/testing.dat", "r+b") as fp:
-        converter = AptFileConverter(fp)
-        converter.convert()
-
-
-if __name__ == "__main__":
+import argparse
+import concurrent.futures
+import contextlib
+import glob
+import heapq
+import io
+import itertools
+import json
+import mmap
+import operator
+import os
+import stat
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from collections import defaultdict
+from typing import BinaryIO, Callable, Iterator
+
+from cache import ConversionCache
+
+
+SWAP_STRUCTS = {}
+WORD_TYPECODE = next(typecode for typecode in "IL" if array(typecode).itemsize == 0x4)
+
+
+def swap_structs(fmt: str) -> tuple[struct.Struct, struct.Struct]:
+    structs = SWAP_STRUCTS.get(fmt)
+    if structs is None:
+        structs = struct.Struct(">" + fmt.lstrip("<>")), struct.Struct("<" + fmt.lstrip("<>"))
+        SWAP_STRUCTS[fmt] = structs
+    return structs
+
+
+def find_runs(offsets: array | list[int], size: int) -> list[tuple[int, int]]:
+    runs = []
+    if len(offsets) == 0:
+        return runs
+    offsets = sorted(offsets)
+    start = end = offsets[0]
+    for offset in offsets[1:]:
+        if offset != end + size: # duplicates start a new run, so they are swapped back like in place
+            runs.append((start, end + size))
+            start = offset
+        end = offset
+    runs.append((start, end + size))
+    return runs
+
+
+def add_run(runs: array, start: int, end: int) -> None:
+    # runs are start and end offsets one after the other, a run continuing the last one extends it
+    if runs and runs[-1] == start:
+        runs[-1] = end
+    else:
+        runs.append(start)
+        runs.append(end)
+
+
+def byteswap_words(data: bytes, stride: int = 1, skips: list[int] = ()) -> tuple[bytes, array]:
+    words = array(WORD_TYPECODE)
+    words.frombytes(data)
+    swapped = array(WORD_TYPECODE, words)
+    swapped.byteswap()
+    for skip in skips:
+        swapped[skip::stride] = words[skip::stride]
+    return swapped.tobytes(), swapped if sys.byteorder == "little" else words
+
+
+class Layout:
+
+
+    def __init__(self, *fields: tuple[str, str]):
+        self.fields = fields
+        fmt = "".join(field_fmt for _, field_fmt in fields)
+        self.big = struct.Struct(">" + fmt)
+        self.little = struct.Struct("<" + fmt)
+        self.size = self.big.size
+
+        indices = []
+        self.names = {} # index of every named field in the unpacked values
+        index = 0
+        self.halves = []
+        self.words = []
+        offset = 0
+        for name, field_fmt in fields:
+            if name is not None:
+                indices.append(index)
+                self.names[name] = index
+            if field_fmt.endswith("s"):
+                index += 1
+                offset += int(field_fmt[:-1])
+                continue
+            count = int(field_fmt[:-1] or 1)
+            size = struct.calcsize(">" + field_fmt[-1])
+            for _ in range(count):
+                if size == 2:
+                    self.halves.append(offset)
+                elif size == 4:
+                    self.words.append(offset)
+                offset += size
+            index += count
+
+        self.swapped_size = len(self.halves) * 0x2 + len(self.words) * 0x4
+        self.half_runs = find_runs(self.halves, 0x2)
+        self.word_runs = find_runs(self.words, 0x4)
+
+        # bytes of the record that are not swapped
+        swapped = {half + i for half in self.halves for i in range(0x2)} | {word + i for word in self.words for i in range(0x4)}
+        self.gaps = sorted(set(range(self.size)) - swapped)
+
+        # words that are left untouched when the layout is swapped as whole words
+        self.word_skips = None
+        if len(self.halves) == 0 and self.size % 0x4 == 0 and all(word % 0x4 == 0 for word in self.words):
+            self.word_skips = sorted(set(range(0, self.size, 0x4)) - set(self.words))
+            self.word_skips = [word // 0x4 for word in self.word_skips]
+
+        if len(indices) == 0:
+            self.pick = lambda values: ()
+        elif len(indices) == 1:
+            self.pick = lambda values, index=indices[0]: (values[index],)
+        else:
+            self.pick = operator.itemgetter(*indices)
+
+
+    def column(self, values: array, name: str) -> array:
+        # values of one field across records swapped as whole words
+        return values[self.names[name]::self.size // 0x4]
+
+
+# unnamed fields are swapped but not returned, "s" fields are skipped
+
+HEADER_LAYOUT = Layout(
+    (None, "2L"),
+    ("apt_data_offset", "L"),
+    ("const_file_offset", "L"),
+    ("geometry_offset", "L"),
+    (None, "L"),
+)
+
+IMPORT_LAYOUT = Layout(
+    (None, "3L"),
+    ("null", "L"),
+)
+
+EXPORT_LAYOUT = Layout(
+    (None, "2L"),
+)
+
+CHARACTER_LAYOUT = Layout(
+    ("character_type", "L"),
+    (None, "L"),
+    (None, "2H"),
+    ("null", "L"),
+)
+
+CHARACTER_SHAPE_LAYOUT = Layout(
+    (None, "4L"), # bounds
+    (None, "L"),
+)
+
+CHARACTER_TEXT_LAYOUT = Layout(
+    (None, "4L"), # bounds
+    (None, "9L"),
+)
+
+CHARACTER_FONT_LAYOUT = Layout(
+    (None, "2L"),
+    ("null", "L"),
+)
+
+CHARACTER_SPRITE_LAYOUT = Layout(
+    ("frames_count", "L"),
+    ("frames_offset", "L"),
+    ("null", "L"),
+)
+
+CHARACTER_IMAGE_LAYOUT = Layout(
+    (None, "L"),
+)
+
+CHARACTER_MOVIE_LAYOUT = Layout(
+    ("frames_count", "L"),
+    ("frames_offset", "L"),
+    ("null", "L"),
+    ("characters_count", "L"),
+    ("characters_offsets", "L"),
+    (None, "3L"),
+    ("imports_count", "L"),
+    ("imports_offset", "L"),
+    ("exports_count", "L"),
+    ("exports_offset", "L"),
+    (None, "L"),
+)
+
+FRAME_LAYOUT = Layout(
+    ("frame_items_count", "L"),
+    ("frame_items_offsets", "L"),
+)
+
+FRAME_ITEM_ACTION_LAYOUT = Layout(
+    ("actions_offset", "L"),
+)
+
+FRAME_ITEM_FRAME_LABEL_LAYOUT = Layout(
+    (None, "L"),
+    (None, "2H"),
+    (None, "L"),
+)
+
+FRAME_ITEM_PLACE_OBJECT_LAYOUT = Layout(
+    (None, "3L"),
+    (None, "6L"), # matrix
+    (None, "5L"),
+    ("clip_actions_offset", "L"),
+)
+
+CLIP_ACTIONS_LAYOUT = Layout(
+    ("clip_action_records_count", "L"),
+    ("clip_action_records_offset", "L"),
+)
+
+CLIP_ACTION_RECORD_LAYOUT = Layout(
+    (None, "2L"),
+    ("actions_offset", "L"),
+)
+
+FRAME_ITEM_REMOVE_OBJECT_LAYOUT = Layout(
+    (None, "L"),
+)
+
+FRAME_ITEM_BACKGROUND_COLOR_LAYOUT = Layout(
+    (None, "L"),
+)
+
+FRAME_ITEM_INIT_ACTION_LAYOUT = Layout(
+    (None, "L"),
+    ("actions_offset", "L"),
+)
+
+CONST_FILE_LAYOUT = Layout(
+    (None, "20s"), # "Apt constant file"
+    ("movie_offset", "L"),
+    ("constants_count", "L"),
+    ("constants_offset", "L"),
+)
+
+CONSTANT_LAYOUT = Layout(
+    (None, "2L"),
+)
+
+GEOMETRY_LAYOUT = Layout(
+    ("geometry_records_count", "L"),
+    (None, "L"),
+    ("geometry_records_offsets", "L"),
+)
+
+GEOMETRY_RECORD_LAYOUT = Layout(
+    (None, "L"),
+    ("geometry_data_count", "L"),
+    ("geometry_data_offsets", "L"),
+)
+
+GEOMETRY_DATA_LAYOUT = Layout(
+    (None, "4L"),
+    ("vertices_count", "L"),
+    ("vertices_offsets", "L"),
+)
+
+VERTEX_LAYOUT = Layout(
+    (None, "2L"),
+    (None, "4s"),
+    (None, "2L"),
+)
+
+
+# switch statement at 0x006B6730
+# class: (align, operands layout, offsets of pointers in the operands, actions)
+ACTIONS_CLASSES = {
+    0x00: (0x1, Layout((None, "L")), (), [0x77, 0xB4, 0xB7, ]),
+    0x01: (0x4, Layout((None, "L")), (), [0x81, 0x87, 0x99, 0x9D, 0x9F, 0xB8, ]),
+    0x02: (0x4, Layout((None, "2L")), (0x0, 0x4), [0x83, ]), # TODO: where does it point to?
+    0x03: (0x4, Layout((None, "2L")), (0x4, ), [0x88, 0x96, ]), # TODO: follow the pointer
+    0x04: (0x4, Layout((None, "L")), (0x0, ), [0x8B, ]), # TODO: where does it point to?
+    0x05: (0x4, Layout((None, "L")), (), [0x8C, ]),
+    0x06: (0x4, Layout((None, "2L"), (None, "2H"), (None, "4L")), (0x0, 0xC), [0x8E, ]), # TODO: follow the pointers
+    0x07: (0x4, Layout((None, "20s")), (), [0x8F, ]), # TODO: temporary
+    0x08: (0x4, Layout((None, "L")), (0x0, ), [0x94, ]), # TODO: where does it point to?
+    0x09: (0x4, Layout((None, "6L")), (0x0, 0x8), [0x9B, ]), # TODO: follow the pointers
+    0x0A: (0x4, Layout((None, "L")), (), [0xA1, 0xA4, 0xA5, 0xA6, 0xA7, ]),
+    0x0B: (0x1, Layout((None, "1s")), (), [0xA2, 0xAE, 0xAF, 0xB0, 0xB1, 0xB2, 0xB3, 0xB5, ]),
+    0x0C: (0x1, Layout((None, "H")), (), [0xA3, 0xB6, ]),
+    0x0D: (0x1, Layout(), (), []), # everything else has no operands
+}
+
+ACTIONS_LAYOUTS_CLASSES = {id(layout): number for number, (_, layout, _, _) in ACTIONS_CLASSES.items()}
+
+# action: (class, align mask, operands size, operands layout if anything is swapped, pointers)
+ACTIONS_TABLE = [(0x0D, 0x0, 0x0, None, ())] * 0x100
+for number, (align, layout, pointers, actions) in ACTIONS_CLASSES.items():
+    for action in actions:
+        ACTIONS_TABLE[action] = (number, align - 1, layout.size, layout if layout.halves or layout.words else None, pointers)
+
+
+def scan_actions(buff: bytes | bytearray | memoryview | mmap.mmap, actions_offset: int, base: int = 0, operands: list = None, classes: list = None) -> list[int]:
+    actions_offsets = []
+    offset = actions_offset
+    while True:
+        action = buff[offset]
+        if action == 0:
+            return actions_offsets
+        actions_offsets.append(offset)
+        number, align, size, layout, _ = ACTIONS_TABLE[action]
+        if classes is not None:
+            classes.append(number)
+        offset += 1
+        if align:
+            offset = ((base + offset + align) & ~align) - base
+        if layout is not None and operands is not None:
+            operands.append((base + offset, layout))
+        offset += size
+
+
+class AptFormatError(ValueError):
+
+
+    def __init__(self, message: str, offset: int):
+        super().__init__(message)
+        self.offset = offset
+
+
+class FileEngine:
+
+
+    def __init__(self, fp: BinaryIO):
+        self.fp = fp
+
+
+    def seek(self, offset: int) -> None:
+        self.fp.seek(offset, os.SEEK_SET)
+
+
+    def tell(self) -> int:
+        return self.fp.tell()
+
+
+    def size(self) -> int:
+        offset = self.fp.tell()
+        size = self.fp.seek(0x0, os.SEEK_END)
+        self.fp.seek(offset, os.SEEK_SET)
+        return size
+
+
+    def swap(self, fmt: str) -> int:
+        size = struct.calcsize(fmt)
+        buff = self.fp.read(size)
+        buff = buff[::-1]
+        self.fp.seek(-size, os.SEEK_CUR)
+        self.fp.write(buff)
+        return struct.unpack(fmt, buff)[0]
+
+
+    def swap_record(self, layout: Layout) -> tuple:
+        buff = self.fp.read(layout.size)
+        values = layout.big.unpack(buff)
+        self.fp.seek(-layout.size, os.SEEK_CUR)
+        self.fp.write(layout.little.pack(*values))
+        return layout.pick(values)
+
+
+    def swap_words(self, count: int) -> array:
+        buff = self.fp.read(count * 0x4)
+        buff, values = byteswap_words(buff)
+        self.fp.seek(-len(buff), os.SEEK_CUR)
+        self.fp.write(buff)
+        return values
+
+
+    def swap_records(self, layout: Layout, count: int) -> array | None:
+        if layout.word_skips is None:
+            for _ in range(count):
+                self.swap_record(layout)
+            return None
+        buff = self.fp.read(count * layout.size)
+        buff, values = byteswap_words(buff, layout.size // 0x4, layout.word_skips)
+        self.fp.seek(-len(buff), os.SEEK_CUR)
+        self.fp.write(buff)
+        return values
+
+
+    def scan_actions(self, actions_offset: int, operands: list = None, classes: list = None) -> list[int]:
+        size = 0x1000
+        while True:
+            self.fp.seek(actions_offset, os.SEEK_SET)
+            buff = self.fp.read(size)
+            chunk_operands = [] if operands is not None else None
+            chunk_classes = [] if classes is not None else None
+            try:
+                actions_offsets = scan_actions(buff, 0, actions_offset, chunk_operands, chunk_classes)
+            except IndexError:
+                if len(buff) < size:
+                    raise
+                size *= 2
+                continue
+            if operands is not None:
+                operands.extend(chunk_operands)
+            if classes is not None:
+                classes.extend(chunk_classes)
+            return [actions_offset + offset for offset in actions_offsets]
+
+
+    def flush(self) -> None:
+        self.fp.flush()
+
+
+class BufferEngine:
+
+
+    def __init__(self, buff: bytearray | memoryview | mmap.mmap, fp: BinaryIO = None, source: bytes | mmap.mmap = None):
+        # values are read from the source and written to the buffer, which are the same when converting in place
+        self.buff = buff
+        self.source = buff if source is None else source
+        self.fp = fp
+        self.offset = 0
+
+
+    @classmethod
+    def from_file(cls, fp: BinaryIO) -> "BufferEngine":
+        fp.seek(0x0, os.SEEK_SET)
+        return cls(bytearray(fp.read()), fp)
+
+
+    @classmethod
+    def from_mmap(cls, fp: BinaryIO, access: int = mmap.ACCESS_WRITE) -> "BufferEngine":
+        return cls(mmap.mmap(fp.fileno(), 0, access=access))
+
+
+    def seek(self, offset: int) -> None:
+        self.offset = offset
+
+
+    def tell(self) -> int:
+        return self.offset
+
+
+    def size(self) -> int:
+        return len(self.buff)
+
+
+    def swap(self, fmt: str) -> int:
+        big, little = swap_structs(fmt)
+        offset = self.offset
+        value, = big.unpack_from(self.source, offset)
+        little.pack_into(self.buff, offset, value)
+        self.offset = offset + big.size
+        return value
+
+
+    def swap_record(self, layout: Layout) -> tuple:
+        offset = self.offset
+        values = layout.big.unpack_from(self.source, offset)
+        layout.little.pack_into(self.buff, offset, *values)
+        self.offset = offset + layout.size
+        return layout.pick(values)
+
+
+    def swap_words(self, count: int) -> array:
+        offset = self.offset
+        end = offset + count * 0x4
+        self.buff[offset:end], values = byteswap_words(self.source[offset:end])
+        self.offset = end
+        return values
+
+
+    def swap_records(self, layout: Layout, count: int) -> array | None:
+        if layout.word_skips is None:
+            for _ in range(count):
+                self.swap_record(layout)
+            return None
+        offset = self.offset
+        end = offset + count * layout.size
+        self.buff[offset:end], values = byteswap_words(self.source[offset:end], layout.size // 0x4, layout.word_skips)
+        self.offset = end
+        return values
+
+
+    def scan_actions(self, actions_offset: int, operands: list = None, classes: list = None) -> list[int]:
+        return scan_actions(self.source, actions_offset, 0, operands, classes)
+
+
+    def flush(self) -> None:
+        if self.fp is not None:
+            self.fp.seek(0x0, os.SEEK_SET)
+            self.fp.write(self.buff)
+            self.fp.flush()
+        elif isinstance(self.buff, mmap.mmap):
+            self.buff.flush()
+
+
+class SwapPlan:
+
+
+    MAGIC = b"APTR"
+    HEADER = struct.Struct("<4sLL")
+
+
+    def __init__(self, halves: array = None, words: array = None):
+        # runs of halves and words to swap, coalesced while planning so the plan stays compact
+        self.halves = halves if halves is not None else array(WORD_TYPECODE)
+        self.words = words if words is not None else array(WORD_TYPECODE)
+
+
+    def apply(self, buff: bytearray | memoryview | mmap.mmap) -> None:
+        # runs are swapped in the order they were planned, without sorting them,
+        # items planned twice are swapped back like in place
+        for runs, typecode in [(self.halves, "H"), (self.words, WORD_TYPECODE)]:
+            for start, end in zip(runs[0::2], runs[1::2]):
+                items = array(typecode)
+                items.frombytes(buff[start:end])
+                items.byteswap()
+                buff[start:end] = items.tobytes()
+
+
+    def swapped_size(self) -> int:
+        return sum(self.halves[1::2]) - sum(self.halves[0::2]) + sum(self.words[1::2]) - sum(self.words[0::2])
+
+
+    def save(self, fp: BinaryIO) -> None:
+        halves = array(WORD_TYPECODE, self.halves)
+        words = array(WORD_TYPECODE, self.words)
+        if sys.byteorder == "big":
+            halves.byteswap()
+            words.byteswap()
+        fp.write(SwapPlan.HEADER.pack(SwapPlan.MAGIC, len(halves) // 2, len(words) // 2))
+        fp.write(halves.tobytes())
+        fp.write(words.tobytes())
+
+
+    @classmethod
+    def load(cls, fp: BinaryIO) -> "SwapPlan":
+        magic, halves_count, words_count = SwapPlan.HEADER.unpack(fp.read(SwapPlan.HEADER.size))
+        if magic != SwapPlan.MAGIC:
+            raise ValueError("Not a swap plan.")
+        halves = array(WORD_TYPECODE, fp.read(halves_count * 0x8))
+        words = array(WORD_TYPECODE, fp.read(words_count * 0x8))
+        if sys.byteorder == "big":
+            halves.byteswap()
+            words.byteswap()
+        return cls(halves, words)
+
+
+    def to_dict(self) -> dict:
+        return {
+            "halves": sorted(map(list, zip(self.halves[0::2], self.halves[1::2]))),
+            "words": sorted(map(list, zip(self.words[0::2], self.words[1::2]))),
+        }
+
+
+class PlanEngine(BufferEngine):
+
+
+    def __init__(self, buff: bytearray | memoryview | mmap.mmap, fp: BinaryIO = None):
+        super().__init__(buff, fp)
+        self.plan = SwapPlan()
+
+
+    def swap(self, fmt: str) -> int:
+        big, _ = swap_structs(fmt)
+        offset = self.offset
+        value, = big.unpack_from(self.source, offset)
+        if big.size == 0x4:
+            add_run(self.plan.words, offset, offset + 0x4)
+        elif big.size == 0x2:
+            add_run(self.plan.halves, offset, offset + 0x2)
+        self.offset = offset + big.size
+        return value
+
+
+    def swap_record(self, layout: Layout) -> tuple:
+        offset = self.offset
+        values = layout.big.unpack_from(self.source, offset)
+        for start, end in layout.half_runs:
+            add_run(self.plan.halves, offset + start, offset + end)
+        for start, end in layout.word_runs:
+            add_run(self.plan.words, offset + start, offset + end)
+        self.offset = offset + layout.size
+        return layout.pick(values)
+
+
+    def swap_words(self, count: int) -> array:
+        offset = self.offset
+        end = offset + count * 0x4
+        _, values = byteswap_words(self.source[offset:end])
+        if count:
+            add_run(self.plan.words, offset, end)
+        self.offset = end
+        return values
+
+
+    def swap_records(self, layout: Layout, count: int) -> array | None:
+        offset = self.offset
+        end = offset + count * layout.size
+        for runs, record_runs in [(self.plan.halves, layout.half_runs), (self.plan.words, layout.word_runs)]:
+            if count and record_runs == [(0, layout.size)]: # records swapped whole are a single run
+                add_run(runs, offset, end)
+                continue
+            for start, stop in record_runs:
+                runs.extend(itertools.chain.from_iterable(zip(range(offset + start, end, layout.size), range(offset + stop, end + stop, layout.size))))
+        self.offset = end
+        if layout.word_skips is None:
+            return None
+        _, values = byteswap_words(self.source[offset:end])
+        return values
+
+
+    def flush(self) -> None:
+        self.plan.apply(self.buff)
+        super().flush()
+
+
+class Profile:
+
+
+    def __init__(self):
+        self.sections = {}
+        self.actions_classes = {}
+        self.nodes = 0
+        self.stack = []
+        self.section = self.get_section("other")
+        self.started = time.perf_counter()
+
+
+    def get_section(self, name: str) -> dict:
+        section = self.sections.get(name)
+        if section is None:
+            section = self.sections[name] = {"calls": 0, "seconds": 0.0, "bytes_swapped": 0, "seeks": 0}
+        return section
+
+
+    def wrap_engine(self, engine: "FileEngine | BufferEngine") -> "ProfilingEngine":
+        return ProfilingEngine(engine, self)
+
+
+    def wrap_visit(self, visit: Callable[[str, int], bool]) -> Callable[[str, int], bool]:
+        # tables are visited too, only the first visit of a node counts
+        def wrapped(kind: str, offset: int) -> bool:
+            first = visit(kind, offset)
+            if first and kind in NODE_KINDS:
+                self.nodes += 1
+            return first
+        return wrapped
+
+
+    def wrap(self, name: str, fn: Callable) -> Callable:
+        def wrapped(*args):
+            self.enter(name)
+            try:
+                return fn(*args)
+            finally:
+                self.exit()
+        return wrapped
+
+
+    def enter(self, name: str) -> None:
+        now = time.perf_counter()
+        self.section["seconds"] += now - self.started
+        self.stack.append(self.section)
+        self.section = self.get_section(name)
+        self.section["calls"] += 1
+        self.started = now
+
+
+    def exit(self) -> None:
+        now = time.perf_counter()
+        self.section["seconds"] += now - self.started
+        self.section = self.stack.pop()
+        self.started = now
+
+
+    def count_actions(self, classes: list[int], operands: list[tuple[int, Layout]]) -> None:
+        for number in classes:
+            actions_class = self.get_actions_class(number)
+            actions_class["count"] += 1
+        for _, layout in operands:
+            actions_class = self.get_actions_class(ACTIONS_LAYOUTS_CLASSES[id(layout)])
+            actions_class["bytes_swapped"] += layout.swapped_size
+
+
+    def get_actions_class(self, number: int) -> dict:
+        name = f"0x{number:02X}"
+        actions_class = self.actions_classes.get(name)
+        if actions_class is None:
+            actions_class = self.actions_classes[name] = {"count": 0, "bytes_swapped": 0}
+        return actions_class
+
+
+    def to_dict(self) -> dict:
+        self.section["seconds"] += time.perf_counter() - self.started
+        self.started = time.perf_counter()
+        return {
+            "files": 1,
+            "sections": {name: dict(section) for name, section in self.sections.items()},
+            "actions_classes": {name: dict(actions_class) for name, actions_class in sorted(self.actions_classes.items())},
+            "totals": {
+                "seconds": sum(section["seconds"] for section in self.sections.values()),
+                "bytes_swapped": sum(section["bytes_swapped"] for section in self.sections.values()),
+                "seeks": sum(section["seeks"] for section in self.sections.values()),
+                "nodes": self.nodes,
+            },
+        }
+
+
+    @staticmethod
+    def merge(profiles: list[dict]) -> dict:
+        merged = {"files": 0, "sections": {}, "actions_classes": {}, "totals": {}}
+        for profile in profiles:
+            merged["files"] += profile["files"]
+            for key in ["sections", "actions_classes"]:
+                for name, counters in profile[key].items():
+                    merged_counters = merged[key].setdefault(name, dict.fromkeys(counters, 0))
+                    for counter, value in counters.items():
+                        merged_counters[counter] += value
+            for counter, value in profile["totals"].items():
+                merged["totals"][counter] = merged["totals"].get(counter, 0) + value
+        return merged
+
+
+# byte counters are incremented and decremented a whole slice at a time
+INCREMENT = bytes(min(i + 1, 0xFF) for i in range(0x100))
+DECREMENT = bytes(max(i - 1, 0) for i in range(0x100))
+OVERLAPPED = bytes(1 if i > 1 else 0 for i in range(0x100))
+
+
+class Coverage(Profile):
+
+
+    def __init__(self, size: int):
+        super().__init__()
+        self.counts = bytearray(size) # times every byte was swapped
+        self.overlaps = []
+
+
+    def get_section(self, name: str) -> dict:
+        section = super().get_section(name)
+        section.setdefault("overlaps", 0)
+        return section
+
+
+    def wrap_engine(self, engine: "FileEngine | BufferEngine") -> "CoverageEngine":
+        return CoverageEngine(engine, self)
+
+
+    # sections are only tracked for attribution, timing them would double the cost of verifying
+    def enter(self, name: str) -> None:
+        self.stack.append(self.section)
+        self.section = self.get_section(name)
+        self.section["calls"] += 1
+
+
+    def exit(self) -> None:
+        self.section = self.stack.pop()
+
+
+    def mark(self, offset: int, size: int, count: int = 1, gaps: list[int] = ()) -> None:
+        end = offset + size * count
+        counts = self.counts
+        self.section["bytes_swapped"] += (size - len(gaps)) * count
+        region = counts[offset:end]
+        swapped = region.count(0) != end - offset
+        counts[offset:end] = region.translate(INCREMENT)
+        for gap in gaps:
+            counts[offset + gap:end:size] = counts[offset + gap:end:size].translate(DECREMENT)
+        # the gaps of a record may have been covered before without overlapping it
+        if swapped and counts[offset:end].translate(OVERLAPPED).count(0) != end - offset:
+            self.section["overlaps"] += 1
+            self.overlaps.append((offset, end))
+
+
+    def to_dict(self) -> dict:
+        profile = super().to_dict()
+        size = len(self.counts)
+        covered = size - self.counts.count(0)
+        overlapped = size - self.counts.translate(OVERLAPPED).count(0)
+        profile["totals"].update(size=size, covered=covered, overlapped=overlapped)
+        profile["overlaps"] = [{"start": start, "end": end} for start, end in self.overlaps[:0x100]]
+        return profile
+
+
+class ProfilingEngine:
+
+
+    def __init__(self, engine: FileEngine | BufferEngine, profile: Profile):
+        self.engine = engine
+        self.profile = profile
+        self.tell = engine.tell
+
+
+    def seek(self, offset: int) -> None:
+        self.profile.section["seeks"] += 1
+        self.engine.seek(offset)
+
+
+    def swap(self, fmt: str) -> int:
+        value = self.engine.swap(fmt)
+        big, _ = swap_structs(fmt)
+        if big.size > 1:
+            self.profile.section["bytes_swapped"] += big.size
+        return value
+
+
+    def swap_record(self, layout: Layout) -> tuple:
+        self.profile.section["bytes_swapped"] += layout.swapped_size
+        return self.engine.swap_record(layout)
+
+
+    def swap_words(self, count: int) -> array:
+        self.profile.section["bytes_swapped"] += count * 0x4
+        return self.engine.swap_words(count)
+
+
+    def swap_records(self, layout: Layout, count: int) -> array | None:
+        self.profile.section["bytes_swapped"] += count * layout.swapped_size
+        return self.engine.swap_records(layout, count)
+
+
+    def scan_actions(self, actions_offset: int, operands: list = None, classes: list = None) -> list[int]:
+        classes = [] if classes is None else classes
+        operands = [] if operands is None else operands
+        actions_offsets = self.engine.scan_actions(actions_offset, operands, classes)
+        self.profile.count_actions(classes, operands)
+        return actions_offsets
+
+
+class CoverageEngine:
+
+
+    def __init__(self, engine: FileEngine | BufferEngine, coverage: Coverage):
+        # only swaps are marked, everything else goes straight to the engine
+        self.engine = engine
+        self.coverage = coverage
+        self.seek = engine.seek
+        self.tell = engine.tell
+        self.scan_actions = engine.scan_actions
+
+
+    def swap(self, fmt: str) -> int:
+        big, _ = swap_structs(fmt)
+        if big.size > 1:
+            self.coverage.mark(self.engine.tell(), big.size)
+        return self.engine.swap(fmt)
+
+
+    def swap_record(self, layout: Layout) -> tuple:
+        self.coverage.mark(self.engine.tell(), layout.size, 1, layout.gaps)
+        return self.engine.swap_record(layout)
+
+
+    def swap_words(self, count: int) -> array:
+        self.coverage.mark(self.engine.tell(), 0x4, count)
+        return self.engine.swap_words(count)
+
+
+    def swap_records(self, layout: Layout, count: int) -> array | None:
+        self.coverage.mark(self.engine.tell(), layout.size, count, layout.gaps)
+        return self.engine.swap_records(layout, count)
+
+
+ENGINES = {
+    "file": FileEngine,
+    "buffer": BufferEngine.from_file,
+    "mmap": BufferEngine.from_mmap,
+    "plan": PlanEngine.from_file,
+}
+
+
+VALIDATIONS = ["fast", "strict"]
+
+
+class AptFileConverter:
+
+
+    def __init__(self, fp: BinaryIO, engine: str | FileEngine | BufferEngine = "buffer", profile: Profile = None, validation: str = "fast"):
+        if validation not in VALIDATIONS:
+            raise ValueError(f"Unknown validation {validation}.")
+        self.fp = fp
+        self.engine = ENGINES[engine](fp) if isinstance(engine, str) else engine
+        self.profile = profile
+        # fast only checks what the traversal cannot go on without, known types and tables inside the file,
+        # strict also checks NULL fields, bounds of every followed offset and nodes reached as different kinds
+        self.strict = validation == "strict"
+        self.size = self.engine.size()
+        self.kinds = {}
+        self.bind(self.engine if profile is None else profile.wrap_engine(self.engine))
+        self.apt_data_offset = None
+        self.const_file_offset = None
+        self.geometry_offset = None
+        self.movie_offset = None
+        self.queue = []
+        self.visited = defaultdict(set)
+        self.skipped_duplicates = 0
+
+        if profile is not None:
+            self.instrument(profile)
+
+
+    def bind(self, engine: FileEngine | BufferEngine | ProfilingEngine) -> None:
+        self.seek = engine.seek
+        self.tell = engine.tell
+        self.swap = engine.swap
+        self.swap_record = engine.swap_record
+        self.swap_words = engine.swap_words
+        self.swap_records = engine.swap_records
+        self.scan_actions = engine.scan_actions
+
+
+    def instrument(self, profile: Profile) -> None:
+        # instance level tables shadow the class level ones, so nothing is wrapped without a profile
+        self.CHARACTERS_FUNCTIONS = {key: profile.wrap(fn.__name__, fn) for key, fn in AptFileConverter.CHARACTERS_FUNCTIONS.items()}
+        self.FRAME_ITEMS_FUNCTION = {key: profile.wrap(fn.__name__, fn) for key, fn in AptFileConverter.FRAME_ITEMS_FUNCTION.items()}
+        self.NODES_FUNCTIONS = {kind: (profile.wrap(fn.__name__, fn), relative, size) for kind, (fn, relative, size) in AptFileConverter.NODES_FUNCTIONS.items()}
+        for name in ["convert_header", "convert_const_file", "convert_frames", "convert_geometry"]:
+            setattr(self, name, profile.wrap(name, getattr(self, name)))
+        self.visit = profile.wrap_visit(self.visit)
+
+
+    def convert(self) -> None:
+        self.traverse()
+        self.engine.flush()
+
+
+    def traverse(self) -> None:
+        self.convert_header()
+        self.convert_const_file()
+        self.push("character", self.movie_offset)
+        self.convert_geometry()
+        self.run()
+
+
+    def convert_top_level(self, done: Callable[[str], None] = lambda section: None) -> list[tuple[int, str, int]]:
+        # converts the top level tables only and hands back the nodes queued below them in file order,
+        # done is called after each section
+        self.convert_header()
+        done("header")
+        self.convert_const_file()
+        done("const file")
+        self.visit("character", self.apt_data_offset + self.movie_offset)
+        self.convert_character(self.movie_offset)
+        done("movie")
+        self.convert_geometry()
+        done("geometry")
+
+        nodes = sorted(self.queue)
+        self.queue = []
+        return nodes
+
+
+    def split(self, count: int) -> list[list[tuple[int, str, int]]]:
+        # the subtrees below the top level tables are handed out in contiguous units
+        nodes = self.convert_top_level()
+        size = -(-len(nodes) // count) if nodes else 1
+        return [nodes[i:i + size] for i in range(0, len(nodes), size)]
+
+
+    def state(self) -> tuple:
+        return self.apt_data_offset, self.const_file_offset, self.geometry_offset, self.movie_offset, dict(self.visited)
+
+
+    def restore(self, state: tuple) -> None:
+        self.apt_data_offset, self.const_file_offset, self.geometry_offset, self.movie_offset, visited = state
+        self.visited = defaultdict(set, {kind: set(offsets) for kind, offsets in visited.items()})
+
+
+    def push(self, kind: str, offset: int) -> None:
+        if offset == 0:
+            return
+
+        _, relative, size = AptFileConverter.NODES_FUNCTIONS[kind]
+        absolute_offset = self.apt_data_offset + offset if relative else offset
+        if self.strict:
+            self.check_node(kind, absolute_offset, size)
+        if self.visit(kind, absolute_offset):
+            heapq.heappush(self.queue, (absolute_offset, kind, offset))
+
+
+    def run(self) -> None:
+        while self.queue:
+            _, kind, offset = heapq.heappop(self.queue)
+            fn, _, _ = self.NODES_FUNCTIONS[kind]
+            fn(self, offset)
+
+
+    def check_node(self, kind: str, offset: int, size: int) -> None:
+        if offset + size > self.size:
+            raise AptFormatError(f"The {kind} is past the end of the file.", offset)
+        other = self.kinds.setdefault(offset, kind)
+        # an offset pointing at the wrong kind of node, cycles through nodes of one kind,
+        # such as movies listing each other, only end at the visited sets and are not reported
+        if other != kind:
+            raise AptFormatError(f"The {kind} is also reached as a {other}.", offset)
+
+
+    def check_table(self, name: str, offset: int, count: int, stride: int, record_offset: int) -> None:
+        if count and offset + count * stride > self.size:
+            raise AptFormatError(f"The {count} {name} at 0x{offset:X} are past the end of the file.", record_offset)
+
+
+    def visit(self, kind: str, offset: int) -> bool:
+        visited = self.visited[kind]
+        if offset in visited:
+            self.skipped_duplicates += 1
+            return False
+        visited.add(offset)
+        return True
+
+
+    def share(self, claims: mmap.mmap) -> None:
+        self.claims = claims
+        self.visit = self.visit_shared
+
+
+    def visit_shared(self, kind: str, offset: int) -> bool:
+        if not AptFileConverter.visit(self, kind, offset):
+            return False
+        if offset >= len(self.claims): # left to the bounds checks
+            return True
+        # the first worker reaching a node or table writes its kind at its offset in the claims shared by every worker,
+        # two workers reaching it at the same time both convert it, from the untouched source to the same bytes
+        claimed = self.claims[offset]
+        if claimed == VISIT_KINDS[kind]:
+            self.skipped_duplicates += 1
+            return False
+        if claimed == 0:
+            self.claims[offset] = VISIT_KINDS[kind]
+        return True
+
+
+    def visit_table(self, kind: str, offset: int, count: int) -> bool:
+        # tables shared by several records are only swapped once, like nodes
+        return count != 0 and self.visit(kind, offset)
+
+
+    def convert_header(self) -> None:
+        self.seek(0x0)
+        self.apt_data_offset, self.const_file_offset, self.geometry_offset = self.swap_record(HEADER_LAYOUT)
+        self.check_table("apt data bytes", self.apt_data_offset, 1, 0x1, 0x0)
+        self.check_table("const file bytes", self.const_file_offset, 1, CONST_FILE_LAYOUT.size, 0x0)
+        self.check_table("geometry bytes", self.geometry_offset, 1, GEOMETRY_LAYOUT.size, 0x0)
+
+
+    def convert_character(self, character_offset: int) -> None:
+        self.seek(self.apt_data_offset + character_offset)
+        character_type, null = self.swap_record(CHARACTER_LAYOUT)
+        if self.strict and null != 0:
+            raise AptFormatError("Should be NULL.", self.apt_data_offset + character_offset)
+
+        fn = self.CHARACTERS_FUNCTIONS.get(character_type)
+        if fn is None:
+            raise AptFormatError(f"Character {character_type} should be unused.", self.apt_data_offset + character_offset)
+        fn(self, character_offset + 0x10)
+
+
+    def convert_character_shape(self, character_offset: int) -> None:
+        self.seek(self.apt_data_offset + character_offset)
+        self.swap_record(CHARACTER_SHAPE_LAYOUT)
+
+
+    def convert_character_text(self, character_offset: int) -> None:
+        self.seek(self.apt_data_offset + character_offset)
+        self.swap_record(CHARACTER_TEXT_LAYOUT)
+
+
+    def convert_character_font(self, character_offset: int) -> None:
+        self.seek(self.apt_data_offset + character_offset)
+        null, = self.swap_record(CHARACTER_FONT_LAYOUT)
+        if self.strict and null != 0:
+            raise AptFormatError("Should be NULL.", self.apt_data_offset + character_offset)
+
+
+    def convert_character_sprite(self, character_offset: int) -> None:
+        self.seek(self.apt_data_offset + character_offset)
+        frames_count, frames_offset, null = self.swap_record(CHARACTER_SPRITE_LAYOUT)
+        offset = self.apt_data_offset + character_offset
+        if self.strict and null != 0:
+            raise AptFormatError("Should be NULL.", offset)
+        self.check_table("frames", self.apt_data_offset + frames_offset, frames_count, 0x8, offset)
+
+        self.convert_frames(frames_offset, frames_count)
+
+
+    def convert_character_image(self, character_offset: int) -> None:
+        self.seek(self.apt_data_offset + character_offset)
+        self.swap_record(CHARACTER_IMAGE_LAYOUT)
+
+
+    def convert_character_movie(self, character_offset: int) -> None:
+        self.seek(self.apt_data_offset + character_offset)
+        (
+            frames_count, frames_offset, null,
+            characters_count, characters_offsets,
+            imports_count, imports_offset,
+            exports_count, exports_offset,
+        ) = self.swap_record(CHARACTER_MOVIE_LAYOUT)
+        offset = self.apt_data_offset + character_offset
+        if self.strict and null != 0:
+            raise AptFormatError("Should be NULL.", offset)
+        self.check_table("frames", self.apt_data_offset + frames_offset, frames_count, 0x8, offset)
+        self.check_table("characters", self.apt_data_offset + characters_offsets, characters_count, 0x4, offset)
+        self.check_table("imports", self.apt_data_offset + imports_offset, imports_count, 0x10, offset)
+        self.check_table("exports", self.apt_data_offset + exports_offset, exports_count, 0x8, offset)
+
+        self.convert_frames(frames_offset, frames_count)
+
+        if self.visit_table("characters_offsets", self.apt_data_offset + characters_offsets, characters_count):
+            self.seek(self.apt_data_offset + characters_offsets)
+            for character_offset in self.swap_words(characters_count):
+                if character_offset != self.movie_offset: # skip movie to prevent endless recursion
+                    self.push("character", character_offset)
+
+        # imports and exports are dense tables of words, swapped as whole blocks
+        if self.visit_table("imports", self.apt_data_offset + imports_offset, imports_count):
+            self.seek(self.apt_data_offset + imports_offset)
+            imports = self.swap_records(IMPORT_LAYOUT, imports_count)
+            if self.strict:
+                for i, null in enumerate(IMPORT_LAYOUT.column(imports, "null")):
+                    if null != 0:
+                        raise AptFormatError("Should be NULL.", self.apt_data_offset + imports_offset + i * IMPORT_LAYOUT.size)
+
+        if self.visit_table("exports", self.apt_data_offset + exports_offset, exports_count):
+            self.seek(self.apt_data_offset + exports_offset)
+            self.swap_records(EXPORT_LAYOUT, exports_count)
+
+
+    def convert_frames(self, frames_offset: int, frames_count: int) -> None:
+        # runs of frames not reached before are swapped as whole blocks, then only their frame items columns are read
+        start = 0
+        for i in range(frames_count + 1):
+            if i < frames_count:
+                frame_offset = self.apt_data_offset + frames_offset + i * FRAME_LAYOUT.size
+                if self.strict:
+                    self.check_node("frame", frame_offset, FRAME_LAYOUT.size)
+                if self.visit("frame", frame_offset): # extends the current run
+                    continue
+            if i > start:
+                self.seek(self.apt_data_offset + frames_offset + start * FRAME_LAYOUT.size)
+                frames = self.swap_records(FRAME_LAYOUT, i - start)
+                counts = FRAME_LAYOUT.column(frames, "frame_items_count")
+                offsets = FRAME_LAYOUT.column(frames, "frame_items_offsets")
+                for j, (frame_items_count, frame_items_offsets) in enumerate(zip(counts, offsets), start):
+                    self.convert_frame_items(frames_offset + j * FRAME_LAYOUT.size, frame_items_count, frame_items_offsets)
+            start = i + 1
+
+
+    def convert_frame_items(self, frame_offset: int, frame_items_count: int, frame_items_offsets: int) -> None:
+        self.check_table("frame items", self.apt_data_offset + frame_items_offsets, frame_items_count, 0x4, self.apt_data_offset + frame_offset)
+        if not self.visit_table("frame_items_offsets", self.apt_data_offset + frame_items_offsets, frame_items_count):
+            return
+
+        self.seek(self.apt_data_offset + frame_items_offsets)
+        for frame_item_offset in self.swap_words(frame_items_count):
+            self.push("frame_item", frame_item_offset)
+
+
+    def convert_frame_item(self, frame_item_offset: int) -> None:
+        self.seek(self.apt_data_offset + frame_item_offset)
+        frame_item_type = self.swap("<L")
+
+        fn = self.FRAME_ITEMS_FUNCTION.get(frame_item_type)
+        if fn is None:
+            raise AptFormatError(f"Frame item {frame_item_type} should be unused.", self.apt_data_offset + frame_item_offset)
+        fn(self, frame_item_offset + 0x4)
+
+
+    def convert_frame_item_action(self, frame_item_offset: int) -> None:
+        self.seek(self.apt_data_offset + frame_item_offset)
+        actions_offset, = self.swap_record(FRAME_ITEM_ACTION_LAYOUT)
+        
+        self.push("actions", actions_offset)
+
+
+    def convert_frame_item_frame_label(self, frame_item_offset: int) -> None:
+        self.seek(self.apt_data_offset + frame_item_offset)
+        self.swap_record(FRAME_ITEM_FRAME_LABEL_LAYOUT)
+
+
+    def convert_frame_item_place_object(self, frame_item_offset: int) -> None:
+        self.seek(self.apt_data_offset + frame_item_offset)
+        clip_actions_offset, = self.swap_record(FRAME_ITEM_PLACE_OBJECT_LAYOUT)
+        
+        self.push("clip_actions", clip_actions_offset)
+
+
+    def convert_clip_actions(self, clip_actions_offset: int) -> None:
+        self.seek(self.apt_data_offset + clip_actions_offset)
+        clip_action_records_count, clip_action_records_offset = self.swap_record(CLIP_ACTIONS_LAYOUT)
+        self.check_table("clip action records", self.apt_data_offset + clip_action_records_offset, clip_action_records_count, 0xC, self.apt_data_offset + clip_actions_offset)
+        if not self.visit_table("clip_action_records", self.apt_data_offset + clip_action_records_offset, clip_action_records_count):
+            return
+
+        for i in range(clip_action_records_count):
+            clip_action_record_offset = clip_action_records_offset + i * 0xC
+            self.convert_clip_action_record(clip_action_record_offset)
+
+
+    def convert_clip_action_record(self, clip_action_record_offset: int) -> None:
+        self.seek(self.apt_data_offset + clip_action_record_offset)
+        actions_offset, = self.swap_record(CLIP_ACTION_RECORD_LAYOUT)
+
+        self.push("actions", actions_offset)
+
+
+    def convert_frame_item_remove_object(self, frame_item_offset: int) -> None:
+        self.seek(self.apt_data_offset + frame_item_offset)
+        self.swap_record(FRAME_ITEM_REMOVE_OBJECT_LAYOUT)
+
+
+    def convert_frame_item_background_color(self, frame_item_offset: int) -> None:
+        self.seek(self.apt_data_offset + frame_item_offset)
+        self.swap_record(FRAME_ITEM_BACKGROUND_COLOR_LAYOUT)
+
+
+    def convert_frame_item_init_action(self, frame_item_offset: int) -> None:
+        self.seek(self.apt_data_offset + frame_item_offset)
+        actions_offset, = self.swap_record(FRAME_ITEM_INIT_ACTION_LAYOUT)
+        
+        self.push("actions", actions_offset)
+
+
+    def convert_actions(self, actions_offset: int) -> None:
+        operands = []
+        try:
+            self.scan_actions(self.apt_data_offset + actions_offset, operands)
+        except IndexError:
+            if not self.strict:
+                raise
+            raise AptFormatError("The actions are not terminated before the end of the file.", self.apt_data_offset + actions_offset) from None
+        if operands:
+            operands_offset, layout = operands[-1]
+            self.check_table("action operands", operands_offset, 1, layout.size, self.apt_data_offset + actions_offset)
+        for operands_offset, layout in operands:
+            self.seek(operands_offset)
+            self.swap_record(layout)
+
+
+    def convert_const_file(self) -> None:
+        self.seek(self.const_file_offset)
+        self.movie_offset, constants_count, constants_offset = self.swap_record(CONST_FILE_LAYOUT)
+        self.check_table("constants", self.const_file_offset + constants_offset, constants_count, 0x8, self.const_file_offset)
+        if self.strict:
+            self.check_node("character", self.apt_data_offset + self.movie_offset, CHARACTER_LAYOUT.size + CHARACTER_MOVIE_LAYOUT.size)
+
+        # the whole constant pool is swapped as one block
+        self.seek(self.const_file_offset + constants_offset)
+        self.swap_records(CONSTANT_LAYOUT, constants_count)
+
+
+    def convert_geometry(self) -> None:
+        self.seek(self.geometry_offset)
+        geometry_records_count, geometry_records_offsets = self.swap_record(GEOMETRY_LAYOUT)
+        self.check_table("geometry records", geometry_records_offsets, geometry_records_count, 0x4, self.geometry_offset)
+
+        self.seek(geometry_records_offsets)
+        for geometry_record_offset in self.swap_words(geometry_records_count):
+            self.push("geometry_record", geometry_record_offset)
+
+
+    def convert_geometry_record(self, geometry_record_offset: int) -> None:
+        self.seek(geometry_record_offset)
+        geometry_data_count, geometry_data_offsets = self.swap_record(GEOMETRY_RECORD_LAYOUT)
+        self.check_table("geometry data", geometry_data_offsets, geometry_data_count, 0x4, geometry_record_offset)
+        if not self.visit_table("geometry_data_offsets", geometry_data_offsets, geometry_data_count):
+            return
+
+        self.seek(geometry_data_offsets)
+        for geometry_data_offset in self.swap_words(geometry_data_count):
+            self.push("geometry_data", geometry_data_offset)
+
+
+    def convert_geometry_data(self, geometry_data_offset: int) -> None:
+        self.seek(geometry_data_offset)
+        vertices_count, vertices_offsets = self.swap_record(GEOMETRY_DATA_LAYOUT)
+        self.check_table("vertices", vertices_offsets, vertices_count, 0x4, geometry_data_offset)
+        if not self.visit_table("vertices_offsets", vertices_offsets, vertices_count):
+            return
+
+        self.seek(vertices_offsets)
+        self.convert_vertices(self.swap_words(vertices_count))
+
+
+    def convert_vertices(self, vertices_offsets: array) -> None:
+        # vertices are usually laid out back to back, so swap whole runs of them at once
+        vertices_offsets = [vertex_offset for vertex_offset in vertices_offsets if vertex_offset != 0 and self.visit("vertex", vertex_offset)]
+        if vertices_offsets:
+            last_offset = max(vertices_offsets)
+            self.check_table("vertices", last_offset, 1, VERTEX_LAYOUT.size, last_offset)
+        for start, end in find_runs(vertices_offsets, VERTEX_LAYOUT.size):
+            self.seek(start)
+            self.swap_records(VERTEX_LAYOUT, (end - start) // VERTEX_LAYOUT.size)
+
+
+# dispatch tables, built once when the module is imported
+AptFileConverter.CHARACTERS_FUNCTIONS = {
+    1: AptFileConverter.convert_character_shape,
+    2: AptFileConverter.convert_character_text,
+    3: AptFileConverter.convert_character_font,
+    5: AptFileConverter.convert_character_sprite,
+    7: AptFileConverter.convert_character_image,
+    9: AptFileConverter.convert_character_movie,
+}
+
+AptFileConverter.FRAME_ITEMS_FUNCTION = {
+    1: AptFileConverter.convert_frame_item_action,
+    2: AptFileConverter.convert_frame_item_frame_label,
+    3: AptFileConverter.convert_frame_item_place_object,
+    4: AptFileConverter.convert_frame_item_remove_object,
+    5: AptFileConverter.convert_frame_item_background_color,
+    8: AptFileConverter.convert_frame_item_init_action,
+}
+
+# node kind: (function, whether the offset is relative to apt data, size of its first record)
+AptFileConverter.NODES_FUNCTIONS = {
+    "character": (AptFileConverter.convert_character, True, 0x10),
+    "frame_item": (AptFileConverter.convert_frame_item, True, 0x4),
+    "clip_actions": (AptFileConverter.convert_clip_actions, True, 0x8),
+    "actions": (AptFileConverter.convert_actions, True, 0x1),
+    "geometry_record": (AptFileConverter.convert_geometry_record, False, 0xC),
+    "geometry_data": (AptFileConverter.convert_geometry_data, False, 0x18),
+}
+
+# frames and vertices are converted a table or a run at a time, but are visited one by one like the other nodes
+NODE_KINDS = [*AptFileConverter.NODES_FUNCTIONS, "frame", "vertex"]
+
+# every kind of node and table passed to visit, numbered for the claims of the workers converting units of one file
+VISIT_KINDS = {kind: number for number, kind in enumerate([
+    *NODE_KINDS,
+    "characters_offsets", "imports", "exports", "frame_items_offsets", "clip_action_records", "geometry_data_offsets", "vertices_offsets",
+], 1)}
+
+
+def plan_file(fp: BinaryIO) -> SwapPlan:
+    converter = AptFileConverter(fp, "plan")
+    converter.traverse()
+    return converter.engine.plan
+
+
+# converter of every worker process, it keeps its visited nodes across the units it converts
+UNIT_CONVERTER = None
+
+
+def init_unit_worker(source: str, destination: str, claims: str, state: tuple, validation: str) -> None:
+    global UNIT_CONVERTER
+    fp = open(source, "rb")
+    output_fp = open(destination, "r+b")
+    claims_fp = open(claims, "r+b")
+    engine = BufferEngine(mmap.mmap(output_fp.fileno(), 0), source=mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ))
+    UNIT_CONVERTER = AptFileConverter(fp, engine, validation=validation)
+    UNIT_CONVERTER.restore(state)
+    UNIT_CONVERTER.share(mmap.mmap(claims_fp.fileno(), 0))
+
+
+def convert_unit(unit: list[tuple[int, str, int]]) -> int:
+    converter = UNIT_CONVERTER
+    skipped_duplicates = converter.skipped_duplicates
+    converter.queue = list(unit)
+    heapq.heapify(converter.queue)
+    converter.run()
+    return converter.skipped_duplicates - skipped_duplicates
+
+
+def convert_parallel(source: str, destination: str, jobs: int = None, mode: int = 0o644, validation: str = "fast") -> int:
+    # every worker reads the untouched source and writes into the shared output mapping,
+    # nodes and tables reached from several units are claimed by the first worker reaching them
+    jobs = jobs or os.cpu_count()
+    with open(source, "rb") as fp, mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as buff:
+        with atomic_output(destination, mode) as output_fp, tempfile.NamedTemporaryFile(suffix=".claims") as claims_fp:
+            output_fp.truncate(len(buff))
+            claims_fp.truncate(len(buff))
+            with mmap.mmap(output_fp.fileno(), len(buff)) as output:
+                output[:] = buff
+                converter = AptFileConverter(fp, BufferEngine(output, source=buff), validation=validation)
+                units = converter.split(jobs * 4) # more units than workers to even out the subtree sizes
+                initargs = (source, output_fp.name, claims_fp.name, converter.state(), validation)
+                with concurrent.futures.ProcessPoolExecutor(jobs, initializer=init_unit_worker, initargs=initargs) as executor:
+                    skipped_duplicates = converter.skipped_duplicates + sum(executor.map(convert_unit, units))
+                output.flush()
+    return skipped_duplicates
+
+
+def check_header(size: int, read: Callable[[int, int], bytes], prefix: str) -> bool:
+    header = read(0x0, 0x18)
+    if len(header) < 0x18:
+        return False
+    _, _, apt_data_offset, const_file_offset, geometry_offset, _ = struct.unpack(prefix + "6L", header)
+    if apt_data_offset % 0x4 or const_file_offset % 0x4 or geometry_offset % 0x4:
+        return False
+    if apt_data_offset >= size or const_file_offset + 0x20 > size or geometry_offset + 0xC > size:
+        return False
+
+    movie_offset, constants_count, constants_offset = struct.unpack(prefix + "3L", read(const_file_offset + 0x14, 0xC))
+    if movie_offset % 0x4 or apt_data_offset + movie_offset + 0x44 > size:
+        return False
+    if constants_offset % 0x4 or const_file_offset + constants_offset + constants_count * 0x8 > size:
+        return False
+
+    character_type, = struct.unpack(prefix + "L", read(apt_data_offset + movie_offset, 0x4))
+    return character_type == 9
+
+
+def sniff_endianness(size: int, read: Callable[[int, int], bytes]) -> str:
+    big = check_header(size, read, ">")
+    little = check_header(size, read, "<")
+    if big and not little:
+        return "big"
+    if little and not big:
+        return "little"
+    return "invalid"
+
+
+def sniff(buff: bytes | bytearray | memoryview | mmap.mmap) -> str:
+    return sniff_endianness(len(buff), lambda offset, size: bytes(buff[offset:offset + size]))
+
+
+def sniff_file(fp: BinaryIO) -> str:
+    def read(offset: int, size: int) -> bytes:
+        fp.seek(offset, os.SEEK_SET)
+        return fp.read(size)
+
+    size = fp.seek(0x0, os.SEEK_END)
+    endianness = sniff_endianness(size, read)
+    fp.seek(0x0, os.SEEK_SET)
+    return endianness
+
+
+def check_endianness(endianness: str, result: dict) -> bool:
+    # whether a sniffed resource needs converting, already converted ones are reported as skipped
+    if endianness == "little":
+        result["skipped"] = "already little endian"
+        return False
+    if endianness == "invalid":
+        raise ValueError("Not a big endian AptDataHeader resource.")
+    return True
+
+
+def convert_buffer(buff: bytearray | memoryview | mmap.mmap | array, validation: str = "fast") -> None:
+    view = memoryview(buff)
+    if view.readonly:
+        raise TypeError("convert_buffer needs a writable buffer, use convert_bytes for read only data.")
+    # any other buffer is converted through a flat view of its bytes, whatever its item format,
+    # bytearray and mmap already are flat bytes and are faster to index than a view
+    if not isinstance(buff, (bytearray, mmap.mmap)):
+        buff = view.cast("B")
+    AptFileConverter(None, BufferEngine(buff), validation=validation).convert()
+
+
+def convert_bytes(buff: bytes, validation: str = "fast") -> bytes:
+    buff = bytearray(buff)
+    convert_buffer(buff, validation)
+    return bytes(buff)
+
+
+@contextlib.contextmanager
+def atomic_output(destination: str, mode: int = 0o644) -> Iterator[BinaryIO]:
+    directory = os.path.dirname(os.path.abspath(destination))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp = tempfile.mkstemp(prefix=os.path.basename(destination) + ".", suffix=".tmp", dir=directory)
+    os.close(fd) # reopened by path so the workers can map the temporary file too
+    try:
+        with open(temp, "w+b") as fp:
+            yield fp
+            os.fchmod(fp.fileno(), mode)
+            os.fsync(fp.fileno())
+        os.replace(temp, destination)
+    except BaseException:
+        os.unlink(temp)
+        raise
+
+
+def convert_into(fp: BinaryIO, destination: str, mode: int = 0o644, profile: Profile = None, validation: str = "fast", result: dict = None) -> None:
+    # the source is only read through a read only mapping, values are swapped from it straight into the mapped output
+    with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as source, atomic_output(destination, mode) as output_fp:
+        output_fp.truncate(len(source))
+        with mmap.mmap(output_fp.fileno(), len(source)) as output:
+            output[:] = source
+            converter = AptFileConverter(fp, BufferEngine(output, source=source), profile, validation)
+            traverse(converter, new_result(destination) if result is None else result)
+            output.flush()
+
+
+def convert_to(source: str, destination: str, validation: str = "fast") -> None:
+    with open(source, "rb") as fp:
+        convert_into(fp, destination, stat.S_IMODE(os.fstat(fp.fileno()).st_mode), validation=validation)
+
+
+def new_result(path: str) -> dict:
+    return {
+        "path": path,
+        "size": 0,
+        "seconds": 0.0,
+        "skipped": None,
+        "error": None,
+        "offset": None,
+        "profile": None,
+        "cache": None,
+        "evictions": 0,
+        "duplicates": 0,
+    }
+
+
+def traverse(converter: AptFileConverter, result: dict) -> None:
+    try:
+        converter.traverse()
+    except AptFormatError as e:
+        result["offset"] = e.offset
+        raise
+    except Exception:
+        result["offset"] = converter.tell()
+        raise
+    # nothing is written when verification finds bytes swapped twice, or no bytes swapped at all
+    if isinstance(converter.profile, Coverage):
+        if converter.profile.overlaps:
+            result["offset"], _ = converter.profile.overlaps[0]
+            raise ValueError(f"{len(converter.profile.overlaps)} ranges swapped more than once.")
+        if converter.profile.counts.count(0) == len(converter.profile.counts):
+            raise ValueError("Verification saw no bytes swapped.")
+    result["duplicates"] = converter.skipped_duplicates
+
+
+def convert_cached(fp: BinaryIO, output: str, mode: int, cache: ConversionCache, profile: Profile, result: dict, validation: str = "fast") -> None:
+    fp.seek(0x0, os.SEEK_SET)
+    buff = bytearray(fp.read())
+    key = cache.key(buff)
+    # verification and strict validation need the traversal, so those files are always converted again
+    cached = None if isinstance(profile, Coverage) or validation == "strict" else cache.get(key)
+    if cached is not None and cache.store == "plan" and cached[:0x4] != SwapPlan.MAGIC: # plans of an older format are planned again
+        cached = None
+    if cached is None:
+        result["cache"] = "miss"
+        converter = AptFileConverter(fp, PlanEngine(buff), profile, validation)
+        traverse(converter, result)
+        plan = converter.engine.plan
+        if cache.store == "plan":
+            stream = io.BytesIO()
+            plan.save(stream)
+            result["evictions"] = cache.put(key, stream.getvalue())
+        plan.apply(buff)
+        if cache.store == "output":
+            result["evictions"] = cache.put(key, buff)
+    else: # the traversal is skipped entirely
+        result["cache"] = "hit"
+        if cache.store == "plan":
+            SwapPlan.load(io.BytesIO(cached)).apply(buff)
+        else:
+            buff = cached
+
+    if output is None:
+        fp.seek(0x0, os.SEEK_SET)
+        fp.write(buff)
+        fp.flush()
+    else:
+        with atomic_output(output, mode) as output_fp:
+            output_fp.write(buff)
+
+
+def convert_file(path: str, engine: str = "buffer", output: str = None, profile: bool = False, sniff: bool = True, cache: ConversionCache = None, split: int = 1, verify: bool = False, validation: str = "fast") -> dict:
+    result = new_result(path)
+    profile = Profile() if profile else None
+    start = time.perf_counter()
+    try:
+        result["size"] = os.path.getsize(path)
+        if verify:
+            if profile is not None:
+                raise ValueError("Verification does not work with profiling.")
+            profile = Coverage(result["size"])
+        with open(path, "r+b" if output is None else "rb") as fp:
+            if not check_endianness(sniff_file(fp) if sniff else "big", result):
+                return result
+
+            mode = stat.S_IMODE(os.fstat(fp.fileno()).st_mode)
+            if split > 1: # in place conversions replace the source once every unit is done
+                if cache is not None or profile is not None or engine != "buffer":
+                    raise ValueError("Splitting a file only works with the buffer engine, without a cache, profiling or verification.")
+                result["duplicates"] = convert_parallel(path, path if output is None else output, split, mode, validation)
+            elif cache is not None:
+                convert_cached(fp, output, mode, cache, profile, result, validation)
+            elif output is None:
+                converter = AptFileConverter(fp, engine, profile, validation)
+                traverse(converter, result)
+                converter.engine.flush()
+            else:
+                convert_into(fp, output, mode, profile, validation, result)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        result["seconds"] = time.perf_counter() - start
+        if profile is not None:
+            result["profile"] = profile.to_dict()
+    return result
+
+
+def expand_paths(paths: list[str]) -> list[str]:
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                files.extend(os.path.join(root, name) for name in sorted(names))
+        elif any(c in path for c in "*?["):
+            files.extend(sorted(p for p in glob.glob(path, recursive=True) if os.path.isfile(p)))
+        else:
+            files.append(path)
+    return list(dict.fromkeys(files))
+
+
+def output_paths(paths: list[str], output: str) -> list[str]:
+    if output is None:
+        return [None] * len(paths)
+    if len(paths) == 0:
+        return []
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths])
+    return [os.path.join(output, os.path.relpath(os.path.abspath(path), root)) for path in paths]
+
+
+def convert_files(paths: list[str], jobs: int = None, output: str = None, **options) -> Iterator[dict]:
+    outputs = output_paths(paths, output)
+    if jobs == 1:
+        for path, path_output in zip(paths, outputs):
+            yield convert_file(path, output=path_output, **options)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+        futures = {executor.submit(convert_file, path, output=path_output, **options): path for path, path_output in zip(paths, outputs)}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e: # worker died, the pool reports it for every pending file
+                result = new_result(futures[future])
+                result["error"] = f"{type(e).__name__}: {e}"
+                yield result
+
+
+def format_result(result: dict) -> str:
+    if result["skipped"] is not None:
+        return f"SKIP  {result['path']}: {result['skipped']}"
+    if result["error"] is None:
+        return f"OK    {result['path']} ({result['size']} bytes, {result['seconds']:.3f}s)"
+    offset = "" if result["offset"] is None else f" at 0x{result['offset']:X}"
+    return f"FAIL  {result['path']}{offset}: {result['error']}"
+
+
+def summarize_coverage(results: list[dict]) -> dict | None:
+    # skipped files were never traversed
+    totals = [result["profile"]["totals"] for result in results if result["skipped"] is None and result["profile"] is not None and "covered" in result["profile"]["totals"]]
+    if len(totals) == 0:
+        return None
+    return {key: sum(total[key] for total in totals) for key in ["size", "covered", "overlapped"]}
+
+
+def summarize(results: list[dict], seconds: float) -> dict:
+    failures = [result for result in results if result["error"] is not None]
+    skipped = [result for result in results if result["skipped"] is not None]
+    size = sum(result["size"] for result in results if result["error"] is None and result["skipped"] is None)
+    return {
+        "files": len(results),
+        "converted": len(results) - len(failures) - len(skipped),
+        "skipped": len(skipped),
+        "failed": len(failures),
+        "bytes": size,
+        "seconds": seconds,
+        "files_per_second": len(results) / seconds if seconds > 0 else 0.0,
+        "mb_per_second": size / 1024 / 1024 / seconds if seconds > 0 else 0.0,
+        "cache_hits": sum(1 for result in results if result["cache"] == "hit"),
+        "cache_misses": sum(1 for result in results if result["cache"] == "miss"),
+        "cache_evictions": sum(result["evictions"] for result in results),
+        "duplicates": sum(result["duplicates"] for result in results),
+        "coverage": summarize_coverage(results),
+        "failures": [{"path": result["path"], "offset": result["offset"], "error": result["error"]} for result in failures],
+    }
+
+
+def format_summary(summary: dict) -> str:
+    lines = [
+        f"{summary['converted']}/{summary['files']} files converted ({summary['skipped']} skipped) in {summary['seconds']:.2f}s "
+        f"({summary['files_per_second']:.1f} files/s, {summary['mb_per_second']:.2f} MB/s)",
+    ]
+    if summary["cache_hits"] or summary["cache_misses"]:
+        lines.append(f"cache: {summary['cache_hits']} hits, {summary['cache_misses']} misses, {summary['cache_evictions']} evictions")
+    if summary["duplicates"]:
+        lines.append(f"duplicates: {summary['duplicates']} shared nodes and tables converted once")
+    coverage = summary["coverage"]
+    if coverage is not None:
+        lines.append(
+            f"coverage: {coverage['covered']}/{coverage['size']} bytes swapped ({coverage['covered'] / max(coverage['size'], 1):.2%}), "
+            f"{coverage['overlapped']} bytes swapped more than once"
+        )
+    for failure in summary["failures"]:
+        offset = "" if failure["offset"] is None else f" at 0x{failure['offset']:X}"
+        lines.append(f"  {failure['path']}{offset}: {failure['error']}")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convert Burnout Paradise AptDataHeader resources from big endian to little endian.")
+    parser.add_argument("paths", nargs="+", help="files, directories or glob patterns")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--engine", choices=ENGINES, default="buffer", help="engine used for in place conversion")
+    parser.add_argument("-o", "--output", help="write converted files into this directory instead of converting in place, the sources are never modified")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print the summary")
+    parser.add_argument("--profile", help="write per section counters and timings of every file and of the whole batch to this JSON file")
+    parser.add_argument("--validation", choices=VALIDATIONS, default="fast", help="strict also checks NULL fields, the bounds of every followed offset and nodes reached as different kinds")
+    parser.add_argument("--verify", action="store_true", help="count how many times every byte is swapped and fail files with bytes swapped twice before writing them")
+    parser.add_argument("--no-sniff", action="store_true", help="convert files without checking that they are big endian first")
+    parser.add_argument("--cache", help="directory of a conversion cache keyed by the hash of the big endian input")
+    parser.add_argument("--cache-size", type=int, default=1024, help="cache size cap in MB, least recently used entries are evicted")
+    parser.add_argument("--cache-store", choices=["output", "plan"], default="output", help="store converted files or their swap plans in the cache")
+    parser.add_argument("--split", type=int, default=1, help="convert the subtrees of every file across this many worker processes")
+    args = parser.parse_args()
+    if args.split > 1 and (args.engine != "buffer" or args.profile is not None or args.verify or args.cache is not None):
+        parser.error("--split only works with the buffer engine, without --profile, --verify or --cache")
+    if args.verify and args.profile is not None:
+        parser.error("--verify does not work with --profile")
+
+    cache = None
+    if args.cache is not None:
+        cache = ConversionCache(args.cache, args.cache_size * 1024 * 1024, args.cache_store)
+
+    paths = expand_paths(args.paths)
+    results = []
+    start = time.perf_counter()
+    for result in convert_files(paths, args.jobs, args.output, engine=args.engine, profile=args.profile is not None, sniff=not args.no_sniff, cache=cache, split=args.split, verify=args.verify, validation=args.validation):
+        results.append(result)
+        if not args.quiet or result["error"] is not None:
+            print(format_result(result), flush=True)
+    summary = summarize(results, time.perf_counter() - start)
+    print(format_summary(summary))
+    if cache is not None:
+        stats = cache.stats()
+        print(f"cache: {stats['entries']} entries, {stats['size'] / 1024 / 1024:.2f}/{stats['max_size'] / 1024 / 1024:.2f} MB")
+    if args.profile is not None:
+        profiles = {result["path"]: result["profile"] for result in results if result["profile"] is not None}
+        with open(args.profile, "w") as fp:
+            json.dump({"aggregate": Profile.merge(list(profiles.values())), "files": profiles}, fp, indent=4)
+    sys.exit(1 if summary["failed"] else 0)
+
+
+if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,328 @@
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import functools
+import json
+import os
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+from converter import (
+    ENGINES,
+    VALIDATIONS,
+    convert_bytes,
+    convert_file,
+    expand_paths,
+    format_result,
+    new_result,
+    output_paths,
+)
+from generator import generate
+
+
+SOCKET_PATH = os.path.join(tempfile.gettempdir(), f"apt-converter-{os.getuid()}.sock")
+PERCENTILES = [50, 90, 99]
+
+
+def init_worker() -> None:
+    # a first conversion fills the struct caches, so the first real job does not pay for them
+    convert_bytes(generate("small"))
+
+
+def signature(path: str) -> tuple[int, int] | None:
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        return None
+    return stat_result.st_mtime_ns, stat_result.st_size
+
+
+def percentiles(values: list[float]) -> dict:
+    values = sorted(values)
+    if len(values) == 0:
+        return {f"p{percentile}": 0.0 for percentile in PERCENTILES}
+    # nearest rank
+    return {f"p{percentile}": values[min(len(values) - 1, len(values) * percentile // 100)] for percentile in PERCENTILES}
+
+
+class Statistics:
+
+
+    def __init__(self, window: int = 1000, period: float = 60.0):
+        self.period = period
+        self.latencies = collections.deque(maxlen=window) # seconds from queued to done
+        self.conversions = collections.deque(maxlen=window) # seconds spent in a worker
+        self.recent = collections.deque() # (done time, size) of the jobs done in the last period
+        self.totals = {"converted": 0, "skipped": 0, "failed": 0, "bytes": 0}
+        self.start = time.monotonic()
+
+
+    def record(self, result: dict, latency: float) -> None:
+        now = time.monotonic()
+        self.latencies.append(latency)
+        self.conversions.append(result["seconds"])
+        if result["error"] is not None:
+            self.totals["failed"] += 1
+        elif result["skipped"] is not None:
+            self.totals["skipped"] += 1
+        else:
+            self.totals["converted"] += 1
+            self.totals["bytes"] += result["size"]
+        self.recent.append((now, result["size"] if result["error"] is None and result["skipped"] is None else 0))
+        self.expire(now)
+
+
+    def expire(self, now: float) -> None:
+        while self.recent and self.recent[0][0] < now - self.period:
+            self.recent.popleft()
+
+
+    def to_dict(self) -> dict:
+        now = time.monotonic()
+        self.expire(now)
+        period = min(self.period, now - self.start)
+        return {
+            "uptime": now - self.start,
+            **self.totals,
+            "latency": percentiles(self.latencies),
+            "conversion": percentiles(self.conversions),
+            "files_per_second": len(self.recent) / period if period > 0 else 0.0,
+            "mb_per_second": sum(size for _, size in self.recent) / 1024 / 1024 / period if period > 0 else 0.0,
+        }
+
+
+class Daemon:
+
+
+    def __init__(self, directories: list[str], socket_path: str = SOCKET_PATH, output: str = None, jobs: int = None, engine: str = "buffer", validation: str = "fast", interval: float = 2.0, quiet: bool = False):
+        self.directories = [os.path.abspath(directory) for directory in directories]
+        self.socket_path = socket_path
+        self.output = output
+        self.jobs = jobs or os.cpu_count()
+        self.engine = engine
+        self.validation = validation
+        self.interval = interval
+        self.quiet = quiet
+        self.queue = None
+        self.active = {} # (path, output): future of its result, a file is never converted twice at the same time to the same place
+        self.running = 0
+        self.candidates = {} # signatures seen by the last scan, a file is queued once its signature is stable
+        self.seen = {} # signatures of files once converted
+        self.statistics = Statistics()
+        self.stopping = None
+        self.clients = set() # writers of the open connections
+
+
+    async def serve(self) -> None:
+        loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.stopping = asyncio.Event()
+        for signum in [signal.SIGINT, signal.SIGTERM]:
+            loop.add_signal_handler(signum, self.stopping.set)
+
+        with concurrent.futures.ProcessPoolExecutor(self.jobs, initializer=init_worker) as executor:
+            # start every worker now rather than on the first jobs
+            await asyncio.gather(*[loop.run_in_executor(executor, os.getpid) for _ in range(self.jobs)])
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            server = await asyncio.start_unix_server(self.handle, self.socket_path)
+            os.chmod(self.socket_path, 0o600)
+            workers = [asyncio.create_task(self.work(executor)) for _ in range(self.jobs)]
+            watcher = asyncio.create_task(self.watch()) if self.directories else None
+            print(f"listening on {self.socket_path} with {self.jobs} workers, watching {len(self.directories)} directories", flush=True)
+
+            await self.stopping.wait()
+            server.close()
+            # open connections, such as the one that sent stop, end their reads instead of being cancelled in them
+            for writer in list(self.clients):
+                writer.close()
+            await server.wait_closed()
+            if watcher is not None:
+                watcher.cancel()
+            # jobs already running finish, queued ones are dropped
+            while not self.queue.empty():
+                path, output, _, future = self.queue.get_nowait()
+                result = new_result(path)
+                result["error"] = "The daemon stopped before converting it."
+                self.finish(path, output, future, result)
+            for _ in workers:
+                self.queue.put_nowait(None)
+            await asyncio.gather(*workers)
+        os.unlink(self.socket_path)
+
+
+    def submit(self, path: str, output: str = None) -> asyncio.Future:
+        # a request only joins a pending job writing to the same place
+        future = self.active.get((path, output))
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self.active[(path, output)] = future
+            self.queue.put_nowait((path, output, time.monotonic(), future))
+        return future
+
+
+    def finish(self, path: str, output: str, future: asyncio.Future, result: dict) -> None:
+        del self.active[(path, output)]
+        future.set_result(result)
+
+
+    async def work(self, executor: concurrent.futures.Executor) -> None:
+        loop = asyncio.get_running_loop()
+        while (job := await self.queue.get()) is not None:
+            path, output, queued, future = job
+            self.running += 1
+            try:
+                result = await loop.run_in_executor(executor, functools.partial(convert_file, path, self.engine, output, validation=self.validation))
+            except Exception as e: # worker died
+                result = new_result(path)
+                result["error"] = f"{type(e).__name__}: {e}"
+            finally:
+                self.running -= 1
+            self.statistics.record(result, time.monotonic() - queued)
+            # an in place conversion changes the file, it is not picked up again by the watcher
+            self.seen[path] = signature(path)
+            self.finish(path, output, future, result)
+            if not self.quiet or result["error"] is not None:
+                print(format_result(result), flush=True)
+
+
+    def scan(self) -> dict:
+        signatures = {}
+        for directory in self.directories:
+            for path in expand_paths([directory]):
+                signatures[path] = signature(path), directory
+        return signatures
+
+
+    async def watch(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            candidates = {}
+            for path, (current, directory) in (await loop.run_in_executor(None, self.scan)).items():
+                output = None if self.output is None else os.path.join(self.output, os.path.relpath(path, directory))
+                if current is None or current == self.seen.get(path) or (path, output) in self.active:
+                    continue
+                # files still being written change between two scans
+                if self.candidates.get(path) == current:
+                    self.submit(path, output)
+                else:
+                    candidates[path] = current
+            self.candidates = candidates
+            await asyncio.sleep(self.interval)
+
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.clients.add(writer)
+        try:
+            while line := await reader.readline():
+                try:
+                    response = await self.dispatch(json.loads(line))
+                except Exception as e:
+                    response = {"error": f"{type(e).__name__}: {e}"}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except (asyncio.CancelledError, ConnectionError): # the daemon is stopping or the client went away
+            pass
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+
+
+    async def dispatch(self, request: dict) -> dict:
+        command = request.get("command")
+        if command == "convert":
+            # directories and glob patterns are walked off the event loop, like the watched directories
+            paths = await asyncio.get_running_loop().run_in_executor(None, expand_paths, request["paths"])
+            futures = [self.submit(path, output) for path, output in zip(paths, output_paths(paths, request.get("output")))]
+            if not request.get("wait", True):
+                return {"queued": len(futures)}
+            return {"results": list(await asyncio.gather(*futures))}
+        if command == "status":
+            return self.status()
+        if command == "stop":
+            self.stopping.set()
+            return {"stopping": True}
+        raise ValueError(f"Unknown command {command}.")
+
+
+    def status(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "workers": self.jobs,
+            "queued": self.queue.qsize(),
+            "running": self.running,
+            "directories": self.directories,
+            **self.statistics.to_dict(),
+        }
+
+
+def request(message: dict, socket_path: str = SOCKET_PATH) -> dict:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        client.sendall(json.dumps(message).encode() + b"\n")
+        with client.makefile("rb") as fp:
+            response = json.loads(fp.readline())
+    if "error" in response:
+        raise RuntimeError(response["error"])
+    return response
+
+
+def format_status(status: dict) -> str:
+    latency = ", ".join(f"{name} {seconds * 1000:.1f}ms" for name, seconds in status["latency"].items())
+    conversion = ", ".join(f"{name} {seconds * 1000:.1f}ms" for name, seconds in status["conversion"].items())
+    return "\n".join([
+        f"pid {status['pid']}, up {status['uptime']:.0f}s, {status['workers']} workers, watching {len(status['directories'])} directories",
+        f"queue: {status['queued']} queued, {status['running']} running",
+        f"done: {status['converted']} converted, {status['skipped']} skipped, {status['failed']} failed, {status['bytes'] / 1024 / 1024:.2f} MB",
+        f"latency: {latency}",
+        f"conversion: {conversion}",
+        f"throughput: {status['files_per_second']:.1f} files/s, {status['mb_per_second']:.2f} MB/s over the last minute",
+    ])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Keep warm conversion workers running, converting the files dropped into watched directories and the jobs sent over a Unix socket.")
+    parser.add_argument("--socket", default=SOCKET_PATH, help="path of the Unix socket")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="run the daemon")
+    serve.add_argument("directories", nargs="*", help="directories watched for new or changed files")
+    serve.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="number of worker processes")
+    serve.add_argument("--engine", choices=ENGINES, default="buffer", help="engine used for in place conversion")
+    serve.add_argument("-o", "--output", help="write converted files into this directory instead of converting in place")
+    serve.add_argument("--validation", choices=VALIDATIONS, default="fast")
+    serve.add_argument("--interval", type=float, default=2.0, help="seconds between two scans of the watched directories")
+    serve.add_argument("-q", "--quiet", action="store_true", help="only print failures")
+    convert = commands.add_parser("convert", help="convert files through a running daemon")
+    convert.add_argument("paths", nargs="+", help="files, directories or glob patterns")
+    convert.add_argument("-o", "--output", help="write converted files into this directory instead of converting in place")
+    convert.add_argument("--no-wait", action="store_true", help="return once the files are queued")
+    commands.add_parser("status", help="print the queue depth, latency percentiles and throughput of a running daemon")
+    commands.add_parser("stop", help="stop a running daemon once its running jobs are done")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        daemon = Daemon(args.directories, args.socket, args.output, args.jobs, args.engine, args.validation, args.interval, args.quiet)
+        asyncio.run(daemon.serve())
+    elif args.command == "convert":
+        # the daemon does not share our working directory
+        paths = [os.path.abspath(path) for path in args.paths]
+        output = None if args.output is None else os.path.abspath(args.output)
+        response = request({"command": "convert", "paths": paths, "output": output, "wait": not args.no_wait}, args.socket)
+        if args.no_wait:
+            print(f"{response['queued']} files queued")
+            return
+        for result in response["results"]:
+            print(format_result(result))
+        sys.exit(1 if any(result["error"] is not None for result in response["results"]) else 0)
+    elif args.command == "status":
+        print(format_status(request({"command": "status"}, args.socket)))
+    else:
+        request({"command": "stop"}, args.socket)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,198 @@
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from benchmark import convert
+from converter import ENGINES, AptFileConverter, BufferEngine, Coverage
+from generator import SIZES, generate
+
+
+# sections of AptFileConverter and the part of the file they convert, anything else is under the movie
+REGIONS = {
+    "convert_header": "header",
+    "convert_const_file": "const file",
+    "convert_geometry": "geometry",
+    "convert_geometry_record": "geometry",
+    "convert_geometry_data": "geometry",
+}
+
+DIFFERENCE = re.compile(rb"[^\x00]+")
+
+
+class Attribution(Coverage):
+
+
+    def __init__(self, size: int):
+        self.owners = bytearray(size) # index of the section that swapped every byte, 0 if none did
+        self.names = [None]
+        self.ids = {}
+        super().__init__(size)
+
+
+    def get_section(self, name: str) -> dict:
+        section = super().get_section(name)
+        if id(section) not in self.ids:
+            self.ids[id(section)] = len(self.names)
+            self.names.append(name)
+        return section
+
+
+    def mark(self, offset: int, size: int, count: int = 1, gaps: list[int] = ()) -> None:
+        super().mark(offset, size, count, gaps)
+        end = offset + size * count
+        owners = self.owners
+        previous = owners[offset:end]
+        owners[offset:end] = bytes((self.ids[id(self.section)],)) * (end - offset)
+        for gap in gaps:
+            owners[offset + gap:end:size] = previous[gap::size]
+
+
+def attribute(buff: bytes) -> Attribution:
+    attribution = Attribution(len(buff))
+    converter = AptFileConverter(None, BufferEngine(bytearray(buff)), attribution)
+    converter.traverse()
+    return attribution
+
+
+def run(path: str, buff: bytes, engine: str) -> tuple[bytes | None, float, str | None]:
+    with open(path, "wb") as fp:
+        fp.write(buff)
+    start = time.perf_counter()
+    try:
+        with open(path, "r+b") as fp:
+            convert(fp, engine)
+    except Exception as e:
+        return None, time.perf_counter() - start, f"{type(e).__name__}: {e}"
+    seconds = time.perf_counter() - start
+    with open(path, "rb") as fp:
+        return fp.read(), seconds, None
+
+
+def section_region(attribution: Attribution, owner: int) -> tuple[str, str]:
+    if owner == 0:
+        return "unswapped", "unswapped"
+    section = attribution.names[owner]
+    return section, REGIONS.get(section, "movie")
+
+
+def diff(reference: bytes, output: bytes, attribution: Attribution, examples: int = 8) -> dict:
+    xored = (int.from_bytes(reference, "big") ^ int.from_bytes(output, "big")).to_bytes(len(reference), "big")
+    regions = {}
+    for match in DIFFERENCE.finditer(xored):
+        start, end = match.span()
+        owners = Counter(attribution.owners[start:end])
+        for owner, count in owners.items():
+            section, name = section_region(attribution, owner)
+            region = regions.setdefault(name, {"bytes": 0, "ranges": 0, "sections": {}, "examples": []})
+            region["bytes"] += count
+            region["sections"][section] = region["sections"].get(section, 0) + count
+
+        # a range is counted once, in the region of the section owning most of it
+        _, name = section_region(attribution, owners.most_common(1)[0][0])
+        region = regions[name]
+        region["ranges"] += 1
+        if len(region["examples"]) < examples:
+            region["examples"].append({
+                "offset": start,
+                "size": end - start,
+                "reference": reference[start:end][:0x10].hex(),
+                "output": output[start:end][:0x10].hex(),
+            })
+    return regions
+
+
+def compare(buff: bytes, engines: list[str], reference: str = "old", repeat: int = 1) -> dict:
+    attribution = attribute(buff)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "differential.dat")
+        for engine in [reference, *[engine for engine in engines if engine != reference]]:
+            runs = [run(path, buff, engine) for _ in range(repeat)]
+            output, _, error = runs[0]
+            seconds = min(seconds for _, seconds, _ in runs)
+            results[engine] = {
+                "error": error,
+                "seconds": seconds,
+                "mb_per_second": len(buff) / 1024 / 1024 / seconds if seconds > 0 else 0.0,
+                "output": output,
+            }
+
+    expected = results[reference]["output"]
+    for engine, result in results.items():
+        output = result.pop("output")
+        result["speedup"] = results[reference]["seconds"] / result["seconds"] if result["seconds"] > 0 else 0.0
+        result["regions"] = None
+        if engine != reference and expected is not None and output is not None:
+            result["regions"] = diff(expected, output, attribution)
+    return {
+        "bytes": len(buff),
+        "reference": reference,
+        "coverage": attribution.to_dict()["totals"],
+        "engines": results,
+    }
+
+
+def format_comparison(name: str, comparison: dict) -> str:
+    lines = [f"{name} ({comparison['bytes']} bytes, reference {comparison['reference']})"]
+    for engine, result in comparison["engines"].items():
+        status = f"{result['mb_per_second']:.2f} MB/s, {result['speedup']:.2f}x"
+        if result["error"] is not None:
+            lines.append(f"    {engine:<8}{status}, FAIL {result['error']}")
+            continue
+        if result["regions"] is None:
+            lines.append(f"    {engine:<8}{status}")
+            continue
+        if len(result["regions"]) == 0:
+            lines.append(f"    {engine:<8}{status}, identical")
+            continue
+        lines.append(f"    {engine:<8}{status}, {sum(region['bytes'] for region in result['regions'].values())} bytes differ")
+        for region_name, region in sorted(result["regions"].items()):
+            sections = ", ".join(f"{section} {count}" for section, count in sorted(region["sections"].items(), key=lambda item: -item[1]))
+            lines.append(f"        {region_name}: {region['bytes']} bytes in {region['ranges']} ranges ({sections})")
+            for example in region["examples"][:2]:
+                lines.append(f"            0x{example['offset']:X}: {example['reference']} != {example['output']}")
+    return "\n".join(lines)
+
+
+def differs(comparison: dict) -> bool:
+    return any(result["error"] is not None or result["regions"] for result in comparison["engines"].values())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run several converters on the same AptDataHeader resources and diff their outputs region by region.")
+    parser.add_argument("paths", nargs="*", help="big endian resources, synthetic ones are generated when none are given")
+    parser.add_argument("--engines", nargs="+", choices=[*ENGINES, "old"], default=[*ENGINES, "old"], help="\"old\" is converter_old.convert")
+    parser.add_argument("--reference", choices=[*ENGINES, "old"], default="old", help="engine the others are compared against")
+    parser.add_argument("--sizes", nargs="+", choices=SIZES, default=["small", "medium"])
+    parser.add_argument("--seeds", nargs="+", type=int, default=[0])
+    parser.add_argument("--shared", action="store_true", help="generate resources with subtrees referenced more than once")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--json", help="also write the comparisons to this file")
+    args = parser.parse_args()
+
+    inputs = []
+    for path in args.paths:
+        with open(path, "rb") as fp:
+            inputs.append((path, fp.read()))
+    if len(inputs) == 0:
+        for size in args.sizes:
+            for seed in args.seeds:
+                inputs.append((f"{size} seed {seed}", generate(size, seed, args.shared)))
+
+    comparisons = {}
+    for name, buff in inputs:
+        comparisons[name] = compare(buff, args.engines, args.reference, args.repeat)
+        print(format_comparison(name, comparisons[name]), flush=True)
+    if args.json is not None:
+        with open(args.json, "w") as fp:
+            json.dump(comparisons, fp, indent=4)
+    sys.exit(1 if any(differs(comparison) for comparison in comparisons.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,226 @@
+import argparse
+import random
+import struct
+
+from converter import ACTIONS_CLASSES, ACTIONS_TABLE
+
+
+# (align, operands size, actions) of every actions class, including the ones without operands
+ACTIONS_OPERANDS = [(align, layout.size, actions) for align, layout, _, actions in ACTIONS_CLASSES.values() if actions]
+ACTIONS_OPERANDS.append((0x1, 0x0, [action for action in range(0x1, 0x100) if ACTIONS_TABLE[action][0] == 0x0D]))
+
+SIZES = {
+    "small": dict(sprites=4, shapes=4, texts=4, fonts=2, images=4, frames=4, frame_items=4, actions=16, constants=32, imports=2, exports=4, geometry_records=4, geometry_data=2, vertices=8),
+    "medium": dict(sprites=64, shapes=128, texts=64, fonts=8, images=64, frames=16, frame_items=8, actions=32, constants=2048, imports=16, exports=64, geometry_records=128, geometry_data=4, vertices=64),
+    "huge": dict(sprites=512, shapes=1024, texts=512, fonts=16, images=512, frames=32, frame_items=8, actions=64, constants=32768, imports=64, exports=512, geometry_records=1024, geometry_data=8, vertices=128),
+}
+
+
+class AptDataGenerator:
+
+
+    def __init__(self, seed: int = 0, shared: bool = False):
+        self.random = random.Random(seed)
+        self.shared = shared
+        self.buff = bytearray()
+        self.apt_data_offset = None
+        self.actions_offsets = []
+        self.frame_items_offsets = []
+
+
+    def generate(self, sprites: int = 4, shapes: int = 4, texts: int = 4, fonts: int = 2, images: int = 4, frames: int = 4, frame_items: int = 4, actions: int = 16, constants: int = 32, imports: int = 2, exports: int = 4, geometry_records: int = 4, geometry_data: int = 2, vertices: int = 8) -> bytes:
+        header_offset = self.alloc(0x18)
+        const_file_offset = self.generate_const_file(constants)
+        self.apt_data_offset = self.alloc(0x10)
+
+        movie_offset = self.alloc(0x10 + 0x34)
+        characters = [movie_offset]
+        for _ in range(sprites):
+            characters.append(self.generate_character_sprite(frames, frame_items, actions))
+        for _ in range(shapes):
+            characters.append(self.generate_character(1, 0x14))
+        for _ in range(texts):
+            characters.append(self.generate_character(2, 0x34))
+        for _ in range(fonts):
+            character_offset = self.generate_character(3, 0xC)
+            self.put(character_offset + 0x18, "L", 0)
+            characters.append(character_offset)
+        for _ in range(images):
+            characters.append(self.generate_character(7, 0x4))
+        if self.shared and sprites > 0:
+            characters.append(characters[1])
+        characters.insert(len(characters) // 2, None)
+
+        characters_offsets = self.alloc(len(characters) * 0x4)
+        for i, character_offset in enumerate(characters):
+            self.put(characters_offsets + i * 0x4, "L", self.relative(character_offset))
+
+        movie_frames_offset = self.generate_frames(frames, frame_items, actions)
+        imports_offset = self.alloc(imports * 0x10)
+        for i in range(imports):
+            self.put(imports_offset + i * 0x10 + 0xC, "L", 0)
+        exports_offset = self.alloc(exports * 0x8)
+
+        self.put(movie_offset, "LLHHL", 9, self.word(), self.half(), self.half(), 0)
+        self.put(movie_offset + 0x10, "LLL", frames, self.relative(movie_frames_offset), 0)
+        self.put(movie_offset + 0x1C, "LL", len(characters), self.relative(characters_offsets))
+        self.put(movie_offset + 0x30, "LLLLL", imports, self.relative(imports_offset), exports, self.relative(exports_offset), 0)
+        self.put(const_file_offset + 0x14, "L", self.relative(movie_offset))
+
+        geometry_offset = self.generate_geometry(geometry_records, geometry_data, vertices)
+        self.put(header_offset + 0x8, "LLL", self.apt_data_offset, const_file_offset, geometry_offset)
+        return bytes(self.buff)
+
+
+    def generate_const_file(self, constants: int) -> int:
+        const_file_offset = self.alloc(0x20)
+        self.buff[const_file_offset:const_file_offset + 0x14] = b"Apt constant file\x1A\x00\x00"
+        constants_offset = self.alloc(constants * 0x8)
+        self.put(const_file_offset + 0x18, "LL", constants, constants_offset - const_file_offset)
+        return const_file_offset
+
+
+    def generate_character(self, character_type: int, size: int) -> int:
+        character_offset = self.alloc(0x10 + size)
+        self.put(character_offset, "LLHHL", character_type, self.word(), self.half(), self.half(), 0)
+        return character_offset
+
+
+    def generate_character_sprite(self, frames: int, frame_items: int, actions: int) -> int:
+        character_offset = self.generate_character(5, 0xC)
+        frames_offset = self.generate_frames(frames, frame_items, actions)
+        self.put(character_offset + 0x10, "LLL", frames, self.relative(frames_offset), 0)
+        return character_offset
+
+
+    def generate_frames(self, frames: int, frame_items: int, actions: int) -> int:
+        frames_offset = self.alloc(frames * 0x8)
+        for i in range(frames):
+            frame_items_offsets = self.alloc(frame_items * 0x4)
+            for j in range(frame_items):
+                frame_item_offset = self.generate_frame_item(i * frame_items + j, actions)
+                self.put(frame_items_offsets + j * 0x4, "L", self.relative(frame_item_offset))
+            self.put(frames_offset + i * 0x8, "LL", frame_items, self.relative(frame_items_offsets))
+        return frames_offset
+
+
+    def generate_frame_item(self, index: int, actions: int) -> int:
+        if index % 7 == 6:
+            return None
+        if self.shared and self.frame_items_offsets and index % 5 == 4:
+            return self.random.choice(self.frame_items_offsets)
+
+        frame_item_type = [1, 2, 3, 4, 5, 8][index % 7]
+        if frame_item_type == 1:
+            frame_item_offset = self.alloc(0x8)
+            self.put(frame_item_offset + 0x4, "L", self.relative(self.generate_actions(actions)))
+        elif frame_item_type == 2:
+            frame_item_offset = self.alloc(0x10)
+        elif frame_item_type == 3:
+            frame_item_offset = self.alloc(0x40)
+            self.put(frame_item_offset + 0x3C, "L", self.relative(self.generate_clip_actions(index, actions)))
+        elif frame_item_type in [4, 5]:
+            frame_item_offset = self.alloc(0x8)
+        elif frame_item_type == 8:
+            frame_item_offset = self.alloc(0xC)
+            self.put(frame_item_offset + 0x8, "L", self.relative(self.generate_actions(actions)))
+        self.put(frame_item_offset, "L", frame_item_type)
+        self.frame_items_offsets.append(frame_item_offset)
+        return frame_item_offset
+
+
+    def generate_clip_actions(self, index: int, actions: int) -> int:
+        if index % 2 == 1:
+            return None
+        clip_action_records_count = 1 + index % 3
+        clip_actions_offset = self.alloc(0x8)
+        clip_action_records_offset = self.alloc(clip_action_records_count * 0xC)
+        for i in range(clip_action_records_count):
+            self.put(clip_action_records_offset + i * 0xC + 0x8, "L", self.relative(self.generate_actions(actions)))
+        self.put(clip_actions_offset, "LL", clip_action_records_count, self.relative(clip_action_records_offset))
+        return clip_actions_offset
+
+
+    def generate_actions(self, actions: int) -> int:
+        if self.shared and self.actions_offsets and self.random.random() < 0.25:
+            return self.random.choice(self.actions_offsets)
+
+        actions_offset = self.alloc(0x0, 0x1)
+        for i in range(actions):
+            align, size, opcodes = ACTIONS_OPERANDS[i % len(ACTIONS_OPERANDS)] if i < len(ACTIONS_OPERANDS) else self.random.choice(ACTIONS_OPERANDS)
+            self.buff.append(self.random.choice(opcodes))
+            self.alloc(size, align)
+        self.buff.append(0)
+        self.actions_offsets.append(actions_offset)
+        return actions_offset
+
+
+    def generate_geometry(self, geometry_records: int, geometry_data: int, vertices: int) -> int:
+        geometry_offset = self.alloc(0xC)
+        geometry_records_offsets = self.alloc(geometry_records * 0x4)
+        shared_vertex_offset = None
+        for i in range(geometry_records):
+            geometry_record_offset = self.alloc(0xC)
+            geometry_data_offsets = self.alloc(geometry_data * 0x4)
+            for j in range(geometry_data):
+                geometry_data_offset = self.alloc(0x18)
+                vertices_offsets = self.alloc(vertices * 0x4)
+                vertices_offset = self.alloc(vertices * 0x14)
+                for k in range(vertices):
+                    self.put(vertices_offsets + k * 0x4, "L", vertices_offset + k * 0x14)
+                if self.shared and vertices > 0:
+                    if shared_vertex_offset is not None:
+                        self.put(vertices_offsets, "L", shared_vertex_offset)
+                    shared_vertex_offset = vertices_offset
+                self.put(geometry_data_offset + 0x10, "LL", vertices, vertices_offsets)
+                self.put(geometry_data_offsets + j * 0x4, "L", geometry_data_offset)
+            self.put(geometry_record_offset + 0x4, "LL", geometry_data, geometry_data_offsets)
+            self.put(geometry_records_offsets + i * 0x4, "L", geometry_record_offset)
+        self.put(geometry_offset, "L", geometry_records)
+        self.put(geometry_offset + 0x8, "L", geometry_records_offsets)
+        return geometry_offset
+
+
+    def alloc(self, size: int, align: int = 0x4) -> int:
+        offset = (len(self.buff) + align - 1) & ~(align - 1)
+        self.buff.extend(self.random.randbytes(offset + size - len(self.buff)))
+        return offset
+
+
+    def put(self, offset: int, fmt: str, *values: int) -> None:
+        struct.pack_into(">" + fmt, self.buff, offset, *values)
+
+
+    def relative(self, offset: int) -> int:
+        if offset is None:
+            return 0
+        return offset - self.apt_data_offset
+
+
+    def word(self) -> int:
+        return self.random.getrandbits(32)
+
+
+    def half(self) -> int:
+        return self.random.getrandbits(16)
+
+
+
+def generate(size: str = "small", seed: int = 0, shared: bool = False, **counts: int) -> bytes:
+    return AptDataGenerator(seed, shared).generate(**{**SIZES[size], **counts})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a synthetic big endian AptDataHeader resource.")
+    parser.add_argument("output")
+    parser.add_argument("--size", choices=SIZES, default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--shared", action="store_true", help="reference some characters, frame items, actions and vertices more than once")
+    args = parser.parse_args()
+
+    with open(args.output, "wb") as fp:
+        fp.write(generate(args.size, args.seed, args.shared))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
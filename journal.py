@@ -0,0 +1,345 @@
+import argparse
+import concurrent.futures
+import heapq
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from typing import BinaryIO, Iterator
+
+from converter import (
+    VALIDATIONS,
+    AptFileConverter,
+    BufferEngine,
+    check_endianness,
+    expand_paths,
+    format_result,
+    format_summary,
+    new_result,
+    sniff_file,
+    summarize,
+)
+
+
+# a journal is a sequence of records: kind, unit, payload size, payload, crc32 of all of it
+# P names the units, A holds the after image of a unit, R says every after image is in the journal,
+# and C is a checkpoint, every unit before it is in the file
+RECORD = struct.Struct("<cLL")
+CRC = struct.Struct("<L")
+RUN = struct.Struct("<LL")
+PLAN_HEADER = struct.Struct("<4sQL") # magic, file size, units count
+JOURNAL_MAGIC = b"APTJ"
+# after images are snapshots of the private copy taken in unit order,
+# so a range may also cover the bytes between two extents, whoever they belong to
+RUN_GAP = 0x40
+
+
+def journal_path(path: str) -> str:
+    return path + ".journal"
+
+
+class ExtentEngine(BufferEngine):
+
+
+    # converts in place like BufferEngine, every write is at the cursor so the bytes written are the extents between two seeks
+    def __init__(self, buff: bytearray):
+        super().__init__(buff)
+        self.start = 0
+        self.extents = []
+
+
+    def seek(self, offset: int) -> None:
+        if self.offset > self.start:
+            self.extents.append((self.start, self.offset))
+        self.start = self.offset = offset
+
+
+    def cut(self) -> list[tuple[int, int]]:
+        self.seek(self.offset)
+        extents, self.extents = self.extents, []
+        return extents
+
+
+def coalesce(extents: list[tuple[int, int]], gap: int = RUN_GAP) -> list[tuple[int, int]]:
+    ranges = []
+    for start, end in sorted(extents):
+        if ranges and start <= ranges[-1][1] + gap:
+            ranges[-1] = ranges[-1][0], max(ranges[-1][1], end)
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+def convert_units(fp: BinaryIO, validation: str = "fast") -> tuple[bytearray, list[tuple[str, list[tuple[int, int]]]]]:
+    # the whole file is converted in a private copy first, the top level sections and every node below the movie and geometry are units
+    fp.seek(0x0, os.SEEK_SET)
+    work = bytearray(fp.read())
+    engine = ExtentEngine(work)
+    converter = AptFileConverter(fp, engine, validation=validation)
+    units = []
+
+    def cut(name: str) -> None:
+        units.append((name, coalesce(engine.cut())))
+
+    for node in converter.convert_top_level(cut):
+        heapq.heappush(converter.queue, node)
+        converter.run()
+        cut(f"{node[1]} 0x{node[0]:X}")
+    return work, units
+
+
+def pack_plan(size: int, names: list[str]) -> bytes:
+    return PLAN_HEADER.pack(JOURNAL_MAGIC, size, len(names)) + "\n".join(names).encode()
+
+
+def unpack_plan(payload: bytes) -> tuple[int, list[str]]:
+    magic, size, count = PLAN_HEADER.unpack_from(payload, 0x0)
+    if magic != JOURNAL_MAGIC:
+        raise ValueError("Not a journal.")
+    names = payload[PLAN_HEADER.size:].decode().split("\n") if count else []
+    return size, names
+
+
+def pack_record(kind: bytes, unit: int, payload: bytes = b"") -> bytes:
+    record = RECORD.pack(kind, unit, len(payload)) + payload
+    return record + CRC.pack(zlib.crc32(record))
+
+
+def read_records(fp: BinaryIO) -> Iterator[tuple[bytes, int, bytes, int]]:
+    # stops at the first torn or corrupted record, what follows it was never relied on
+    fp.seek(0x0, os.SEEK_SET)
+    end = 0
+    while len(header := fp.read(RECORD.size)) == RECORD.size:
+        kind, unit, size = RECORD.unpack(header)
+        payload = fp.read(size)
+        crc = fp.read(CRC.size)
+        if len(payload) != size or len(crc) != CRC.size or CRC.unpack(crc)[0] != zlib.crc32(header + payload):
+            return
+        end += RECORD.size + size + CRC.size
+        yield kind, unit, payload, end
+
+
+def after_image(buff: bytearray, ranges: list[tuple[int, int]]) -> bytes:
+    parts = []
+    for start, end in ranges:
+        parts.append(RUN.pack(start, end - start))
+        parts.append(buff[start:end])
+    return b"".join(parts)
+
+
+def write_after_image(buff: mmap.mmap, payload: bytes) -> None:
+    offset = 0
+    while offset < len(payload):
+        start, size = RUN.unpack_from(payload, offset)
+        offset += RUN.size
+        buff[start:start + size] = payload[offset:offset + size]
+        offset += size
+
+
+class JournaledConversion:
+
+
+    def __init__(self, path: str, validation: str = "fast", checkpoint_units: int = 256, checkpoint_size: int = 0x1000000):
+        self.path = path
+        self.journal = journal_path(path)
+        self.validation = validation
+        self.checkpoint_units = checkpoint_units
+        self.checkpoint_size = checkpoint_size
+        self.names = None
+        self.next_unit = 0
+        self.resumed = None # unit the conversion resumed from
+        self.checkpoints = 0
+
+
+    def recover(self, journal: BinaryIO, size: int) -> list[bytes] | None:
+        # after images of the units not checkpointed yet, None when the journal was not complete and the file never touched
+        records = read_records(journal)
+        first = next(records, None)
+        if first is None or first[0] != b"P":
+            return None
+        journal_size, names = unpack_plan(first[2])
+        if journal_size != size:
+            raise ValueError("The journal does not belong to this file.")
+
+        images = {}
+        ready = False
+        end = first[3]
+        for kind, unit, payload, end in records:
+            if kind == b"A":
+                images[unit] = payload
+            elif kind == b"R":
+                ready = True
+            elif kind == b"C":
+                self.next_unit = unit
+        if not ready:
+            return None
+        journal.truncate(end)
+        self.names = names
+        self.resumed = self.next_unit
+        return [images[unit] for unit in range(self.next_unit, len(names))]
+
+
+    def start(self, fp: BinaryIO, journal: BinaryIO) -> list[bytes]:
+        work, units = convert_units(fp, self.validation)
+        self.names = [name for name, _ in units]
+        images = [after_image(work, ranges) for _, ranges in units]
+        journal.truncate(0)
+        journal.write(pack_record(b"P", 0, pack_plan(len(work), self.names)))
+        for unit, payload in enumerate(images):
+            journal.write(pack_record(b"A", unit, payload))
+        journal.write(pack_record(b"R", len(images)))
+        journal.flush()
+        os.fsync(journal.fileno())
+        return images
+
+
+    def convert(self) -> None:
+        with open(self.path, "r+b") as fp, open(self.journal, "a+b") as journal:
+            images = self.recover(journal, os.fstat(fp.fileno()).st_size)
+            if images is None:
+                try:
+                    images = self.start(fp, journal)
+                except BaseException: # nothing was written to the file yet
+                    os.unlink(self.journal)
+                    raise
+            with mmap.mmap(fp.fileno(), 0) as buff:
+                self.apply(journal, buff, images)
+            os.fsync(fp.fileno())
+        os.unlink(self.journal)
+
+
+    def apply(self, journal: BinaryIO, buff: mmap.mmap, images: list[bytes]) -> None:
+        # writing an after image again is harmless, after a crash the units past the last checkpoint are written again in order
+        size = 0
+        for unit, payload in enumerate(images, self.next_unit):
+            write_after_image(buff, payload)
+            size += len(payload)
+            if unit + 1 - self.next_unit >= self.checkpoint_units or size >= self.checkpoint_size or unit == len(self.names) - 1:
+                self.next_unit = unit + 1
+                self.checkpoint(journal, buff)
+                size = 0
+
+
+    def checkpoint(self, journal: BinaryIO, buff: mmap.mmap) -> None:
+        buff.flush()
+        journal.write(pack_record(b"C", self.next_unit))
+        journal.flush()
+        os.fsync(journal.fileno())
+        self.checkpoints += 1
+
+
+def convert_journaled(path: str, validation: str = "fast", checkpoint_units: int = 256, checkpoint_size: int = 0x1000000) -> dict:
+    result = new_result(path)
+    result["journal"] = None
+    start = time.perf_counter()
+    try:
+        result["size"] = os.path.getsize(path)
+        conversion = JournaledConversion(path, validation, checkpoint_units, checkpoint_size)
+        # a file with a journal is half converted, it is neither big nor little endian
+        if not os.path.exists(conversion.journal):
+            with open(path, "rb") as fp:
+                endianness = sniff_file(fp)
+            if not check_endianness(endianness, result):
+                return result
+        conversion.convert()
+        result["journal"] = {"units": len(conversion.names), "resumed": conversion.resumed, "checkpoints": conversion.checkpoints}
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["offset"] = getattr(e, "offset", None)
+    finally:
+        result["seconds"] = time.perf_counter() - start
+    return result
+
+
+class BatchJournal:
+
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done = {}
+        if os.path.exists(path):
+            with open(path, "r+b") as fp:
+                end = 0
+                for line in fp:
+                    if not line.endswith(b"\n"): # torn last line, cut so the next one starts on its own line
+                        break
+                    result = json.loads(line)
+                    self.done[result["path"]] = result
+                    end += len(line)
+                fp.truncate(end)
+        self.fp = open(path, "a")
+
+
+    def record(self, result: dict) -> None:
+        self.fp.write(json.dumps(result) + "\n")
+        self.fp.flush()
+        os.fsync(self.fp.fileno())
+        self.done[result["path"]] = result
+
+
+    def close(self) -> None:
+        self.fp.close()
+
+
+def convert_batch(paths: list[str], jobs: int = None, batch: BatchJournal = None, **options) -> Iterator[dict]:
+    pending = []
+    for path in paths:
+        if batch is not None and path in batch.done:
+            result = new_result(path)
+            result["size"] = batch.done[path]["size"]
+            result["skipped"] = "done by a previous run"
+            yield result
+        else:
+            pending.append(path)
+
+    with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+        futures = {executor.submit(convert_journaled, path, **options): path for path in pending}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e: # worker died
+                result = new_result(futures[future])
+                result["error"] = f"{type(e).__name__}: {e}"
+            # failed files are tried again by the next run, their own journal says where they stopped
+            if batch is not None and result["error"] is None:
+                batch.record(result)
+            yield result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convert AptDataHeader resources in place with a journal, so an interrupted conversion resumes where it stopped.")
+    parser.add_argument("paths", nargs="+", help="files, directories or glob patterns")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--batch-journal", help="file recording the files done, a batch run again with it skips them")
+    parser.add_argument("--checkpoint-units", type=int, default=256, help="units (top level sections, characters and geometry records) written between two checkpoints")
+    parser.add_argument("--checkpoint-size", type=int, default=16, help="MB of after images written between two checkpoints")
+    parser.add_argument("--validation", choices=VALIDATIONS, default="fast")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print the summary")
+    args = parser.parse_args()
+
+    # journals of an interrupted run are not inputs
+    paths = [path for path in expand_paths(args.paths) if not path.endswith(".journal")]
+    batch = BatchJournal(args.batch_journal) if args.batch_journal is not None else None
+    results = []
+    start = time.perf_counter()
+    try:
+        for result in convert_batch(paths, args.jobs, batch, validation=args.validation, checkpoint_units=args.checkpoint_units, checkpoint_size=args.checkpoint_size * 1024 * 1024):
+            if not args.quiet or result["error"] is not None:
+                resumed = "" if result.get("journal") is None or result["journal"]["resumed"] is None else f", resumed at unit {result['journal']['resumed']}/{result['journal']['units']}"
+                print(format_result(result) + resumed, flush=True)
+            results.append(result)
+    finally:
+        if batch is not None:
+            batch.close()
+    summary = summarize(results, time.perf_counter() - start)
+    print(format_summary(summary))
+    if batch is not None and summary["failed"] == 0:
+        os.unlink(args.batch_journal)
+    sys.exit(1 if summary["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
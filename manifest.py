@@ -0,0 +1,292 @@
+import argparse
+import concurrent.futures
+import json
+import os
+import socket
+import sys
+import time
+
+from cache import ConversionCache
+from converter import (
+    ENGINES,
+    VALIDATIONS,
+    atomic_output,
+    check_endianness,
+    convert_file,
+    expand_paths,
+    format_summary,
+    new_result,
+    output_paths,
+    sniff,
+    summarize,
+)
+
+
+# a manifest directory holds manifest.json, claims/shard-NNNNNN.GENERATION and results/shard-NNNNNN.json
+MANIFEST = "manifest.json"
+
+
+def claim_path(directory: str, shard: int, generation: int) -> str:
+    return os.path.join(directory, "claims", f"shard-{shard:06}.{generation}")
+
+
+def result_path(directory: str, shard: int) -> str:
+    return os.path.join(directory, "results", f"shard-{shard:06}.json")
+
+
+def shard_id(name: str) -> int:
+    return int(name.split(".")[0][len("shard-"):])
+
+
+def read_json(path: str) -> dict:
+    with open(path, "r") as fp:
+        return json.load(fp)
+
+
+def write_json(path: str, data: dict) -> None:
+    with atomic_output(path) as fp:
+        fp.write(json.dumps(data, indent=4).encode())
+
+
+def hash_file(path: str) -> tuple[int, str]:
+    with open(path, "rb") as fp:
+        buff = fp.read()
+    return len(buff), ConversionCache.key(buff)
+
+
+def scan(paths: list[str], directory: str, output: str = None, shard_files: int = 64, shard_bytes: int = 0x10000000, jobs: int = None, engine: str = "buffer", validation: str = "fast") -> dict:
+    # the paths are recorded as absolute, every node has to see the inputs and outputs at the same paths
+    paths = [os.path.abspath(path) for path in expand_paths(paths)]
+    outputs = output_paths(paths, None if output is None else os.path.abspath(output))
+    with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+        hashes = list(executor.map(hash_file, paths, chunksize=16))
+
+    # shards keep neighbouring files together and are capped both in files and in bytes
+    shards = []
+    shard = None
+    for path, path_output, (size, key) in zip(paths, outputs, hashes):
+        if shard is None or len(shard["files"]) >= shard_files or shard["bytes"] + size > shard_bytes:
+            shard = {"id": len(shards), "bytes": 0, "files": []}
+            shards.append(shard)
+        shard["files"].append({"path": path, "output": path_output, "size": size, "hash": key})
+        shard["bytes"] += size
+
+    manifest = {
+        "created": time.time(),
+        "engine": engine,
+        "validation": validation,
+        "files": len(paths),
+        "bytes": sum(size for size, _ in hashes),
+        "shards": shards,
+    }
+    os.makedirs(os.path.join(directory, "claims"), exist_ok=True)
+    os.makedirs(os.path.join(directory, "results"), exist_ok=True)
+    write_json(os.path.join(directory, MANIFEST), manifest)
+    return manifest
+
+
+class ShardWorker:
+
+
+    def __init__(self, directory: str, node: str = None, timeout: float = 600.0):
+        self.directory = directory
+        self.node = node or f"{socket.gethostname()}-{os.getpid()}"
+        self.timeout = timeout
+        self.manifest = read_json(os.path.join(directory, MANIFEST))
+
+
+    def claims(self) -> dict[int, int]:
+        # latest generation of every claimed shard
+        latest = {}
+        for name in os.listdir(os.path.join(self.directory, "claims")):
+            shard, generation = shard_id(name), int(name.split(".")[1])
+            latest[shard] = max(latest.get(shard, generation), generation)
+        return latest
+
+
+    def stale(self, path: str) -> bool:
+        try:
+            return time.time() - os.stat(path).st_mtime > self.timeout
+        except FileNotFoundError:
+            return False
+
+
+    def claim(self, shard: int, generation: int) -> str | None:
+        # a stale claim is taken over by creating the next generation, so two nodes never both win it
+        path = claim_path(self.directory, shard, generation)
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return None
+        with os.fdopen(fd, "w") as fp:
+            json.dump({"node": self.node, "pid": os.getpid(), "claimed": time.time()}, fp)
+        return path
+
+
+    def owner(self, path: str) -> str | None:
+        try:
+            return read_json(path)["node"]
+        except (OSError, ValueError): # claims are written right after they are created
+            return None
+
+
+    def owns(self, shard: int, generation: int) -> bool:
+        return not os.path.exists(claim_path(self.directory, shard, generation + 1))
+
+
+    def next_shard(self) -> tuple[dict, int] | None:
+        done = {shard_id(name) for name in os.listdir(os.path.join(self.directory, "results")) if name.endswith(".json")}
+        latest = self.claims()
+        for shard in self.manifest["shards"]:
+            if shard["id"] in done:
+                continue
+            generation = latest.get(shard["id"])
+            if generation is None:
+                generation = 0
+            elif self.stale(claim_path(self.directory, shard["id"], generation)):
+                generation += 1
+            else:
+                continue
+            if self.claim(shard["id"], generation) is not None:
+                return shard, generation
+        return None
+
+
+    def convert_entry(self, entry: dict) -> dict:
+        size, key = hash_file(entry["path"])
+        if key != entry["hash"]:
+            result = new_result(entry["path"])
+            result["size"] = size
+            with open(entry["path"], "rb") as fp:
+                endianness = sniff(fp.read())
+            # only a file a previous owner of the shard converted in place is skipped, anything else changed
+            if entry["output"] is not None or endianness == "invalid" or check_endianness(endianness, result):
+                result["error"] = "Changed since the manifest was written."
+            return result
+        return convert_file(entry["path"], self.manifest["engine"], entry["output"], validation=self.manifest["validation"])
+
+
+    def run_shard(self, shard: dict, generation: int) -> bool:
+        claim = claim_path(self.directory, shard["id"], generation)
+        started = time.time()
+        results = []
+        for entry in shard["files"]:
+            # another node took the shard over, it converts the rest
+            if not self.owns(shard["id"], generation):
+                return False
+            os.utime(claim) # heartbeat, the claim goes stale if the node stops touching it
+            results.append(self.convert_entry(entry))
+        write_json(result_path(self.directory, shard["id"]), {
+            "shard": shard["id"],
+            "node": self.node,
+            "generation": generation,
+            "started": started,
+            "finished": time.time(),
+            "results": results,
+        })
+        return True
+
+
+    def run(self) -> int:
+        shards = 0
+        while (claimed := self.next_shard()) is not None:
+            shards += self.run_shard(*claimed)
+        return shards
+
+
+def run_worker(directory: str, node: str = None, timeout: float = 600.0) -> int:
+    return ShardWorker(directory, node, timeout).run()
+
+
+def work(directory: str, jobs: int = 1, node: str = None, timeout: float = 600.0) -> int:
+    if jobs == 1:
+        return run_worker(directory, node, timeout)
+    # every process claims shards on its own, like separate nodes sharing the directory
+    with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+        futures = [executor.submit(run_worker, directory, None if node is None else f"{node}-{i}", timeout) for i in range(jobs)]
+        return sum(future.result() for future in futures)
+
+
+def merge(directory: str, timeout: float = 600.0) -> dict:
+    manifest = read_json(os.path.join(directory, MANIFEST))
+    worker = ShardWorker(directory, timeout=timeout)
+    latest = worker.claims()
+    results = []
+    nodes = {}
+    pending = []
+    started, finished = None, None
+    for shard in manifest["shards"]:
+        path = result_path(directory, shard["id"])
+        if not os.path.exists(path):
+            generation = latest.get(shard["id"])
+            claim = None if generation is None else claim_path(directory, shard["id"], generation)
+            pending.append({
+                "shard": shard["id"],
+                "files": len(shard["files"]),
+                "node": None if claim is None else worker.owner(claim) or "unknown",
+                "stale": claim is not None and worker.stale(claim),
+            })
+            continue
+        record = read_json(path)
+        results.extend(record["results"])
+        nodes[record["node"]] = nodes.get(record["node"], 0) + 1
+        started = record["started"] if started is None else min(started, record["started"])
+        finished = record["finished"] if finished is None else max(finished, record["finished"])
+
+    summary = summarize(results, 0.0 if started is None else finished - started)
+    summary["shards"] = len(manifest["shards"])
+    summary["pending"] = pending
+    summary["nodes"] = nodes
+    return summary
+
+
+def format_merge(summary: dict) -> str:
+    lines = [
+        format_summary(summary),
+        f"shards: {summary['shards'] - len(summary['pending'])}/{summary['shards']} done by {len(summary['nodes'])} nodes",
+    ]
+    for pending in summary["pending"]:
+        state = "unclaimed" if pending["node"] is None else f"claimed by {pending['node']}" + (" (stale)" if pending["stale"] else "")
+        lines.append(f"  shard {pending['shard']} ({pending['files']} files): {state}")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convert a batch of AptDataHeader resources across several nodes sharing a manifest directory.")
+    parser.add_argument("manifest", help="directory shared by every node, holding the manifest, the claims and the results")
+    commands = parser.add_subparsers(dest="command", required=True)
+    scan_parser = commands.add_parser("scan", help="write the manifest of the files to convert, split into shards")
+    scan_parser.add_argument("paths", nargs="+", help="files, directories or glob patterns")
+    scan_parser.add_argument("-o", "--output", help="write converted files into this directory instead of converting in place")
+    scan_parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="number of processes hashing the files")
+    scan_parser.add_argument("--shard-files", type=int, default=64, help="maximum number of files in a shard")
+    scan_parser.add_argument("--shard-size", type=int, default=256, help="maximum size in MB of the files in a shard")
+    scan_parser.add_argument("--engine", choices=ENGINES, default="buffer", help="engine used for in place conversion")
+    scan_parser.add_argument("--validation", choices=VALIDATIONS, default="fast")
+    work_parser = commands.add_parser("work", help="claim and convert shards until none are left")
+    work_parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="number of worker processes, each claiming shards on its own")
+    work_parser.add_argument("--node", help="name recorded in the claims and results, the host name and pid by default")
+    work_parser.add_argument("--timeout", type=float, default=600.0, help="seconds after which a claim that was not touched is taken over, it must be longer than converting any single file")
+    merge_parser = commands.add_parser("merge", help="report the totals and failures of every shard")
+    merge_parser.add_argument("--timeout", type=float, default=600.0, help="seconds after which a claim is reported as stale")
+    merge_parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    if args.command == "scan":
+        manifest = scan(args.paths, args.manifest, args.output, args.shard_files, args.shard_size * 1024 * 1024, args.jobs, args.engine, args.validation)
+        print(f"{manifest['files']} files ({manifest['bytes'] / 1024 / 1024:.2f} MB) in {len(manifest['shards'])} shards")
+    elif args.command == "work":
+        start = time.perf_counter()
+        shards = work(args.manifest, args.jobs, args.node, args.timeout)
+        print(f"{shards} shards converted in {time.perf_counter() - start:.2f}s")
+    else:
+        summary = merge(args.manifest, args.timeout)
+        print(format_merge(summary))
+        if args.json is not None:
+            with open(args.json, "w") as fp:
+                json.dump(summary, fp, indent=4)
+        sys.exit(1 if summary["failed"] or summary["pending"] else 0)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,564 @@
+import argparse
+import mmap
+import struct
+from collections import Counter
+from typing import Callable, Iterator
+
+from converter import (
+    CHARACTER_FONT_LAYOUT,
+    CHARACTER_IMAGE_LAYOUT,
+    CHARACTER_LAYOUT,
+    CHARACTER_MOVIE_LAYOUT,
+    CHARACTER_SHAPE_LAYOUT,
+    CHARACTER_SPRITE_LAYOUT,
+    CHARACTER_TEXT_LAYOUT,
+    CLIP_ACTION_RECORD_LAYOUT,
+    CLIP_ACTIONS_LAYOUT,
+    CONST_FILE_LAYOUT,
+    CONSTANT_LAYOUT,
+    EXPORT_LAYOUT,
+    FRAME_ITEM_ACTION_LAYOUT,
+    FRAME_ITEM_BACKGROUND_COLOR_LAYOUT,
+    FRAME_ITEM_FRAME_LABEL_LAYOUT,
+    FRAME_ITEM_INIT_ACTION_LAYOUT,
+    FRAME_ITEM_PLACE_OBJECT_LAYOUT,
+    FRAME_ITEM_REMOVE_OBJECT_LAYOUT,
+    FRAME_LAYOUT,
+    GEOMETRY_DATA_LAYOUT,
+    GEOMETRY_LAYOUT,
+    GEOMETRY_RECORD_LAYOUT,
+    HEADER_LAYOUT,
+    IMPORT_LAYOUT,
+    VERTEX_LAYOUT,
+    Layout,
+    scan_actions,
+    sniff,
+)
+
+
+WORD_STRUCTS = {
+    "big": struct.Struct(">L"),
+    "little": struct.Struct("<L"),
+}
+
+
+class AptData:
+
+
+    def __init__(self, buff: bytes | bytearray | mmap.mmap, endianness: str = None):
+        self.buff = buff
+        self.endianness = sniff(buff) if endianness is None else endianness
+        if self.endianness not in ["big", "little"]:
+            raise ValueError("Not an AptDataHeader resource.")
+        self.word_struct = WORD_STRUCTS[self.endianness]
+        self.header = Header(self, 0x0)
+        self.fp = None
+
+
+    @classmethod
+    def open(cls, path: str, endianness: str = None) -> "AptData":
+        fp = open(path, "rb")
+        try:
+            apt = cls(mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ), endianness)
+        except BaseException:
+            fp.close()
+            raise
+        apt.fp = fp
+        return apt
+
+
+    def close(self) -> None:
+        if isinstance(self.buff, mmap.mmap):
+            self.buff.close()
+        if self.fp is not None:
+            self.fp.close()
+
+
+    def __enter__(self) -> "AptData":
+        return self
+
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+    def unpack(self, layout: Layout, offset: int) -> tuple:
+        return (layout.big if self.endianness == "big" else layout.little).unpack_from(self.buff, offset)
+
+
+    def word(self, offset: int) -> int:
+        return self.word_struct.unpack_from(self.buff, offset)[0]
+
+
+    def string(self, offset: int) -> bytes | None:
+        if offset == 0:
+            return None
+        start = self.apt_data_offset + offset
+        end = self.buff.find(b"\0", start)
+        return bytes(self.buff[start:end if end >= 0 else len(self.buff)])
+
+
+    @property
+    def apt_data_offset(self) -> int:
+        return self.header.apt_data_offset
+
+
+    @property
+    def const_file(self) -> "ConstFile":
+        return ConstFile(self, self.header.const_file_offset)
+
+
+    @property
+    def movie(self) -> "Character":
+        return Character.load(self, self.apt_data_offset + self.const_file.movie_offset)
+
+
+    @property
+    def geometry(self) -> "Geometry":
+        return Geometry(self, self.header.geometry_offset)
+
+
+class Array:
+
+
+    __slots__ = ("apt", "node", "offset", "count", "stride")
+
+
+    def __init__(self, apt: AptData, node: Callable[[AptData, int], "Node"], offset: int, count: int, stride: int):
+        self.apt = apt
+        self.node = node
+        self.offset = offset
+        self.count = count
+        self.stride = stride
+
+
+    def __len__(self) -> int:
+        return self.count
+
+
+    def __getitem__(self, index: int | slice) -> "Node | list[Node]":
+        if isinstance(index, slice):
+            return [self.get(i) for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("Array index out of range.")
+        return self.get(index)
+
+
+    def __iter__(self) -> Iterator["Node"]:
+        for i in range(self.count):
+            yield self.get(i)
+
+
+    def get(self, index: int) -> "Node":
+        return self.node(self.apt, self.offset + index * self.stride)
+
+
+class Pointers(Array):
+
+
+    __slots__ = ("relative",)
+
+
+    def __init__(self, apt: AptData, node: Callable[[AptData, int], "Node"], offset: int, count: int, relative: bool = True):
+        super().__init__(apt, node, offset, count, 0x4)
+        self.relative = relative
+
+
+    def get(self, index: int) -> "Node | None":
+        pointer = self.apt.word(self.offset + index * 0x4)
+        if pointer == 0:
+            return None
+        return self.node(self.apt, self.apt.apt_data_offset + pointer if self.relative else pointer)
+
+
+class Node:
+
+
+    __slots__ = ("apt", "offset", "_values")
+    LAYOUT = None
+    FIELDS = {} # names of fields the converter does not need
+    BODY = 0x0 # offset of the layout from the start of the node
+
+
+    def __init__(self, apt: AptData, offset: int):
+        self.apt = apt
+        self.offset = offset
+        self._values = None
+
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.LAYOUT is None:
+            return
+        for name, index in {**cls.LAYOUT.names, **cls.FIELDS}.items():
+            if name != "null":
+                setattr(cls, name, property(lambda self, index=index: self.values[index]))
+
+
+    @property
+    def values(self) -> tuple:
+        # decoded on first access only
+        if self._values is None:
+            self._values = self.apt.unpack(self.LAYOUT, self.offset + self.BODY)
+        return self._values
+
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(0x{self.offset:X})"
+
+
+class Header(Node):
+
+
+    __slots__ = ()
+    LAYOUT = HEADER_LAYOUT
+
+
+class ConstFile(Node):
+
+
+    __slots__ = ()
+    LAYOUT = CONST_FILE_LAYOUT
+
+
+    @property
+    def constants(self) -> Array:
+        return Array(self.apt, Constant, self.offset + self.constants_offset, self.constants_count, 0x8)
+
+
+class Constant(Node):
+
+
+    __slots__ = ()
+    LAYOUT = CONSTANT_LAYOUT
+    FIELDS = {"constant_type": 0, "value": 1}
+
+
+class Import(Node):
+
+
+    __slots__ = ()
+    LAYOUT = IMPORT_LAYOUT
+    FIELDS = {"movie_name_offset": 0, "name_offset": 1, "character": 2}
+
+
+    @property
+    def movie_name(self) -> bytes | None:
+        return self.apt.string(self.movie_name_offset)
+
+
+    @property
+    def name(self) -> bytes | None:
+        return self.apt.string(self.name_offset)
+
+
+class Export(Node):
+
+
+    __slots__ = ()
+    LAYOUT = EXPORT_LAYOUT
+    FIELDS = {"name_offset": 0, "character": 1}
+
+
+    @property
+    def name(self) -> bytes | None:
+        return self.apt.string(self.name_offset)
+
+
+class Character(Node):
+
+
+    __slots__ = ()
+    TYPE = None
+    BODY = 0x10
+
+
+    @staticmethod
+    def load(apt: AptData, offset: int) -> "Character":
+        character_type = apt.unpack(CHARACTER_LAYOUT, offset)[CHARACTER_LAYOUT.names["character_type"]]
+        return CHARACTERS.get(character_type, Character)(apt, offset)
+
+
+    @property
+    def character_type(self) -> int:
+        if self.TYPE is not None:
+            return self.TYPE
+        return self.apt.unpack(CHARACTER_LAYOUT, self.offset)[CHARACTER_LAYOUT.names["character_type"]]
+
+
+class Shape(Character):
+
+
+    __slots__ = ()
+    TYPE = 1
+    LAYOUT = CHARACTER_SHAPE_LAYOUT
+
+
+class Text(Character):
+
+
+    __slots__ = ()
+    TYPE = 2
+    LAYOUT = CHARACTER_TEXT_LAYOUT
+
+
+class Font(Character):
+
+
+    __slots__ = ()
+    TYPE = 3
+    LAYOUT = CHARACTER_FONT_LAYOUT
+
+
+class Sprite(Character):
+
+
+    __slots__ = ()
+    TYPE = 5
+    LAYOUT = CHARACTER_SPRITE_LAYOUT
+
+
+    @property
+    def frames(self) -> Array:
+        return Array(self.apt, Frame, self.apt.apt_data_offset + self.frames_offset, self.frames_count, 0x8)
+
+
+class Image(Character):
+
+
+    __slots__ = ()
+    TYPE = 7
+    LAYOUT = CHARACTER_IMAGE_LAYOUT
+
+
+class Movie(Sprite):
+
+
+    __slots__ = ()
+    TYPE = 9
+    LAYOUT = CHARACTER_MOVIE_LAYOUT
+
+
+    @property
+    def characters(self) -> Pointers:
+        return Pointers(self.apt, Character.load, self.apt.apt_data_offset + self.characters_offsets, self.characters_count)
+
+
+    @property
+    def imports(self) -> Array:
+        return Array(self.apt, Import, self.apt.apt_data_offset + self.imports_offset, self.imports_count, 0x10)
+
+
+    @property
+    def exports(self) -> Array:
+        return Array(self.apt, Export, self.apt.apt_data_offset + self.exports_offset, self.exports_count, 0x8)
+
+
+CHARACTERS = {character.TYPE: character for character in [Shape, Text, Font, Sprite, Image, Movie]}
+
+
+class Frame(Node):
+
+
+    __slots__ = ()
+    LAYOUT = FRAME_LAYOUT
+
+
+    @property
+    def items(self) -> Pointers:
+        return Pointers(self.apt, FrameItem.load, self.apt.apt_data_offset + self.frame_items_offsets, self.frame_items_count)
+
+
+class FrameItem(Node):
+
+
+    __slots__ = ()
+    TYPE = None
+    BODY = 0x4
+
+
+    @staticmethod
+    def load(apt: AptData, offset: int) -> "FrameItem":
+        return FRAME_ITEMS.get(apt.word(offset), FrameItem)(apt, offset)
+
+
+    @property
+    def frame_item_type(self) -> int:
+        return self.TYPE if self.TYPE is not None else self.apt.word(self.offset)
+
+
+class FrameAction(FrameItem):
+
+
+    __slots__ = ()
+    TYPE = 1
+    LAYOUT = FRAME_ITEM_ACTION_LAYOUT
+
+
+    @property
+    def actions(self) -> "Actions | None":
+        return Actions(self.apt, self.apt.apt_data_offset + self.actions_offset) if self.actions_offset else None
+
+
+class FrameLabel(FrameItem):
+
+
+    __slots__ = ()
+    TYPE = 2
+    LAYOUT = FRAME_ITEM_FRAME_LABEL_LAYOUT
+
+
+class PlaceObject(FrameItem):
+
+
+    __slots__ = ()
+    TYPE = 3
+    LAYOUT = FRAME_ITEM_PLACE_OBJECT_LAYOUT
+
+
+    @property
+    def clip_actions(self) -> "ClipActions | None":
+        return ClipActions(self.apt, self.apt.apt_data_offset + self.clip_actions_offset) if self.clip_actions_offset else None
+
+
+class RemoveObject(FrameItem):
+
+
+    __slots__ = ()
+    TYPE = 4
+    LAYOUT = FRAME_ITEM_REMOVE_OBJECT_LAYOUT
+
+
+class BackgroundColor(FrameItem):
+
+
+    __slots__ = ()
+    TYPE = 5
+    LAYOUT = FRAME_ITEM_BACKGROUND_COLOR_LAYOUT
+
+
+class InitAction(FrameAction):
+
+
+    __slots__ = ()
+    TYPE = 8
+    LAYOUT = FRAME_ITEM_INIT_ACTION_LAYOUT
+
+
+FRAME_ITEMS = {frame_item.TYPE: frame_item for frame_item in [FrameAction, FrameLabel, PlaceObject, RemoveObject, BackgroundColor, InitAction]}
+
+
+class ClipActions(Node):
+
+
+    __slots__ = ()
+    LAYOUT = CLIP_ACTIONS_LAYOUT
+
+
+    @property
+    def records(self) -> Array:
+        return Array(self.apt, ClipActionRecord, self.apt.apt_data_offset + self.clip_action_records_offset, self.clip_action_records_count, 0xC)
+
+
+class ClipActionRecord(Node):
+
+
+    __slots__ = ()
+    LAYOUT = CLIP_ACTION_RECORD_LAYOUT
+
+
+    @property
+    def actions(self) -> "Actions | None":
+        return Actions(self.apt, self.apt.apt_data_offset + self.actions_offset) if self.actions_offset else None
+
+
+class Actions(Node):
+
+
+    __slots__ = ()
+
+
+    @property
+    def offsets(self) -> list[int]:
+        return scan_actions(self.apt.buff, self.offset)
+
+
+    @property
+    def opcodes(self) -> list[int]:
+        return [self.apt.buff[offset] for offset in self.offsets]
+
+
+class Geometry(Node):
+
+
+    __slots__ = ()
+    LAYOUT = GEOMETRY_LAYOUT
+
+
+    @property
+    def records(self) -> Pointers:
+        return Pointers(self.apt, GeometryRecord, self.geometry_records_offsets, self.geometry_records_count, relative=False)
+
+
+class GeometryRecord(Node):
+
+
+    __slots__ = ()
+    LAYOUT = GEOMETRY_RECORD_LAYOUT
+
+
+    @property
+    def data(self) -> Pointers:
+        return Pointers(self.apt, GeometryData, self.geometry_data_offsets, self.geometry_data_count, relative=False)
+
+
+class GeometryData(Node):
+
+
+    __slots__ = ()
+    LAYOUT = GEOMETRY_DATA_LAYOUT
+
+
+    @property
+    def vertices(self) -> Pointers:
+        return Pointers(self.apt, Vertex, self.vertices_offsets, self.vertices_count, relative=False)
+
+
+class Vertex(Node):
+
+
+    __slots__ = ()
+    LAYOUT = VERTEX_LAYOUT
+
+
+def summarize(apt: AptData) -> dict:
+    movie = apt.movie
+    characters = Counter(type(character).__name__ for character in movie.characters if character is not None)
+    return {
+        "endianness": apt.endianness,
+        "constants": len(apt.const_file.constants),
+        "characters": dict(characters),
+        "frames": len(movie.frames),
+        "imports": len(movie.imports),
+        "exports": len(movie.exports),
+        "geometry_records": len(apt.geometry.records),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Print a summary of AptDataHeader resources in either endianness without modifying them.")
+    parser.add_argument("paths", nargs="+")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        with AptData.open(path) as apt:
+            summary = summarize(apt)
+        print(path)
+        for key, value in summary.items():
+            print(f"    {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,245 @@
+import argparse
+import asyncio
+import concurrent.futures
+import os
+import stat
+import sys
+import time
+from typing import Awaitable, Callable
+
+from converter import (
+    VALIDATIONS,
+    atomic_output,
+    check_endianness,
+    convert_bytes,
+    expand_paths,
+    format_result,
+    format_summary,
+    new_result,
+    output_paths,
+    sniff,
+    summarize,
+)
+
+
+def read_file(path: str) -> tuple[bytes, int]:
+    with open(path, "rb") as fp:
+        return fp.read(), stat.S_IMODE(os.fstat(fp.fileno()).st_mode)
+
+
+def write_file(destination: str, buff: bytes, mode: int) -> None:
+    with atomic_output(destination, mode) as fp:
+        fp.write(buff)
+
+
+def convert_payload(path: str, buff: bytes, sniff_input: bool = True, validation: str = "fast") -> tuple[bytes | None, dict]:
+    result = new_result(path)
+    result["size"] = len(buff)
+    start = time.perf_counter()
+    try:
+        if not check_endianness(sniff(buff) if sniff_input else "big", result):
+            return None, result
+        return convert_bytes(buff, validation), result
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["offset"] = getattr(e, "offset", None)
+        return None, result
+    finally:
+        result["seconds"] = time.perf_counter() - start
+
+
+class Stage:
+
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.busy = 0.0
+        self.files = 0
+        self.bytes = 0
+
+
+    async def run(self, awaitable: Awaitable, size: int = 0):
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.busy += time.perf_counter() - start
+            self.files += 1
+            self.bytes += size
+
+
+    def to_dict(self, seconds: float) -> dict:
+        return {
+            "workers": self.workers,
+            "busy_seconds": self.busy,
+            "utilisation": self.busy / (seconds * self.workers) if seconds > 0 else 0.0,
+            "files": self.files,
+            "bytes": self.bytes,
+        }
+
+
+class ByteBudget:
+
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.used = 0
+        self.peak = 0
+        self.condition = asyncio.Condition()
+
+
+    async def acquire(self, size: int) -> int:
+        # a file larger than the whole budget still goes through, alone
+        size = min(size, self.capacity)
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.used + size <= self.capacity)
+            self.used += size
+            self.peak = max(self.peak, self.used)
+        return size
+
+
+    async def release(self, size: int) -> None:
+        async with self.condition:
+            self.used -= size
+            self.condition.notify_all()
+
+
+class Pipeline:
+
+
+    def __init__(self, jobs: int = None, readers: int = 4, writers: int = 4, memory: int = 0x10000000, sniff: bool = True, validation: str = "fast"):
+        self.jobs = jobs or os.cpu_count()
+        self.readers = readers
+        self.writers = writers
+        self.memory = memory
+        self.sniff = sniff
+        self.validation = validation
+        self.stages = {
+            "read": Stage("read", readers),
+            "convert": Stage("convert", self.jobs),
+            "write": Stage("write", writers),
+        }
+        self.budget = None
+        self.seconds = 0.0
+
+
+    async def run(self, paths: list[str], outputs: list[str], report: Callable[[dict], None] = None) -> list[dict]:
+        self.budget = ByteBudget(self.memory)
+        pending = asyncio.Queue()
+        for path, output in zip(paths, outputs):
+            pending.put_nowait((path, output))
+        # bounded queues, a stage that falls behind blocks the ones before it
+        converting = asyncio.Queue(self.jobs)
+        writing = asyncio.Queue(self.writers)
+        results = []
+
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(self.readers + self.writers) as io_executor, concurrent.futures.ProcessPoolExecutor(self.jobs) as cpu_executor:
+            readers = [asyncio.create_task(self.read(pending, converting, writing, io_executor)) for _ in range(self.readers)]
+            converters = [asyncio.create_task(self.convert(converting, writing, cpu_executor)) for _ in range(self.jobs)]
+            writers = [asyncio.create_task(self.write(writing, io_executor, results, report)) for _ in range(self.writers)]
+            await asyncio.gather(*readers)
+            for _ in converters:
+                await converting.put(None)
+            await asyncio.gather(*converters)
+            for _ in writers:
+                await writing.put(None)
+            await asyncio.gather(*writers)
+        self.seconds = time.perf_counter() - start
+        return results
+
+
+    async def read(self, pending: asyncio.Queue, converting: asyncio.Queue, writing: asyncio.Queue, executor: concurrent.futures.Executor) -> None:
+        loop = asyncio.get_running_loop()
+        while not pending.empty():
+            path, output = pending.get_nowait()
+            reserved = 0
+            try:
+                size = await loop.run_in_executor(executor, os.path.getsize, path)
+                reserved = await self.budget.acquire(size)
+                buff, mode = await self.stages["read"].run(loop.run_in_executor(executor, read_file, path), size)
+            except Exception as e:
+                result = new_result(path)
+                result["error"] = f"{type(e).__name__}: {e}"
+                await writing.put((result, None, None, None, reserved))
+                continue
+            await converting.put((path, output, buff, mode, reserved))
+
+
+    async def convert(self, converting: asyncio.Queue, writing: asyncio.Queue, executor: concurrent.futures.Executor) -> None:
+        loop = asyncio.get_running_loop()
+        while (item := await converting.get()) is not None:
+            path, output, buff, mode, reserved = item
+            try:
+                converted, result = await self.stages["convert"].run(loop.run_in_executor(executor, convert_payload, path, buff, self.sniff, self.validation), len(buff))
+            except Exception as e: # worker died
+                converted, result = None, new_result(path)
+                result["error"] = f"{type(e).__name__}: {e}"
+            await writing.put((result, output or path, converted, mode, reserved))
+
+
+    async def write(self, writing: asyncio.Queue, executor: concurrent.futures.Executor, results: list[dict], report: Callable[[dict], None] = None) -> None:
+        loop = asyncio.get_running_loop()
+        while (item := await writing.get()) is not None:
+            result, destination, converted, mode, reserved = item
+            try:
+                if converted is not None:
+                    start = time.perf_counter()
+                    await self.stages["write"].run(loop.run_in_executor(executor, write_file, destination, converted, mode), len(converted))
+                    result["seconds"] += time.perf_counter() - start
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {e}"
+            finally:
+                await self.budget.release(reserved)
+            results.append(result)
+            if report is not None:
+                report(result)
+
+
+    def utilisation(self) -> dict:
+        return {
+            "seconds": self.seconds,
+            "peak_memory": self.budget.peak if self.budget is not None else 0,
+            "stages": {name: stage.to_dict(self.seconds) for name, stage in self.stages.items()},
+        }
+
+
+def format_utilisation(utilisation: dict) -> str:
+    lines = []
+    for name, stage in utilisation["stages"].items():
+        mb_per_second = stage["bytes"] / 1024 / 1024 / stage["busy_seconds"] if stage["busy_seconds"] > 0 else 0.0
+        lines.append(f"{name:<8}{stage['workers']:>3} workers {stage['utilisation']:>8.1%} busy {stage['files']:>8} files {mb_per_second:>9.2f} MB/s per worker")
+    lines.append(f"peak memory in flight: {utilisation['peak_memory'] / 1024 / 1024:.2f} MB")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Convert AptDataHeader resources with reads, conversions and writes overlapping across files.")
+    parser.add_argument("paths", nargs="+", help="files, directories or glob patterns")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="number of conversion processes")
+    parser.add_argument("--readers", type=int, default=4, help="number of files read concurrently")
+    parser.add_argument("--writers", type=int, default=4, help="number of files written concurrently")
+    parser.add_argument("--memory", type=int, default=256, help="cap in MB on the size of the files in flight")
+    parser.add_argument("-o", "--output", help="write converted files into this directory instead of converting in place")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print the summary")
+    parser.add_argument("--validation", choices=VALIDATIONS, default="fast")
+    parser.add_argument("--no-sniff", action="store_true", help="convert files without checking that they are big endian first")
+    args = parser.parse_args()
+
+    def report(result: dict) -> None:
+        if not args.quiet or result["error"] is not None:
+            print(format_result(result), flush=True)
+
+    paths = expand_paths(args.paths)
+    outputs = output_paths(paths, args.output)
+    pipeline = Pipeline(args.jobs, args.readers, args.writers, args.memory * 1024 * 1024, not args.no_sniff, args.validation)
+    results = asyncio.run(pipeline.run(paths, outputs, report))
+    summary = summarize(results, pipeline.seconds)
+    print(format_summary(summary))
+    print(format_utilisation(pipeline.utilisation()))
+    sys.exit(1 if summary["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
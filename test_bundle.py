@@ -0,0 +1,103 @@
+import struct
+
+import pytest
+
+from bundle import BUNDLE_COMPRESSED, BUNDLE_ENTRY, BUNDLE_HEADER, convert_bundle, index_bundle
+from converter import convert_bytes
+from generator import generate
+from model import AptData
+
+
+APT_TYPE_ID = 0x10
+
+
+def build(payloads: list[tuple[bytes, int]], prefix: str = ">", platform: int = 3, flags: int = 0) -> tuple[bytes, list[int]]:
+    # an uncompressed bundle holding every payload in its main memory block, 0x80 aligned
+    entries_offset = 0x30
+    data_offset = (entries_offset + len(payloads) * 0x40 + 0x7F) & ~0x7F
+    data = bytearray()
+    offsets = []
+    for payload, _ in payloads:
+        offsets.append(data_offset + len(data))
+        data += payload
+        data += bytes(-len(data) % 0x80)
+    buff = bytearray(struct.pack(prefix + BUNDLE_HEADER, b"bnd2", 2, platform, 0, len(payloads), entries_offset, data_offset, data_offset + len(data), data_offset + len(data), flags))
+    buff += bytes(entries_offset - len(buff))
+    for i, ((payload, type_id), offset) in enumerate(zip(payloads, offsets)):
+        size = len(payload) | 0x40000000
+        buff += struct.pack(prefix + BUNDLE_ENTRY, 0x1000 + i, 0, size, 0, 0, size, 0, 0, offset - data_offset, 0, 0, 0, type_id, 0, 0, 0)
+    buff += bytes(data_offset - len(buff))
+    buff += data
+    return bytes(buff), offsets
+
+
+def payloads() -> list[tuple[bytes, int]]:
+    return [
+        (generate("small", 0), APT_TYPE_ID),
+        (generate("small", 1, True), APT_TYPE_ID),
+        (bytes(range(0x100)) * 0x10, 0x1), # not an AptDataHeader resource
+        (convert_bytes(generate("small", 2)), APT_TYPE_ID),
+        (generate("small", 3), 0x2),
+    ]
+
+
+def expected(buff: bytes, offsets: list[int], converted: list[int]) -> bytes:
+    buff = bytearray(buff)
+    for i, (payload, _) in enumerate(payloads()):
+        if i in converted:
+            buff[offsets[i]:offsets[i] + len(payload)] = convert_bytes(payload)
+    return bytes(buff)
+
+
+@pytest.mark.parametrize("prefix, platform", [(">", 3), ("<", 1)])
+def test_index_bundle(prefix: str, platform: int) -> None:
+    buff, offsets = build(payloads(), prefix, platform)
+    resources = index_bundle(buff)
+    assert [resource["id"] for resource in resources] == [0x1000, 0x1001, 0x1003, 0x1004]
+    assert [resource["offset"] for resource in resources] == [offsets[i] for i in [0, 1, 3, 4]]
+    assert [resource["endianness"] for resource in resources] == ["big", "big", "little", "big"]
+    assert [resource["id"] for resource in index_bundle(buff, APT_TYPE_ID)] == [0x1000, 0x1001, 0x1003]
+
+
+def test_index_bundle_invalid() -> None:
+    with pytest.raises(ValueError):
+        index_bundle(generate("small", 0))
+    buff, _ = build(payloads(), flags=BUNDLE_COMPRESSED)
+    with pytest.raises(ValueError):
+        index_bundle(buff)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_convert_bundle(tmp_path, jobs: int) -> None:
+    buff, offsets = build(payloads())
+    path = tmp_path / "archive.bnd"
+    path.write_bytes(buff)
+    results = convert_bundle(str(path), jobs=jobs)
+    assert all(result["error"] is None for result in results)
+    assert [result["skipped"] for result in results].count("already little endian") == 1
+    assert len(results) == 4
+    assert path.read_bytes() == expected(buff, offsets, [0, 1, 4])
+
+
+def test_convert_bundle_output(tmp_path) -> None:
+    buff, offsets = build(payloads())
+    path = tmp_path / "archive.bnd"
+    path.write_bytes(buff)
+    results = convert_bundle(str(path), str(tmp_path / "out.bnd"), jobs=1, type_id=APT_TYPE_ID)
+    assert all(result["error"] is None for result in results)
+    assert path.read_bytes() == buff
+    assert (tmp_path / "out.bnd").read_bytes() == expected(buff, offsets, [0, 1])
+
+
+def test_convert_bundle_failure(tmp_path) -> None:
+    # one malformed resource leaves the whole bundle untouched
+    malformed = bytearray(generate("small", 0))
+    struct.pack_into(">L", malformed, AptData(bytes(malformed), "big").movie.offset + 0x10, 0x7FFFFFFF)
+    buff, _ = build([(generate("small", 1), APT_TYPE_ID), (bytes(malformed), APT_TYPE_ID)])
+    path = tmp_path / "archive.bnd"
+    path.write_bytes(buff)
+    results = convert_bundle(str(path), jobs=1)
+    assert results[0]["error"] == "Not written, another resource of the bundle failed."
+    assert results[1]["error"].startswith("AptFormatError")
+    assert path.read_bytes() == buff
+    assert [entry.name for entry in tmp_path.iterdir()] == ["archive.bnd"]
\ No newline at end of file
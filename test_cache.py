@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from cache import ConversionCache
+from converter import convert_bytes, convert_file
+from generator import generate
+
+
+def test_put_get(tmp_path) -> None:
+    cache = ConversionCache(str(tmp_path))
+    key = cache.key(b"resource")
+    assert cache.get(key) is None
+    assert cache.put(key, b"converted") == 0
+    assert cache.get(key) == b"converted"
+    # replacing an entry only counts its new size
+    cache.put(key, b"converted again")
+    assert cache.read_size() == len(b"converted again")
+    assert cache.stats() == {"entries": 1, "size": len(b"converted again"), "max_size": cache.max_size}
+
+
+def test_unknown_store(tmp_path) -> None:
+    with pytest.raises(ValueError):
+        ConversionCache(str(tmp_path), store="input")
+
+
+def test_evict(tmp_path) -> None:
+    cache = ConversionCache(str(tmp_path), max_size=0x30)
+    keys = [cache.key(bytes([i])) for i in range(4)]
+    evictions = 0
+    for i, key in enumerate(keys):
+        evictions += cache.put(key, bytes(0x10))
+        os.utime(cache.path(key), (i, i)) # the oldest entry is evicted first
+    assert evictions == 1
+    assert cache.get(keys[0]) is None
+    assert all(cache.get(key) is not None for key in keys[1:])
+    assert cache.read_size() == cache.stats()["size"] == 0x30
+
+
+def test_size_rescanned(tmp_path) -> None:
+    # a missing or torn size file is rebuilt from the entries
+    cache = ConversionCache(str(tmp_path))
+    cache.put(cache.key(b"resource"), bytes(0x10))
+    os.unlink(tmp_path / "size")
+    cache.put(cache.key(b"other"), bytes(0x10))
+    assert cache.read_size() == 0x20
+    with open(tmp_path / "size", "w") as fp:
+        fp.write("")
+    assert cache.read_size() == 0x20
+
+
+@pytest.mark.parametrize("shared", [False, True])
+@pytest.mark.parametrize("store", ["output", "plan"])
+def test_convert_cached(tmp_path, store: str, shared: bool) -> None:
+    source = generate("small", 0, shared)
+    expected = convert_bytes(source)
+    cache = ConversionCache(str(tmp_path / "cache"), store=store)
+    path = tmp_path / "resource.dat"
+    for status in ["miss", "hit"]:
+        path.write_bytes(source)
+        result = convert_file(str(path), cache=cache, output=str(tmp_path / "out.dat"))
+        assert result["error"] is None
+        assert result["cache"] == status
+        assert path.read_bytes() == source
+        assert (tmp_path / "out.dat").read_bytes() == expected
+
+    result = convert_file(str(path), cache=cache)
+    assert result["cache"] == "hit"
+    assert path.read_bytes() == expected
+
+
+def test_convert_cached_evictions(tmp_path) -> None:
+    sources = [generate("small", seed) for seed in range(4)]
+    cache = ConversionCache(str(tmp_path / "cache"), max_size=max(len(source) for source in sources) * 2)
+    evictions = 0
+    for seed, source in enumerate(sources):
+        path = tmp_path / f"resource{seed}.dat"
+        path.write_bytes(source)
+        result = convert_file(str(path), cache=cache)
+        assert result["error"] is None
+        assert path.read_bytes() == convert_bytes(source)
+        evictions += result["evictions"]
+        assert cache.read_size() == cache.stats()["size"] <= cache.max_size
+    assert evictions == 2
+    assert cache.stats()["entries"] == 2
\ No newline at end of file
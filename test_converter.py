@@ -0,0 +1,423 @@
+import io
+import mmap
+import os
+import struct
+import subprocess
+import sys
+from array import array
+
+import pytest
+
+import converter
+from cache import ConversionCache
+from converter import ENGINES, NODE_KINDS, VALIDATIONS, WORD_TYPECODE, AptFileConverter, AptFormatError, BufferEngine, FileEngine, Profile, SwapPlan, convert_buffer, convert_bytes, convert_file, convert_to, plan_file, scan_actions
+from generator import generate
+from model import AptData, Font, FrameAction
+
+
+INPUTS = [(seed, shared) for seed in [0, 1] for shared in [False, True]]
+
+
+def shared_tables(seed: int = 0) -> bytes:
+    # two frames share their items table and two geometry records share their data table
+    buff = bytearray(generate("small", seed))
+    apt = AptData(bytes(buff), "big")
+    first, second = apt.movie.frames[0], apt.movie.frames[1]
+    buff[second.offset:second.offset + 0x8] = buff[first.offset:first.offset + 0x8]
+    first, second = apt.geometry.records[0], apt.geometry.records[1]
+    buff[second.offset + 0x4:second.offset + 0xC] = buff[first.offset + 0x4:first.offset + 0xC]
+    return bytes(buff)
+
+
+def malformed_frames_count() -> bytes:
+    buff = bytearray(generate("small", 0))
+    movie = AptData(bytes(buff), "big").movie.offset
+    struct.pack_into(">L", buff, movie + 0x10, 0x7FFFFFFF)
+    return bytes(buff)
+
+
+def overlapping_tables() -> bytes:
+    # the imports and exports of the movie are two tables of the same size at the same offset
+    buff = bytearray(generate("small", 0))
+    movie = AptData(bytes(buff), "big").movie
+    assert movie.imports.count * 0x10 == movie.exports.count * 0x8
+    field = buff.index(struct.pack(">L", movie.imports.offset - movie.apt.apt_data_offset), movie.offset)
+    struct.pack_into(">L", buff, field, movie.exports.offset - movie.apt.apt_data_offset)
+    return bytes(buff)
+
+
+def font_not_null() -> bytes:
+    # only strict validation checks the NULL field of a character
+    buff = bytearray(generate("small", 0))
+    font = next(character for character in AptData(bytes(buff), "big").movie.characters if isinstance(character, Font))
+    struct.pack_into(">L", buff, font.offset + 0xC, 0x1)
+    return bytes(buff)
+
+
+@pytest.fixture(params=INPUTS, ids=[f"seed{seed}{'-shared' if shared else ''}" for seed, shared in INPUTS])
+def source(request) -> bytes:
+    seed, shared = request.param
+    return generate("small", seed, shared)
+
+
+@pytest.mark.parametrize("validation", VALIDATIONS)
+@pytest.mark.parametrize("engine", ENGINES)
+def test_engines_agree(tmp_path, source: bytes, engine: str, validation: str) -> None:
+    expected = convert_bytes(source)
+    assert expected != source
+    path = tmp_path / "resource.dat"
+    path.write_bytes(source)
+    with open(path, "r+b") as fp:
+        AptFileConverter(fp, engine, validation=validation).convert()
+    assert path.read_bytes() == expected
+
+
+def test_swap_plan(source: bytes) -> None:
+    plan = plan_file(io.BytesIO(source))
+    stream = io.BytesIO()
+    plan.save(stream)
+    stream.seek(0x0)
+    loaded = SwapPlan.load(stream)
+    assert loaded.to_dict() == plan.to_dict()
+    assert loaded.swapped_size() == plan.swapped_size()
+
+    buff = bytearray(source)
+    loaded.apply(buff)
+    assert buff == convert_bytes(source)
+    # neighbouring swaps are coalesced, so there are far fewer runs than swapped words
+    assert len(plan.words) // 2 < plan.swapped_size() // 0x4 // 2
+
+
+def test_swap_plan_magic() -> None:
+    with pytest.raises(ValueError):
+        SwapPlan.load(io.BytesIO(SwapPlan.HEADER.pack(b"APTP", 0, 0)))
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_duplicates(shared: bool) -> None:
+    converter = AptFileConverter(None, BufferEngine(bytearray(generate("small", 0, shared))))
+    converter.convert()
+    assert (converter.skipped_duplicates > 0) == shared
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_shared_tables(tmp_path, engine: str) -> None:
+    source = shared_tables()
+    path = tmp_path / "resource.dat"
+    path.write_bytes(source)
+    with open(path, "r+b") as fp:
+        converter = AptFileConverter(fp, engine)
+        converter.convert()
+    assert converter.skipped_duplicates == 2
+    # a table swapped twice would be back in big endian, the unshared resource has the same tables swapped once
+    output = path.read_bytes()
+    expected = convert_bytes(generate("small", 0))
+    apt = AptData(source, "big")
+    for table in [apt.movie.frames[0].items, apt.geometry.records[0].data]:
+        assert output[table.offset:table.offset + table.count * 0x4] == expected[table.offset:table.offset + table.count * 0x4]
+
+
+@pytest.mark.parametrize("validation", VALIDATIONS)
+@pytest.mark.parametrize("engine", ENGINES)
+def test_malformed_count(tmp_path, engine: str, validation: str) -> None:
+    # the table would end far past the file, it is rejected before anything walks it
+    source = malformed_frames_count()
+    path = tmp_path / "resource.dat"
+    path.write_bytes(source)
+    with open(path, "r+b") as fp:
+        converter = AptFileConverter(fp, engine, validation=validation)
+        with pytest.raises(AptFormatError) as error:
+            converter.convert()
+    assert "frames" in str(error.value)
+    assert error.value.offset == AptData(source, "big").movie.offset + 0x10
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_convert_out_of_place(tmp_path, source: bytes, engine: str) -> None:
+    path = tmp_path / "resource.dat"
+    path.write_bytes(source)
+    os.chmod(path, 0o640)
+    result = convert_file(str(path), engine, output=str(tmp_path / "out" / "resource.dat"))
+    assert result["error"] is None
+    assert path.read_bytes() == source
+    assert (tmp_path / "out" / "resource.dat").read_bytes() == convert_bytes(source)
+    assert os.stat(tmp_path / "out" / "resource.dat").st_mode & 0o777 == 0o640
+    assert [entry.name for entry in (tmp_path / "out").iterdir()] == ["resource.dat"]
+
+
+def test_convert_to(tmp_path) -> None:
+    source = generate("small", 0)
+    path = tmp_path / "resource.dat"
+    path.write_bytes(source)
+    convert_to(str(path), str(tmp_path / "out.dat"))
+    assert path.read_bytes() == source
+    assert (tmp_path / "out.dat").read_bytes() == convert_bytes(source)
+
+
+def test_convert_out_of_place_error(tmp_path) -> None:
+    # nothing is left at the destination when the conversion fails
+    source = malformed_frames_count()
+    path = tmp_path / "resource.dat"
+    path.write_bytes(source)
+    result = convert_file(str(path), output=str(tmp_path / "out.dat"))
+    assert result["error"].startswith("AptFormatError")
+    assert path.read_bytes() == source
+    assert [entry.name for entry in tmp_path.iterdir()] == ["resource.dat"]
+
+
+def test_scan_actions() -> None:
+    # 0x0A has no operands, 0x81 aligns its word, 0xA3 has an unaligned half, 0xA2 a byte nothing swaps
+    buff = bytes([0xFF, 0x0A, 0x81, 0xFF, 0x1, 0x2, 0x3, 0x4, 0xA3, 0x1, 0x2, 0xA2, 0x1, 0x00])
+    operands = []
+    classes = []
+    assert scan_actions(buff, 0x1, 0, operands, classes) == [0x1, 0x2, 0x8, 0xB]
+    assert classes == [0x0D, 0x01, 0x0C, 0x0B]
+    assert [offset for offset, _ in operands] == [0x4, 0x9]
+    # alignment is relative to the start of the file, not of the buffer
+    assert scan_actions(buff[0x1:], 0x0, 0x1) == [0x0, 0x1, 0x7, 0xA]
+
+
+def test_scan_actions_engines(source: bytes) -> None:
+    apt = AptData(source, "big")
+    blocks = [item.actions.offset for frame in apt.movie.frames for item in frame.items if isinstance(item, FrameAction) and item.actions is not None]
+    assert blocks
+    for offset in blocks:
+        expected = scan_actions(source, offset)
+        assert BufferEngine(bytearray(source)).scan_actions(offset) == expected
+        assert FileEngine(io.BytesIO(source)).scan_actions(offset) == expected
+
+
+def test_profile(source: bytes) -> None:
+    profile = Profile()
+    converter = AptFileConverter(None, BufferEngine(bytearray(source)), profile)
+    converter.convert()
+    result = profile.to_dict()
+    totals = result["totals"]
+    assert totals["nodes"] == sum(len(converter.visited[kind]) for kind in NODE_KINDS)
+    assert totals["bytes_swapped"] == plan_file(io.BytesIO(source)).swapped_size()
+    assert totals["seeks"] > 0
+    assert result["sections"]["convert_character"]["calls"] == len(converter.visited["character"])
+    assert result["sections"]["convert_header"]["calls"] == 1
+    actions = sum(len(scan_actions(source, offset)) for offset in converter.visited["actions"])
+    assert sum(actions_class["count"] for actions_class in result["actions_classes"].values()) == actions
+
+
+def test_profile_merge() -> None:
+    profiles = []
+    for seed in [0, 1]:
+        profile = Profile()
+        AptFileConverter(None, BufferEngine(bytearray(generate("small", seed))), profile).convert()
+        profiles.append(profile.to_dict())
+    merged = Profile.merge(profiles)
+    assert merged["files"] == 2
+    for counter in ["bytes_swapped", "seeks", "nodes"]:
+        assert merged["totals"][counter] == sum(profile["totals"][counter] for profile in profiles)
+    for name, section in merged["sections"].items():
+        assert section["calls"] == sum(profile["sections"].get(name, {"calls": 0})["calls"] for profile in profiles)
+    assert set(merged["actions_classes"]) == set(profiles[0]["actions_classes"]) | set(profiles[1]["actions_classes"])
+
+
+def test_profile_file(tmp_path) -> None:
+    path = tmp_path / "resource.dat"
+    path.write_bytes(generate("small", 0))
+    result = convert_file(str(path), "file", profile=True)
+    assert result["error"] is None
+    assert result["profile"]["totals"]["seeks"] > 0
+    assert result["profile"]["actions_classes"]
+
+
+def test_convert_bytes(source: bytes) -> None:
+    expected = plan_file(io.BytesIO(source))
+    buff = bytearray(source)
+    expected.apply(buff)
+    assert convert_bytes(source) == buff
+    assert convert_bytes(source, "strict") == buff
+    assert convert_bytes(bytearray(source)) == buff
+
+
+def test_convert_buffer(source: bytes) -> None:
+    expected = convert_bytes(source)
+
+    buff = bytearray(source)
+    convert_buffer(buff)
+    assert buff == expected
+
+    view = memoryview(bytearray(source))
+    convert_buffer(view)
+    assert view.tobytes() == expected
+
+    words = array(WORD_TYPECODE, source)
+    convert_buffer(words)
+    assert words.tobytes() == expected
+
+    with mmap.mmap(-1, len(source)) as mapped:
+        mapped[:] = source
+        convert_buffer(mapped)
+        assert mapped[:] == expected
+
+
+def test_convert_buffer_read_only() -> None:
+    source = generate("small", 0)
+    with pytest.raises(TypeError):
+        convert_buffer(source)
+    with pytest.raises(TypeError):
+        convert_buffer(memoryview(bytearray(source)).toreadonly())
+
+
+def test_convert_buffer_malformed() -> None:
+    with pytest.raises(AptFormatError):
+        convert_bytes(malformed_frames_count())
+    with pytest.raises(AptFormatError):
+        convert_buffer(bytearray(malformed_frames_count()), "strict")
+
+
+@pytest.mark.parametrize("jobs", [2, 4])
+def test_split(tmp_path, source: bytes, jobs: int) -> None:
+    expected = convert_bytes(source)
+    serial = tmp_path / "serial.dat"
+    serial.write_bytes(source)
+    duplicates = convert_file(str(serial))["duplicates"]
+
+    path = tmp_path / "resource.dat"
+    path.write_bytes(source)
+    result = convert_file(str(path), output=str(tmp_path / "out.dat"), split=jobs)
+    assert result["error"] is None
+    assert path.read_bytes() == source
+    assert (tmp_path / "out.dat").read_bytes() == expected
+    # subtrees shared by several units are converted by one worker only
+    assert result["duplicates"] == duplicates
+
+    result = convert_file(str(path), split=jobs)
+    assert result["error"] is None
+    assert path.read_bytes() == expected
+
+
+@pytest.mark.parametrize("option", ["engine", "verify", "profile", "cache"])
+def test_split_unsupported(tmp_path, option: str) -> None:
+    options = {
+        "engine": dict(engine="file"),
+        "verify": dict(verify=True),
+        "profile": dict(profile=True),
+        "cache": dict(cache=ConversionCache(str(tmp_path / "cache"))),
+    }[option]
+    source = generate("small", 0)
+    path = tmp_path / "resource.dat"
+    path.write_bytes(source)
+    result = convert_file(str(path), split=2, **options)
+    assert result["error"].startswith("ValueError")
+    assert path.read_bytes() == source
+
+
+def test_split_malformed(tmp_path) -> None:
+    source = malformed_frames_count()
+    path = tmp_path / "resource.dat"
+    path.write_bytes(source)
+    result = convert_file(str(path), split=2)
+    assert result["error"].startswith("AptFormatError")
+    assert path.read_bytes() == source
+    assert [entry.name for entry in tmp_path.iterdir()] == ["resource.dat"]
+
+
+@pytest.mark.parametrize("validation", VALIDATIONS)
+def test_verify(tmp_path, source: bytes, validation: str) -> None:
+    path = tmp_path / "resource.dat"
+    path.write_bytes(source)
+    result = convert_file(str(path), verify=True, validation=validation)
+    assert result["error"] is None
+    assert path.read_bytes() == convert_bytes(source)
+    totals = result["profile"]["totals"]
+    assert totals["size"] == len(source)
+    assert 0 < totals["covered"] <= totals["size"]
+    assert totals["overlapped"] == 0
+
+
+def test_verify_shared_tables(tmp_path) -> None:
+    source = shared_tables()
+    path = tmp_path / "resource.dat"
+    path.write_bytes(source)
+    result = convert_file(str(path), verify=True)
+    assert result["error"] is None
+    assert result["duplicates"] == 2
+    assert path.read_bytes() == convert_bytes(source)
+
+
+@pytest.mark.parametrize("output", [False, True])
+def test_verify_overlap(tmp_path, output: bool) -> None:
+    # nothing is written when bytes are swapped twice
+    source = overlapping_tables()
+    path = tmp_path / "resource.dat"
+    path.write_bytes(source)
+    result = convert_file(str(path), output=str(tmp_path / "out.dat") if output else None, verify=True)
+    assert result["error"] == "ValueError: 1 ranges swapped more than once."
+    assert result["offset"] == AptData(source, "big").movie.exports.offset
+    assert result["profile"]["totals"]["overlapped"] == 0x20
+    assert path.read_bytes() == source
+    assert [entry.name for entry in tmp_path.iterdir()] == ["resource.dat"]
+
+
+def test_verify_profile(tmp_path) -> None:
+    source = generate("small", 0)
+    path = tmp_path / "resource.dat"
+    path.write_bytes(source)
+    result = convert_file(str(path), profile=True, verify=True)
+    assert result["error"].startswith("ValueError")
+    assert path.read_bytes() == source
+    process = subprocess.run([sys.executable, converter.__file__, "--verify", "--profile", str(tmp_path / "profile.json"), str(path)], capture_output=True, text=True)
+    assert process.returncode == 2
+    assert "--verify does not work with --profile" in process.stderr
+    assert path.read_bytes() == source
+
+
+def test_verify_cached(tmp_path) -> None:
+    # verification always converts again, a cached output would skip the coverage pass
+    source = generate("small", 0)
+    cache = ConversionCache(str(tmp_path / "cache"))
+    path = tmp_path / "resource.dat"
+    for _ in range(2):
+        path.write_bytes(source)
+        result = convert_file(str(path), cache=cache, verify=True)
+        assert result["error"] is None
+        assert result["cache"] == "miss"
+        assert result["profile"]["totals"]["covered"] > 0
+        assert path.read_bytes() == convert_bytes(source)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_strict(tmp_path, engine: str) -> None:
+    source = font_not_null()
+    path = tmp_path / "resource.dat"
+    path.write_bytes(source)
+    result = convert_file(str(path), engine, validation="strict")
+    assert result["error"] == "AptFormatError: Should be NULL."
+    assert result["offset"] == next(character for character in AptData(source, "big").movie.characters if isinstance(character, Font)).offset
+    assert convert_file(str(path), engine)["error"] is None
+
+
+def test_strict_cached(tmp_path) -> None:
+    # a conversion cached in fast mode must not let a strict run skip its checks
+    source = font_not_null()
+    cache = ConversionCache(str(tmp_path / "cache"))
+    path = tmp_path / "resource.dat"
+    path.write_bytes(source)
+    assert convert_file(str(path), cache=cache, output=str(tmp_path / "out.dat"))["cache"] == "miss"
+    assert convert_file(str(path), cache=cache, output=str(tmp_path / "out.dat"))["cache"] == "hit"
+    result = convert_file(str(path), cache=cache, validation="strict")
+    assert result["error"] == "AptFormatError: Should be NULL."
+    assert path.read_bytes() == source
+
+
+def test_strict_cached_valid(tmp_path) -> None:
+    source = generate("small", 0)
+    cache = ConversionCache(str(tmp_path / "cache"))
+    path = tmp_path / "resource.dat"
+    for validation in ["fast", "strict", "strict"]:
+        path.write_bytes(source)
+        result = convert_file(str(path), cache=cache, validation=validation)
+        assert result["error"] is None
+        assert result["cache"] == "miss"
+        assert path.read_bytes() == convert_bytes(source)
+
+
+def test_unknown_validation() -> None:
+    with pytest.raises(ValueError):
+        AptFileConverter(None, BufferEngine(bytearray(generate("small", 0))), validation="paranoid")
\ No newline at end of file
@@ -0,0 +1,125 @@
+import asyncio
+import os
+import time
+from typing import Callable
+
+import pytest
+
+from converter import convert_bytes
+from daemon import Daemon, Statistics, percentiles, request
+from generator import generate
+
+
+def run(daemon: Daemon, client: Callable[[], object]) -> object:
+    # the client talks to the daemon over its socket from a thread, then stops it
+    async def main() -> object:
+        serving = asyncio.create_task(daemon.serve())
+        loop = asyncio.get_running_loop()
+        try:
+            while not os.path.exists(daemon.socket_path):
+                if serving.done():
+                    serving.result()
+                await asyncio.sleep(0.01)
+            return await loop.run_in_executor(None, client)
+        finally:
+            await loop.run_in_executor(None, request, {"command": "stop"}, daemon.socket_path)
+            await serving
+
+    return asyncio.run(main())
+
+
+def wait_for(condition: Callable[[], bool], timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def socket_path(tmp_path) -> str:
+    return str(tmp_path / "daemon.sock")
+
+
+def test_convert(tmp_path, socket_path: str) -> None:
+    sources = [generate("small", seed, seed == 1) for seed in range(3)]
+    for i, source in enumerate(sources):
+        (tmp_path / f"resource{i}.dat").write_bytes(source)
+    (tmp_path / "invalid.dat").write_bytes(bytes(0x40))
+
+    def client() -> dict:
+        output = request({"command": "convert", "paths": [str(tmp_path / "*.dat")], "output": str(tmp_path / "out")}, socket_path)
+        in_place = request({"command": "convert", "paths": [str(tmp_path / "resource0.dat")]}, socket_path)
+        return {"output": output["results"], "in_place": in_place["results"], "status": request({"command": "status"}, socket_path)}
+
+    responses = run(Daemon([], socket_path, jobs=1, quiet=True), client)
+    assert len(responses["output"]) == 4
+    for i, source in enumerate(sources):
+        assert (tmp_path / "out" / f"resource{i}.dat").read_bytes() == convert_bytes(source)
+    assert (tmp_path / "resource1.dat").read_bytes() == sources[1]
+    assert (tmp_path / "resource0.dat").read_bytes() == convert_bytes(sources[0])
+    assert responses["in_place"][0]["error"] is None
+    status = responses["status"]
+    assert status["converted"] == 4
+    assert status["failed"] == 1
+    assert status["queued"] == status["running"] == 0
+    assert not os.path.exists(socket_path)
+
+
+def test_unknown_command(socket_path: str) -> None:
+    def client() -> str:
+        with pytest.raises(RuntimeError) as error:
+            request({"command": "restart"}, socket_path)
+        return str(error.value)
+
+    assert run(Daemon([], socket_path, jobs=1, quiet=True), client) == "ValueError: Unknown command restart."
+
+
+@pytest.mark.parametrize("output", [False, True])
+def test_watch(tmp_path, socket_path: str, output: bool) -> None:
+    (tmp_path / "watched").mkdir()
+    source = generate("small", 0)
+    destination = tmp_path / "out" / "resource.dat" if output else tmp_path / "watched" / "resource.dat"
+
+    def client() -> dict:
+        (tmp_path / "watched" / "resource.dat").write_bytes(source)
+        wait_for(lambda: request({"command": "status"}, socket_path)["converted"] == 1)
+        # the converted file is not picked up again
+        time.sleep(0.2)
+        return request({"command": "status"}, socket_path)
+
+    daemon = Daemon([str(tmp_path / "watched")], socket_path, str(tmp_path / "out") if output else None, jobs=1, interval=0.02, quiet=True)
+    status = run(daemon, client)
+    assert status["converted"] == 1
+    assert status["skipped"] == 0
+    assert destination.read_bytes() == convert_bytes(source)
+
+
+def test_submit() -> None:
+    # requests for one file only share a job when they write to the same place
+    async def main() -> None:
+        daemon = Daemon([])
+        daemon.queue = asyncio.Queue()
+        in_place = daemon.submit("resource.dat")
+        assert daemon.submit("resource.dat") is in_place
+        output = daemon.submit("resource.dat", "out/resource.dat")
+        assert output is not in_place
+        assert daemon.queue.qsize() == 2
+        daemon.finish("resource.dat", None, in_place, {"error": None})
+        assert daemon.submit("resource.dat", "out/resource.dat") is output
+        assert daemon.submit("resource.dat") is not in_place
+
+    asyncio.run(main())
+
+
+def test_statistics() -> None:
+    statistics = Statistics(window=4)
+    for seconds in range(6):
+        result = {"seconds": seconds, "size": 0x100000, "error": None, "skipped": None}
+        statistics.record(result, seconds)
+    statistics.record({"seconds": 0.0, "size": 0x10, "error": "ValueError: ", "skipped": None}, 0.0)
+    status = statistics.to_dict()
+    assert status["converted"] == 6
+    assert status["failed"] == 1
+    assert status["bytes"] == 6 * 0x100000
+    assert status["latency"] == {"p50": 4, "p90": 5, "p99": 5}
+    assert percentiles([]) == {"p50": 0.0, "p90": 0.0, "p99": 0.0}
\ No newline at end of file
@@ -0,0 +1,37 @@
+import pytest
+
+from converter import ENGINES
+from differential import compare, differs
+from generator import generate
+
+
+# converter_old.convert_action_records returns before swapping anything
+OLD_UNCONVERTED = {"convert_actions", "convert_clip_actions"}
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_old_converter(seed: int) -> None:
+    comparison = compare(generate("small", seed), list(ENGINES))
+    assert comparison["reference"] == "old"
+    for engine in ENGINES:
+        result = comparison["engines"][engine]
+        assert result["error"] is None
+        assert result["regions"]
+        for region in result["regions"].values():
+            assert set(region["sections"]) <= OLD_UNCONVERTED
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_engines(shared: bool) -> None:
+    comparison = compare(generate("small", 0, shared), list(ENGINES), "buffer")
+    assert not differs(comparison)
+    for result in comparison["engines"].values():
+        assert result["regions"] in [None, {}]
+
+
+def test_old_converter_shared() -> None:
+    # the old converter swaps shared subtrees again and loses track of the frame items
+    comparison = compare(generate("small", 0, True), ["buffer"])
+    assert comparison["engines"]["old"]["error"] is not None
+    assert comparison["engines"]["buffer"]["regions"] is None
+    assert differs(comparison)
\ No newline at end of file
@@ -0,0 +1,90 @@
+import io
+import os
+
+import pytest
+
+import journal
+from converter import AptFileConverter, BufferEngine, convert_bytes
+from generator import generate
+from journal import BatchJournal, convert_journaled, convert_units, journal_path
+
+
+class Crash(Exception):
+    pass
+
+
+def crash_after(monkeypatch, writes: int, written: bool) -> None:
+    # the conversion stops at the given after image, before or after it reaches the file but always before its checkpoint
+    write_after_image = journal.write_after_image
+    calls = [0]
+
+    def crashing(buff, payload: bytes) -> None:
+        calls[0] += 1
+        if calls[0] == writes:
+            if written:
+                write_after_image(buff, payload)
+            raise Crash()
+        write_after_image(buff, payload)
+
+    monkeypatch.setattr(journal, "write_after_image", crashing)
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_convert_units(shared: bool) -> None:
+    # the units are the top level sections, then the same nodes split hands out
+    source = generate("small", 0, shared)
+    work, units = convert_units(io.BytesIO(source))
+    assert bytes(work) == convert_bytes(source)
+    converter = AptFileConverter(io.BytesIO(source), BufferEngine(bytearray(source)))
+    nodes = [node for unit in converter.split(1) for node in unit]
+    assert [name for name, _ in units] == ["header", "const file", "movie", "geometry", *(f"{node[1]} 0x{node[0]:X}" for node in nodes)]
+    assert all(ranges for _, ranges in units[:4])
+
+
+@pytest.mark.parametrize("written", [False, True], ids=["before", "after"])
+@pytest.mark.parametrize("shared", [False, True], ids=["unique", "shared"])
+def test_resume(tmp_path, monkeypatch, shared: bool, written: bool) -> None:
+    source = generate("small", 0, shared)
+    path = tmp_path / "resource.dat"
+    path.write_bytes(source)
+
+    crash_after(monkeypatch, 3, written)
+    result = convert_journaled(str(path), checkpoint_units=1)
+    assert result["error"] == "Crash: "
+    assert os.path.exists(journal_path(str(path)))
+
+    monkeypatch.undo()
+    result = convert_journaled(str(path), checkpoint_units=1)
+    assert result["error"] is None
+    assert result["journal"]["resumed"] == 2
+    assert not os.path.exists(journal_path(str(path)))
+    assert path.read_bytes() == convert_bytes(source)
+
+
+def test_convert_journaled(tmp_path) -> None:
+    source = generate("small", 1)
+    path = tmp_path / "resource.dat"
+    path.write_bytes(source)
+    result = convert_journaled(str(path))
+    assert result["error"] is None
+    assert result["journal"]["resumed"] is None
+    assert path.read_bytes() == convert_bytes(source)
+    assert convert_journaled(str(path))["skipped"] == "already little endian"
+
+    path.write_bytes(bytes(0x40))
+    assert convert_journaled(str(path))["error"] == "ValueError: Not a big endian AptDataHeader resource."
+
+
+def test_batch_journal_torn_line(tmp_path) -> None:
+    path = tmp_path / "batch.jsonl"
+    batch = BatchJournal(str(path))
+    batch.record({"path": "first.dat", "size": 0x10})
+    batch.close()
+    with open(path, "a") as fp:
+        fp.write('{"path": "second.dat"')
+
+    batch = BatchJournal(str(path))
+    assert list(batch.done) == ["first.dat"]
+    batch.record({"path": "second.dat", "size": 0x20})
+    batch.close()
+    assert list(BatchJournal(str(path)).done) == ["first.dat", "second.dat"]
\ No newline at end of file
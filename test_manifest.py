@@ -0,0 +1,100 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import manifest
+from converter import convert_bytes
+from generator import generate
+from manifest import ShardWorker, claim_path, merge, result_path, scan
+
+
+def write_inputs(directory, count: int) -> list[bytes]:
+    sources = [generate("small", seed, seed % 3 == 0) for seed in range(count)]
+    directory.mkdir()
+    for i, source in enumerate(sources):
+        (directory / f"resource{i:02}.dat").write_bytes(source)
+    return sources
+
+
+def work(directory: str, nodes: int, timeout: float = 600.0) -> None:
+    # every node is a process of its own, only sharing the manifest directory
+    processes = [
+        subprocess.Popen([sys.executable, manifest.__file__, directory, "work", "-j", "1", "--node", f"node{i}", "--timeout", str(timeout)], stdout=subprocess.DEVNULL)
+        for i in range(nodes)
+    ]
+    assert [process.wait(120) for process in processes] == [0] * nodes
+
+
+@pytest.mark.parametrize("output", [False, True])
+def test_scan_work_merge(tmp_path, output: bool) -> None:
+    sources = write_inputs(tmp_path / "in", 12)
+    directory = str(tmp_path / "manifest")
+    scanned = scan([str(tmp_path / "in")], directory, str(tmp_path / "out") if output else None, shard_files=3, jobs=1)
+    assert scanned["files"] == 12
+    assert len(scanned["shards"]) == 4
+
+    work(directory, 3)
+    summary = merge(directory)
+    assert summary["converted"] == 12
+    assert summary["failed"] == 0
+    assert summary["pending"] == []
+    assert summary["shards"] == 4
+    assert sum(summary["nodes"].values()) == 4
+    assert set(summary["nodes"]) <= {"node0", "node1", "node2"}
+    # every shard was claimed once
+    assert sorted(os.listdir(os.path.join(directory, "claims"))) == [f"shard-{shard:06}.0" for shard in range(4)]
+    for i, source in enumerate(sources):
+        assert (tmp_path / ("out" if output else "in") / f"resource{i:02}.dat").read_bytes() == convert_bytes(source)
+        if output:
+            assert (tmp_path / "in" / f"resource{i:02}.dat").read_bytes() == source
+
+
+def test_stale_claim(tmp_path) -> None:
+    sources = write_inputs(tmp_path / "in", 6)
+    directory = str(tmp_path / "manifest")
+    scan([str(tmp_path / "in")], directory, shard_files=3, jobs=1)
+
+    # a node claimed the first shard, converted its first file in place and died
+    dead = ShardWorker(directory, "dead", timeout=60.0)
+    shard, generation = dead.next_shard()
+    assert (shard["id"], generation) == (0, 0)
+    path = tmp_path / "in" / "resource00.dat"
+    path.write_bytes(convert_bytes(path.read_bytes()))
+    claim = claim_path(directory, 0, 0)
+    os.utime(claim, (time.time() - 120.0, time.time() - 120.0))
+    summary = merge(directory, timeout=60.0)
+    assert [(pending["shard"], pending["node"], pending["stale"]) for pending in summary["pending"]] == [(0, "dead", True), (1, None, False)]
+
+    work(directory, 2, timeout=60.0)
+    assert not dead.owns(0, 0)
+    assert dead.run_shard(shard, 0) is False
+    assert os.path.exists(claim_path(directory, 0, 1))
+    summary = merge(directory, timeout=60.0)
+    assert summary["pending"] == []
+    assert summary["converted"] == 5
+    assert summary["skipped"] == 1
+    assert "dead" not in summary["nodes"]
+    assert manifest.read_json(result_path(directory, 0))["generation"] == 1
+    for i, source in enumerate(sources):
+        assert (tmp_path / "in" / f"resource{i:02}.dat").read_bytes() == convert_bytes(source)
+
+
+def test_changed(tmp_path) -> None:
+    write_inputs(tmp_path / "in", 2)
+    directory = str(tmp_path / "manifest")
+    scan([str(tmp_path / "in")], directory, str(tmp_path / "out"), jobs=1)
+    # a file converted with -o never changes its source, so a converted source changed too
+    path = tmp_path / "in" / "resource00.dat"
+    path.write_bytes(convert_bytes(path.read_bytes()))
+    (tmp_path / "in" / "resource01.dat").write_bytes(bytes(0x40))
+
+    assert ShardWorker(directory, "node").run() == 1
+    summary = merge(directory)
+    assert summary["failed"] == 2
+    assert summary["converted"] == 0
+    results = manifest.read_json(result_path(directory, 0))["results"]
+    assert [result["error"] for result in results] == ["Changed since the manifest was written."] * 2
+    assert not (tmp_path / "out").exists()
\ No newline at end of file
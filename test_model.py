@@ -0,0 +1,84 @@
+import pytest
+
+from converter import convert_bytes
+from generator import SIZES, generate
+from model import AptData, FrameAction, Node, PlaceObject, Sprite, summarize
+
+
+def walk(apt: AptData) -> list[tuple[str, int, tuple]]:
+    # every node reachable from the header with its decoded values, actions by their opcodes
+    movie = apt.movie
+    nodes = [apt.header, apt.const_file, *apt.const_file.constants, movie, *movie.imports, *movie.exports]
+    names = [(item.movie_name, item.name) for item in movie.imports] + [item.name for item in movie.exports]
+    actions = []
+    for character in [movie, *movie.characters]:
+        if character is None:
+            continue
+        nodes.append(character)
+        if not isinstance(character, Sprite):
+            continue
+        for frame in character.frames:
+            nodes.append(frame)
+            for item in frame.items:
+                nodes.append(item)
+                if isinstance(item, FrameAction) and item.actions is not None:
+                    actions.append(item.actions.opcodes)
+                if isinstance(item, PlaceObject) and item.clip_actions is not None:
+                    nodes.extend(item.clip_actions.records)
+                    actions.extend(record.actions.opcodes for record in item.clip_actions.records if record.actions is not None)
+    for record in apt.geometry.records:
+        nodes.append(record)
+        for data in record.data:
+            nodes.append(data)
+            nodes.extend(data.vertices)
+    return [(type(node).__name__, node.offset, node.values) for node in nodes if node is not None and node.LAYOUT is not None] + [names, actions]
+
+
+@pytest.mark.parametrize("shared", [False, True])
+@pytest.mark.parametrize("seed", [0, 1])
+def test_endianness(seed: int, shared: bool) -> None:
+    # both endiannesses decode to the same values
+    source = generate("small", seed, shared)
+    big = AptData(source)
+    little = AptData(convert_bytes(source))
+    assert big.endianness == "big"
+    assert little.endianness == "little"
+    assert walk(big) == walk(little)
+    assert summarize(big) == {**summarize(little), "endianness": "big"}
+
+
+def test_summarize() -> None:
+    counts = SIZES["small"]
+    summary = summarize(AptData(generate("small", 0)))
+    assert summary["constants"] == counts["constants"]
+    assert summary["imports"] == counts["imports"]
+    assert summary["exports"] == counts["exports"]
+    assert summary["geometry_records"] == counts["geometry_records"]
+    assert summary["characters"]["Sprite"] == counts["sprites"]
+    assert summary["characters"]["Font"] == counts["fonts"]
+
+
+def test_lazy() -> None:
+    apt = AptData(generate("small", 0))
+    export = apt.movie.exports[1]
+    assert export._values is None
+    assert export.character == export.values[1]
+    assert export._values is not None
+    for node in [apt.header, apt.movie, export, apt.geometry.records[0]]:
+        assert isinstance(node, Node)
+        assert not hasattr(node, "__dict__")
+
+
+def test_open(tmp_path) -> None:
+    source = generate("small", 0)
+    path = tmp_path / "resource.dat"
+    path.write_bytes(source)
+    with AptData.open(str(path)) as apt:
+        assert walk(apt) == walk(AptData(source))
+    assert apt.buff.closed
+    assert apt.fp.closed
+
+
+def test_invalid() -> None:
+    with pytest.raises(ValueError):
+        AptData(bytes(0x40))
\ No newline at end of file
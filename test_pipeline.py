@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from converter import convert_bytes, output_paths
+from generator import generate
+from pipeline import ByteBudget, Pipeline, convert_payload
+
+
+def test_convert_payload() -> None:
+    source = generate("small", 0)
+    converted, result = convert_payload("resource.dat", source)
+    assert converted == convert_bytes(source)
+    assert result["error"] is None
+    assert result["size"] == len(source)
+
+    converted, result = convert_payload("resource.dat", converted)
+    assert converted is None
+    assert result["skipped"] == "already little endian"
+
+    converted, result = convert_payload("resource.dat", bytes(0x40))
+    assert converted is None
+    assert result["error"] == "ValueError: Not a big endian AptDataHeader resource."
+
+
+def test_convert_payload_validation() -> None:
+    converted, result = convert_payload("resource.dat", generate("small", 0), validation="paranoid")
+    assert converted is None
+    assert result["error"] == "ValueError: Unknown validation paranoid."
+
+
+@pytest.mark.parametrize("output", [False, True])
+def test_pipeline(tmp_path, output: bool) -> None:
+    sources = [generate("small", seed, seed % 2 == 1) for seed in range(6)]
+    paths = []
+    for i, source in enumerate(sources):
+        path = tmp_path / "in" / f"resource{i}.dat"
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(source)
+        paths.append(str(path))
+    (tmp_path / "in" / "converted.dat").write_bytes(convert_bytes(sources[0]))
+    (tmp_path / "in" / "invalid.dat").write_bytes(bytes(0x40))
+    paths += [str(tmp_path / "in" / "converted.dat"), str(tmp_path / "in" / "invalid.dat"), str(tmp_path / "in" / "missing.dat")]
+    outputs = output_paths(paths, str(tmp_path / "out") if output else None)
+
+    # the budget holds a single file, so reads wait for writes
+    pipeline = Pipeline(jobs=2, readers=2, writers=2, memory=max(map(len, sources)))
+    results = {result["path"]: result for result in asyncio.run(pipeline.run(paths, outputs))}
+    assert len(results) == len(paths)
+    for path, destination, source in zip(paths, outputs, sources):
+        assert results[path]["error"] is None
+        with open(destination or path, "rb") as fp:
+            assert fp.read() == convert_bytes(source)
+    assert results[paths[-3]]["skipped"] == "already little endian"
+    assert results[paths[-2]]["error"].startswith("ValueError")
+    assert results[paths[-1]]["error"].startswith("FileNotFoundError")
+
+    utilisation = pipeline.utilisation()
+    assert utilisation["peak_memory"] <= pipeline.memory
+    assert utilisation["stages"]["read"]["files"] == len(paths) - 1
+    assert utilisation["stages"]["write"]["files"] == len(sources)
+
+
+def test_byte_budget() -> None:
+    async def run() -> list[str]:
+        budget = ByteBudget(0x10)
+        events = []
+
+        async def hold(name: str, size: int, seconds: float) -> None:
+            reserved = await budget.acquire(size)
+            events.append(f"{name} acquired")
+            await asyncio.sleep(seconds)
+            events.append(f"{name} released")
+            await budget.release(reserved)
+
+        # the second file waits for the first, the third is larger than the budget and goes through alone
+        await asyncio.gather(hold("first", 0xC, 0.02), hold("second", 0x8, 0.0), hold("third", 0x20, 0.0))
+        assert budget.used == 0
+        assert budget.peak == 0x10
+        return events
+
+    events = asyncio.run(run())
+    assert events.index("first released") < events.index("second acquired")
\ No newline at end of file